@@ -0,0 +1,332 @@
+"""
+Baseline invoice renderer for benchmarks/bench_invoice_pdf.py
+generate_pdf exactly as billwithlogin.py had it before invoice_pdf.py: the
+fonts, logo and QR image are prepared again for every bill. Kept only so
+the benchmark measures the shared template against the original path.
+"""
+
+import os
+try:
+    from fpdf import FPDF
+    FPDF_AVAILABLE = True
+except Exception:
+    FPDF_AVAILABLE = False
+
+
+def generate_pdf(bill: dict, return_bytes: bool = False, force_ascii: bool = False):
+    """Generate a professional PDF invoice. Returns bytes when `return_bytes=True`."""
+    bill_no = str(bill.get('bill_no', 'invoice'))
+    pdf_path = None
+    if not return_bytes:
+        os.makedirs('bills', exist_ok=True)
+        pdf_path = os.path.join('bills', f"{bill_no}.pdf")
+
+    # Text fallback
+    if not FPDF_AVAILABLE:
+        txt = []
+        txt.append('Alam Megastore\n')
+        txt.append(f"Bill No: {bill.get('bill_no')}  Date: {bill.get('date')} {bill.get('time')}\n")
+        txt.append(f"Customer: {bill.get('customer_name')}  Mobile: {bill.get('customer_mobile')}\n\n")
+        txt.append('Description\tQty\tRate\tAmount\n')
+        for it in bill.get('items', []):
+            txt.append(f"{it.get('item_name')}\t{it.get('qty')}\t{it.get('rate')}\t{it.get('amount')}\n")
+        try:
+            total_qty_txt = sum(int(float(it.get('qty', 0) or 0)) for it in bill.get('items', []))
+        except Exception:
+            total_qty_txt = 0
+        t = bill.get('totals', {})
+        txt.append(f"\nTotal Quantity: {total_qty_txt}\n")
+        txt.append(f"Subtotal: {t.get('subtotal')}  Discount: {t.get('discount')}  Total: {t.get('total')}\n")
+        txt_str = ''.join(txt)
+        if return_bytes:
+            return txt_str.encode('utf-8')
+        os.makedirs('bills', exist_ok=True)
+        txt_path = os.path.join('bills', f"{bill_no}.txt")
+        with open(txt_path, 'w', encoding='utf-8') as f:
+            f.write(txt_str)
+        return txt_path
+
+    # Initialize PDF
+    pdf = FPDF(unit='pt', format='A4')
+    pdf.add_page()
+    pdf.set_auto_page_break(False)
+
+    # Try to register Unicode TTF for ₹ support
+    unicode_font = False
+    font_candidates = [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+        'DejaVuSans.ttf',
+    ]
+    font_path = None
+    for p in font_candidates:
+        if os.path.exists(p):
+            font_path = p
+            break
+    if font_path:
+        try:
+            pdf.add_font('DejaVu', '', fname=font_path, uni=True)
+            for style in ('B', 'I', 'BI'):
+                try:
+                    pdf.add_font('DejaVu', style, fname=font_path, uni=True)
+                except Exception:
+                    pass
+            unicode_font = True
+        except Exception:
+            unicode_font = False
+
+    if force_ascii:
+        unicode_font = False
+
+    base_font = 'DejaVu' if unicode_font else 'Helvetica'
+
+    # Layout settings
+    primary = (0,40,30)
+    accent = (202, 155, 26)
+    header_h = 80
+    left_margin = 30
+    right_margin = 30
+    bottom_margin = 50
+    row_h = 18
+
+    logo_path = 'logo.png'
+
+    try:
+        import qrcode
+        from PIL import Image
+        QR_AVAILABLE = True
+    except Exception:
+        QR_AVAILABLE = False
+
+    def header():
+        pdf.set_fill_color(*primary)
+        pdf.rect(0, 0, pdf.w, header_h, 'F')
+        if os.path.exists(logo_path):
+            try:
+                pdf.image(logo_path, x=90, y=5, w=240, h=60)
+            except Exception:
+                pass
+        pdf.set_text_color(255, 255, 220)
+        pdf.set_font(base_font, 'B', 22)
+        pdf.set_xy(90, 30)
+        pdf.set_x(30)
+        pdf.set_font(base_font, 'B', 12)
+        pdf.cell(30, 90, 'Relling Bihibaray | Dist-Darjeeling | Mobile: 9832025468', ln=1)
+        bw = 150
+        bh = 44
+        pdf.set_fill_color(255, 255, 255)
+        pdf.rect(pdf.w - bw - 30, 20, bw, bh, 'F')
+        pdf.set_xy(pdf.w - bw - 30, 28)
+        pdf.set_text_color(*primary)
+        pdf.set_font(base_font, 'B', 12)
+        pdf.cell(bw, 12, 'INVOICE', align='C', ln=1)
+        pdf.set_font(base_font, '', 9)
+        pdf.set_xy(pdf.w - bw - 30, 44)
+        pdf.cell(bw, 10, f"Bill No: {bill_no}", align='C')
+        pdf.set_text_color(0, 0, 0)
+
+    def table_header():
+        pdf.set_fill_color(*primary)
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_font(base_font, 'B', 11)
+        pdf.set_x(left_margin)
+        pdf.cell(300, 22, 'Description', border=0, fill=True)
+        pdf.set_x(330)
+        pdf.cell(60, 22, 'Qty', border=0, align='C', fill=True)
+        pdf.set_x(390)
+        pdf.cell(80, 22, 'Rate', border=0, align='R', fill=True)
+        pdf.set_x(470)
+        pdf.cell(80, 22, 'Amount', border=0, align='R', ln=1, fill=True)
+        pdf.set_text_color(0, 0, 0)
+
+    def footer():
+        page_no = pdf.page_no()
+        pdf.set_xy(0, pdf.h - bottom_margin + 10)
+        pdf.set_font(base_font, 'I', 8)
+        pdf.set_text_color(120, 120, 120)
+        pdf.cell(0, 10, f'Page {page_no}', align='C')
+        pdf.set_text_color(0, 0, 0)
+
+    header()
+    pdf.ln(10)
+    pdf.set_font(base_font, 'B', 11)
+    pdf.set_x(left_margin)
+    pdf.cell(80, 70, 'Customer:', ln=0)
+    pdf.set_font(base_font, '', 11)
+    pdf.cell(260, 70, f"{bill.get('customer_name','')}  {bill.get('customer_mobile','')}", ln=1)
+    pdf.set_x(left_margin)
+    pdf.set_font(base_font, 'B', 11)
+    pdf.cell(80, 2, 'Date & Time:', ln=0)
+    pdf.set_font(base_font, '', 11)
+    pdf.cell(260, 2, f"{bill.get('date','')}      {bill.get('time','')}", ln=1)
+    pdf.ln(6)
+
+    table_header()
+    pdf.set_font(base_font, '', 10)
+    fill = False
+    items = bill.get('items', [])
+    
+    gst_total = 0.0
+    for it in items:
+        try:
+            gst_total += float(it.get('gst_amount', 0) or 0)
+        except Exception:
+            pass
+
+    total_qty = 0
+    for it in items:
+        try:
+            total_qty += int(float(it.get('qty', 0) or 0))
+        except Exception:
+            pass
+
+    for it in items:
+        if pdf.get_y() + row_h + bottom_margin > pdf.h:
+            footer()
+            pdf.add_page()
+            header()
+            pdf.ln(10)
+            table_header()
+            pdf.set_font(base_font, '', 10)
+
+        if fill:
+            pdf.set_fill_color(*accent)
+            fill_flag = True
+        else:
+            pdf.set_fill_color(255,247,230)
+            fill_flag = True
+
+        pdf.set_x(left_margin)
+        desc = str(it.get('item_name', ''))[:60]
+        pdf.cell(300, row_h, desc, border=0, fill=fill_flag)
+        pdf.set_x(330)
+        pdf.cell(60, row_h, str(it.get('qty', '')), border=0, align='C', fill=fill_flag)
+        
+        def fmt(v):
+            try:
+                val = float(v)
+            except Exception:
+                val = 0.0
+            return (f"₹{val:.2f}") if unicode_font else (f"Rs.{val:.2f}")
+
+        pdf.set_x(390)
+        pdf.cell(80, row_h, fmt(it.get('rate', 0)), border=2, align='R', fill=fill_flag)
+        pdf.set_x(470)
+        pdf.cell(80, row_h, fmt(it.get('amount', 0)), border=2, align='R', ln=1, fill=fill_flag)
+        fill = not fill
+
+    t = bill.get('totals', {})
+    if pdf.get_y() + 140 + bottom_margin > pdf.h:
+        footer()
+        pdf.add_page()
+        header()
+        pdf.ln(10)
+
+    right_x = 410
+    pdf.set_x(right_x)
+    pdf.set_font(base_font, '', 11)
+    def fmt_total(v):
+        try:
+            val = float(v)
+        except Exception:
+            val = 0.0
+        return (f"₹{val:.2f}") if unicode_font else (f"Rs.{val:.2f}")
+
+    pdf.set_x(0)
+    pdf.cell(0,18,'______________________________________________________________________________________________',align='C',ln=1)
+    pdf.set_x(230)
+    pdf.set_fill_color(100,123,23)
+    pdf.cell(70, 18, 'Total Qty:', border=0,fill=True)
+    pdf.cell(70, 18, str(total_qty), border=0, align='R', ln=0,fill=True)
+    pdf.set_x(right_x)
+    pdf.cell(70, 18, 'Subtotal:', border=4)    
+    pdf.cell(70, 18, fmt_total(t.get('subtotal', 0)), border=0, align='R', ln=1)
+    pdf.set_x(right_x)
+    pdf.cell(70, 18, 'GST Total:', border=0)
+    pdf.cell(70, 18, fmt_total(gst_total), border=4, align='R', ln=1)
+    pdf.set_x(right_x)
+    pdf.cell(70, 18, 'Discount:', border=0)
+    pdf.cell(70, 18, fmt_total(t.get('discount', 0)), border=0, align='R', ln=1)
+
+    pdf.set_x(right_x)
+    pdf.set_fill_color(*primary)
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font(base_font, 'B', 13)
+    pdf.cell(70, 22, 'Total:', border=0, fill=True)
+    pdf.cell(70, 22, fmt_total(t.get('total', 0)), border=0, align='R', ln=1, fill=True)
+    pdf.set_text_color(0, 0, 0)
+
+    pdf.set_x(right_x)
+    pdf.set_font(base_font, '', 11)
+    pdf.cell(70, 18, 'Tender:', border=0)
+    pdf.cell(70, 18, fmt_total(t.get('tender', 0)), border=0, align='R', ln=1)
+    pdf.set_x(right_x)
+    pdf.cell(70, 18, 'Change:', border=0)
+    pdf.cell(70, 18, fmt_total(t.get('change', 0)), border=0, align='R', ln=1)
+    pdf.ln(12)
+    
+    qr_tmp_path = None
+    try:
+        if QR_AVAILABLE:
+            import json, tempfile
+            qr_payload = {
+                'bill_no': bill_no,
+                'date': bill.get('date'),
+                'total': t.get('total')
+            }
+            qr = qrcode.QRCode(box_size=4, border=1)
+            qr.add_data(json.dumps(qr_payload))
+            qr.make(fit=True)
+            img = qr.make_image(fill_color='black', back_color='white')
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
+            qr_tmp_path = tmp.name
+            tmp.close()
+            img.save(qr_tmp_path)
+            try:
+                pdf.image(qr_tmp_path, x=left_margin, y=pdf.get_y(), w=80)
+            except Exception:
+                pass
+    except Exception:
+        qr_tmp_path = None
+
+    pdf.set_x(left_margin + 90)
+    pdf.cell(240, 40, 'Received By: ______________________', ln=0)
+    pdf.set_x(350)
+    pdf.cell(240, 40, 'Authorised Signatory: ______________', ln=1)
+    pdf.ln(6)
+    pdf.set_x(left_margin)
+    pdf.set_font(base_font, '', 9)
+    pdf.multi_cell(0, 90, 'Bank Details: ABC Bank, IFSC: ABCD0123456, A/C: 1234567890', align='L')
+
+    try:
+        if qr_tmp_path and os.path.exists(qr_tmp_path):
+            os.unlink(qr_tmp_path)
+    except Exception:
+        pass
+
+    footer()
+
+    try:
+        s = pdf.output(dest='S')
+    except UnicodeEncodeError:
+        if not force_ascii:
+            return generate_pdf(bill, return_bytes=return_bytes, force_ascii=True)
+        raise
+
+    if isinstance(s, (bytes, bytearray)):
+        pdf_bytes = bytes(s)
+    else:
+        try:
+            pdf_bytes = s.encode('latin-1')
+        except Exception:
+            pdf_bytes = s.encode('utf-8', errors='replace')
+
+    if return_bytes:
+        return pdf_bytes
+
+    try:
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+        return pdf_path
+    except Exception:
+        return pdf_bytes
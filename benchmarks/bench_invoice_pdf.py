@@ -0,0 +1,64 @@
+"""
+Invoice PDF render benchmark
+Compares the original generate_pdf (baseline_invoice_pdf.py: fonts, logo
+and QR image prepared for every bill) with invoice_pdf.generate_pdf on the
+shared process-wide template. Each run uses a new bill number so the QR
+cache is not hit.
+
+Usage: python benchmarks/bench_invoice_pdf.py [--lines 10 50 100] [--runs 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import invoice_pdf
+from benchmarks import baseline_invoice_pdf
+
+
+def sample_bill(lines, bill_no='7001000123'):
+    items = [
+        {'item_name': f'Sample Item {i}', 'qty': 2, 'rate': 45.5, 'amount': 91.0, 'gst_amount': 4.55}
+        for i in range(lines)
+    ]
+    total = 91.0 * lines
+    return {
+        'bill_no': bill_no, 'date': '18/10/2026', 'time': '10:15:00',
+        'customer_name': 'Walk-in', 'customer_mobile': '9800000000', 'items': items,
+        'totals': {'subtotal': total, 'discount': 0, 'total': total, 'tender': total, 'change': 0},
+    }
+
+
+def time_ms(render, lines, runs):
+    """Median ms of render(bill, return_bytes=True) over fresh bills"""
+    bills = [sample_bill(lines, str(7001000000 + run)) for run in range(runs)]
+    samples = []
+    for bill in bills:
+        start = time.perf_counter()
+        render(bill, return_bytes=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    # Build the shared template outside the timed runs, as the app does on its first bill
+    invoice_pdf.get_invoice_template()
+    print(f"{'lines':>6} {'baseline ms':>12} {'shared template ms':>20} {'speedup':>8}")
+    for lines in args.lines:
+        before = time_ms(baseline_invoice_pdf.generate_pdf, lines, args.runs)
+        after = time_ms(invoice_pdf.generate_pdf, lines, args.runs)
+        print(f"{lines:>6} {before:>12.1f} {after:>20.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Benchmark suite for Billing App hot paths
+Times item search, checkout, invoice PDF rendering and report loading
+against a scratch database, stores the results as a baseline and compares
+later runs with it.
+
+Backends: mongomock (in-process, no server), mongo (MONGO_URI, in a scratch
+`<DB_NAME>_bench` database that is dropped afterwards) and sqlite (a
+temporary file). The quick scale takes a few minutes on mongomock; the
+full scale (1M items, 1M sale lines) is meant for a local mongod or SQLite.
+
+Usage:
+    python benchmarks/bench_suite.py --backend mongomock
+    python benchmarks/bench_suite.py --backend mongomock --save      # store as the baseline
+    python benchmarks/bench_suite.py --backend mongomock --compare   # exit 1 on a regression
+    python benchmarks/bench_suite.py --backend mongo --scale full --only search reports
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_invoice_pdf import sample_bill
+import synthetic_data
+
+BASELINE_DIR = os.path.join("benchmarks", "baselines")
+
+SCALES = {
+    "quick": {
+        "items": [1000, 10000],
+        "cart_sizes": [1, 10, 50],
+        "pdf_lines": [10, 50, 100],
+        "sale_lines": [10000],
+    },
+    "full": {
+        "items": [1000, 100000, 1000000],
+        "cart_sizes": [1, 10, 50, 200],
+        "pdf_lines": [10, 50, 100, 500],
+        "sale_lines": [10000, 1000000],
+    },
+}
+
+SEED = 1
+INSERT_BATCH = 10000
+
+
+# Backends
+def load_backend(name):
+    """Import the backend module and point it at a scratch database"""
+    if name == "sqlite":
+        os.environ["SQLITE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="billing_bench_"), "bench.db")
+        import sqlite_db
+        return sqlite_db
+    import mongo_db
+    if name == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock")
+        mongo_db._client = mongomock.MongoClient(tz_aware=True, tzinfo=mongo_db.INDIA_TZ)
+        # mongomock has no sessions; run checkouts as on a standalone mongod
+        mongo_db._run_transaction = lambda callback: callback(mongo_db.get_db(), None)
+    else:
+        mongo_db.DB_NAME = f"{mongo_db.DB_NAME}_bench"
+    return mongo_db
+
+
+def fresh_database(db_ops):
+    """Start a section from an empty database with the current schema"""
+    if db_ops.__name__ == "sqlite_db":
+        db_ops.close_connection()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_ops.SQLITE_DB_PATH + suffix):
+                os.remove(db_ops.SQLITE_DB_PATH + suffix)
+    else:
+        db_ops.get_client().drop_database(db_ops.DB_NAME)
+    db_ops.invalidate_catalog()
+    db_ops.init_database(force=True)
+
+
+def drop_database(db_ops):
+    if db_ops.__name__ == "sqlite_db":
+        db_ops.close_connection()
+        os.remove(db_ops.SQLITE_DB_PATH)
+    else:
+        db_ops.get_client().drop_database(db_ops.DB_NAME)
+
+
+def insert_docs(db_ops, table, docs):
+    """Bulk insert generated rows in batches, bypassing the per-row app paths"""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == INSERT_BATCH:
+            _insert_batch(db_ops, table, batch)
+            batch = []
+    if batch:
+        _insert_batch(db_ops, table, batch)
+
+
+def _insert_batch(db_ops, table, batch):
+    if db_ops.__name__ == "sqlite_db":
+        conn = db_ops.get_db()
+        with db_ops._transaction(conn):
+            db_ops._insert_many(conn, table, batch)
+    else:
+        db_ops.get_db()[table].insert_many(batch, ordered=False)
+
+
+# Synthetic data (see synthetic_data.py)
+def make_checkout(db_ops, bill_no, items, sold_at, rng):
+    """A checkout of `items` priced and laid out the way billing_page's save_bill does"""
+    cart = [(item, synthetic_data.weighted_choice(rng, synthetic_data.LINE_QTY)) for item in items]
+    customer = synthetic_data.make_customer(SEED, rng.randrange(10000))
+    return synthetic_data.make_bill(
+        bill_no, db_ops.STORE_CODE, sold_at, cart,
+        cashier=f"cashier{rng.randint(1, 3)}",
+        payment_mode=synthetic_data.weighted_choice(rng, synthetic_data.PAYMENT_MODES),
+        customer=customer
+    )
+
+
+# Timing
+def measure(func, runs):
+    """Call func `runs` times; returns the median and p95 in milliseconds"""
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "runs": runs,
+    }
+
+
+def time_once(func):
+    start = time.perf_counter()
+    func()
+    return {"median_ms": round((time.perf_counter() - start) * 1000, 3), "p95_ms": None, "runs": 1}
+
+
+# Benchmarks
+def bench_search(db_ops, scale, runs, record):
+    rng = random.Random(1)
+    for count in scale["items"]:
+        fresh_database(db_ops)
+        insert_docs(db_ops, "itemadd", (synthetic_data.make_item(SEED, i) for i in range(count)))
+        picks = [synthetic_data.make_item(SEED, rng.randrange(count)) for _ in range(runs)]
+        codes = [str(item["item_code"]) for item in picks]
+        # "Amul Milk 1L 123" is found by "Milk 1L 123"
+        names = [item["item_name"].split(" ", 1)[1] for item in picks]
+        prefixes = [item["sub_catagory"][:3].lower() for item in picks]
+        record(f"catalog_load items={count}", time_once(lambda: db_ops.search_item(codes[0])))
+        record(f"search_item[code] items={count}", measure(lambda i: db_ops.search_item(codes[i]), runs))
+        record(f"search_item[name] items={count}", measure(lambda i: db_ops.search_item(names[i]), runs))
+        record(f"search_items items={count}", measure(lambda i: db_ops.search_items(prefixes[i]), runs))
+
+
+def bench_checkout(db_ops, scale, runs, record):
+    rng = random.Random(2)
+    fresh_database(db_ops)
+    items = [synthetic_data.make_item(SEED, i) for i in range(1000)]
+    insert_docs(db_ops, "itemadd", items)
+    db_ops.search_item(str(items[0]["item_code"]))
+    bill_no = 9000000
+    for size in scale["cart_sizes"]:
+        checkouts = []
+        for _ in range(runs):
+            bill_no += 1
+            sold_at = dt.datetime.now(db_ops.INDIA_TZ)
+            checkouts.append(make_checkout(db_ops, bill_no, rng.sample(items, size), sold_at, rng))
+        record(f"save_bill cart={size}", measure(lambda i: db_ops.checkout(*checkouts[i]), runs))
+
+
+def bench_pdf(db_ops, scale, runs, record):
+    import invoice_pdf
+    invoice_pdf.get_invoice_template()
+    for lines in scale["pdf_lines"]:
+        bill = sample_bill(lines)
+        record(f"generate_pdf lines={lines}",
+               measure(lambda i: invoice_pdf.generate_pdf(bill, return_bytes=True), max(3, runs // 10)))
+
+
+def seed_sales(db_ops, sale_lines, rng, days=30):
+    """Insert bills of about five lines each spread over the last `days` days"""
+    items = [synthetic_data.make_item(SEED, i) for i in range(2000)]
+    today = dt.datetime.now(db_ops.INDIA_TZ).replace(hour=9, minute=0, second=0, microsecond=0)
+    bills, lines = [], []
+    bill_no = 1000000
+    remaining = sale_lines
+    while remaining > 0:
+        bill_no += 1
+        size = min(remaining, rng.randint(1, 9))
+        sold_at = today - dt.timedelta(days=rng.randrange(days), minutes=rng.randrange(12 * 60))
+        bill, bill_lines, _ = make_checkout(db_ops, bill_no, rng.sample(items, size), sold_at, rng)
+        bills.append(bill)
+        lines.extend(bill_lines)
+        remaining -= size
+        if len(lines) >= INSERT_BATCH:
+            insert_docs(db_ops, "billdata", bills)
+            insert_docs(db_ops, "saledetails", lines)
+            bills, lines = [], []
+    insert_docs(db_ops, "billdata", bills)
+    insert_docs(db_ops, "saledetails", lines)
+    if db_ops.__name__ == "mongo_db" and db_ops.get_client().__module__.startswith("mongomock"):
+        # mongomock cannot run the rebuild pipeline ($dateFromString); add
+        # each bill through the checkout-time rollup writes instead
+        rollups_from_history(db_ops)
+    else:
+        db_ops.rebuild_rollups()
+
+
+def rollups_from_history(db_ops):
+    db = db_ops.get_db()
+    lines_by_bill = {}
+    for line in db.saledetails.find({}, {"_id": 0}):
+        lines_by_bill.setdefault(line["bill_no"], []).append(line)
+    for bill in db.billdata.find({}, {"_id": 0}):
+        db_ops._write_rollups(db, bill, lines_by_bill.get(bill["bill_no"], []))
+
+
+def load_reports(db_ops):
+    """Everything reports_page reads on first load and on its default views"""
+    today = dt.date.today()
+    start = today - dt.timedelta(days=29)
+    db_ops.get_sales_summary(store_code=db_ops.STORE_CODE)
+    db_ops.get_sales_summary(store_code=db_ops.STORE_CODE, start_day=today.isoformat(), end_day=today.isoformat())
+    db_ops.get_cashiers()
+    db_ops.get_sales_report(start, today, db_ops.STORE_CODE)
+    db_ops.get_daily_sales_report(start, today, db_ops.STORE_CODE)
+    db_ops.get_bills_page(projection=['bill_no', 'date', 'time', 'amount', 'cust_name', 'payment_mode', 'cashier'])
+    db_ops.get_sale_details_page(filters={'date': today.strftime('%d/%m/%Y')})
+    db_ops.get_category_sales(store_code=db_ops.STORE_CODE)
+
+
+def bench_reports(db_ops, scale, runs, record):
+    rng = random.Random(3)
+    for count in scale["sale_lines"]:
+        fresh_database(db_ops)
+        seed_sales(db_ops, count, rng)
+        record(f"reports_load lines={count}", measure(lambda i: load_reports(db_ops), max(5, runs // 5)))
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "checkout": bench_checkout,
+    "pdf": bench_pdf,
+    "reports": bench_reports,
+}
+
+
+# Baselines
+def baseline_path(backend, scale):
+    return os.path.join(BASELINE_DIR, f"{backend}-{scale}.json")
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Print each result against the baseline; returns the regressed names"""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>12} {result['median_ms']:>10.2f}      new")
+            continue
+        now, before = result["median_ms"], base["median_ms"]
+        change = (now - before) / before if before else 0.0
+        regressed = change > threshold and now - before > min_delta_ms
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<36} {before:>12.2f} {now:>10.2f} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Billing App benchmark suite")
+    parser.add_argument("--backend", choices=["mongomock", "mongo", "sqlite"], default="mongomock")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these groups")
+    parser.add_argument("--runs", type=int, default=100, help="timed calls per latency benchmark")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare with the baseline, exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before a regression (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    args = parser.parse_args(argv)
+
+    db_ops = load_backend(args.backend)
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        p95 = f"{result['p95_ms']:.2f}" if result["p95_ms"] is not None else "-"
+        print(f"{name:<36} median {result['median_ms']:>9.2f} ms   p95 {p95:>9} ms")
+
+    try:
+        for group in args.only or BENCHMARKS:
+            BENCHMARKS[group](db_ops, SCALES[args.scale], args.runs, record)
+    finally:
+        if not args.keep:
+            drop_database(db_ops)
+
+    path = baseline_path(args.backend, args.scale)
+    status = 0
+    if args.compare:
+        if not os.path.exists(path):
+            sys.exit(f"No baseline at {path}; run with --save first")
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            status = 1
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        if os.path.exists(path):
+            with open(path) as f:
+                results = dict(json.load(f)["results"], **results)
+        with open(path, "w") as f:
+            json.dump({
+                "backend": args.backend,
+                "scale": args.scale,
+                "recorded_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
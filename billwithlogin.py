@@ -5,14 +5,34 @@ import hashlib
 from streamlit_searchbox import st_searchbox
 import os
 import io
-try:
-    from fpdf import FPDF
-    FPDF_AVAILABLE = True
-except Exception:
-    FPDF_AVAILABLE = False
 from zoneinfo import ZoneInfo
-# Import MongoDB utilities
-import mongo_db as db_ops
+# Invoice PDFs are rendered from a template prepared once per process
+from invoice_pdf import generate_pdf
+# Import the configured storage backend (MongoDB or SQLite, see storage.py)
+import storage
+from cart import Cart, parse_scans
+db_ops = storage.get_backend()
+
+# Offline-first tills queue checkouts locally and sync them in the background,
+# and can start, log in and number bills while MongoDB is unreachable
+OFFLINE_ENABLED = storage.STORAGE_BACKEND == "mongo" and os.getenv("OFFLINE_MODE", "off") != "off"
+if OFFLINE_ENABLED:
+    import offline_queue
+    checkout_bill = offline_queue.checkout
+    next_invoice_no = offline_queue.next_invoice_no
+    init_backend = offline_queue.init_database
+    verify_backend_login = offline_queue.verify_login
+    offline_queue.start_sync_worker()
+else:
+    checkout_bill = db_ops.checkout
+    next_invoice_no = db_ops.next_invoice_no
+    init_backend = db_ops.init_database
+    verify_backend_login = db_ops.verify_login
+
+# Per-call DB metrics in Prometheus format (DB_METRICS_PORT / DB_METRICS_FILE)
+if storage.STORAGE_BACKEND == "mongo":
+    import db_metrics
+    db_metrics.start_exporters()
 
 # India timezone
 INDIA_TZ = ZoneInfo("Asia/Kolkata")
@@ -39,11 +59,10 @@ if 'username' not in st.session_state:
     st.session_state.username = ""
 if 'user_role' not in st.session_state:
     st.session_state.user_role = ""
-if 'cart_items' not in st.session_state:
-    st.session_state.cart_items = []
-if 'invoice_no' not in st.session_state:
-    invoice_no = db_ops.get_max_invoice_no()
-    st.session_state.invoice_no = invoice_no
+if 'cart' not in st.session_state:
+    st.session_state.cart = Cart()
+if 'last_invoice_no' not in st.session_state:
+    st.session_state.last_invoice_no = None
 if 'customer_name' not in st.session_state:
     st.session_state.customer_name = ""
 if 'customer_mobile' not in st.session_state:
@@ -53,13 +72,13 @@ if 'payment_mode' not in st.session_state:
 
 # Database functions
 def init_database():
-    """Initialize MongoDB database with required collections"""
-    db_ops.init_database()
+    """Initialize the database with required collections/tables"""
+    init_backend()
 
 def verify_login(username, password):
     """Verify user credentials"""
     hashed_password = hashlib.sha256(password.encode()).hexdigest()
-    result = db_ops.verify_login(username, hashed_password)
+    result = verify_backend_login(username, hashed_password)
     
     if result:
         return (result.get('username'), result.get('role'))
@@ -81,8 +100,10 @@ def get_all_items():
         return pd.DataFrame(items)
     return pd.DataFrame()
 
-def save_bill(bill_data, cart_items):
-    """Save bill to database"""
+def save_bill(bill_data, cart_items, invoice_data=None, sold_at=None):
+    """Save bill, sale details, invoice and stock updates in one checkout"""
+    if sold_at is None:
+        sold_at = dt.datetime.strptime(f"{bill_data[0]} {bill_data[1]}", '%d/%m/%Y %H:%M:%S').replace(tzinfo=INDIA_TZ)
     # Prepare bill document
     bill_doc = {
         'date': bill_data[0],
@@ -92,7 +113,9 @@ def save_bill(bill_data, cart_items):
         'cust_name': bill_data[4],
         'cust_mobile': bill_data[5],
         'payment_mode': bill_data[6],
-        'cashier': bill_data[7]
+        'cashier': bill_data[7],
+        'store_code': db_ops.STORE_CODE,
+        'sold_at': sold_at
     }
     
     # Convert cart items to sale details documents
@@ -118,27 +141,16 @@ def save_bill(bill_data, cart_items):
             'sub_catagory': item[16],
             'brand': item[17],
             'expiry_date': item[18],
-            'store_code': item[19],
+            'store_code': bill_doc['store_code'],
             'store_name': item[20],
             'vendor_name': item[21],
-            'vendor_gst': item[22]
+            'vendor_gst': item[22],
+            'sold_at': sold_at
         }
         sale_details.append(sale_detail)
     
-    # Save to MongoDB
-    db_ops.save_bill(bill_doc, sale_details)
-    
-    # Update SOH (Stock on Hand)
-    for item in cart_items:
-        item_code = item[3]
-        qty_sold = item[5]
-        
-        # Get current item
-        current_item = db_ops.search_item(str(item_code))
-        if current_item:
-            new_soh = current_item.get('soh', 0) - qty_sold
-            db_ops.update_item_soh(item_code, new_soh)
-            print(f"SOH Updated for item {item_code}: {new_soh}")
+    # Save bill, sale details, invoice and SOH decrements together
+    checkout_bill(bill_doc, sale_details, invoice_data)
 
 def search_catagory_func(searchc: str):
     """Search function for category"""
@@ -156,333 +168,15 @@ def search_vendor_func(searchv: str):
     """Search function for vendor"""
     return db_ops.search_vendor(searchv)
 
-def generate_pdf(bill: dict, return_bytes: bool = False, force_ascii: bool = False):
-    """Generate a professional PDF invoice. Returns bytes when `return_bytes=True`."""
-    bill_no = str(bill.get('bill_no', 'invoice'))
-    pdf_path = None
-    if not return_bytes:
-        os.makedirs('bills', exist_ok=True)
-        pdf_path = os.path.join('bills', f"{bill_no}.pdf")
-
-    # Text fallback
-    if not FPDF_AVAILABLE:
-        txt = []
-        txt.append('Alam Megastore\n')
-        txt.append(f"Bill No: {bill.get('bill_no')}  Date: {bill.get('date')} {bill.get('time')}\n")
-        txt.append(f"Customer: {bill.get('customer_name')}  Mobile: {bill.get('customer_mobile')}\n\n")
-        txt.append('Description\tQty\tRate\tAmount\n')
-        for it in bill.get('items', []):
-            txt.append(f"{it.get('item_name')}\t{it.get('qty')}\t{it.get('rate')}\t{it.get('amount')}\n")
-        try:
-            total_qty_txt = sum(int(float(it.get('qty', 0) or 0)) for it in bill.get('items', []))
-        except Exception:
-            total_qty_txt = 0
-        t = bill.get('totals', {})
-        txt.append(f"\nTotal Quantity: {total_qty_txt}\n")
-        txt.append(f"Subtotal: {t.get('subtotal')}  Discount: {t.get('discount')}  Total: {t.get('total')}\n")
-        txt_str = ''.join(txt)
-        if return_bytes:
-            return txt_str.encode('utf-8')
-        os.makedirs('bills', exist_ok=True)
-        txt_path = os.path.join('bills', f"{bill_no}.txt")
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write(txt_str)
-        return txt_path
-
-    # Initialize PDF
-    pdf = FPDF(unit='pt', format='A4')
-    pdf.add_page()
-    pdf.set_auto_page_break(False)
-
-    # Try to register Unicode TTF for ₹ support
-    unicode_font = False
-    font_candidates = [
-        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-        '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
-        'DejaVuSans.ttf',
-    ]
-    font_path = None
-    for p in font_candidates:
-        if os.path.exists(p):
-            font_path = p
-            break
-    if font_path:
-        try:
-            pdf.add_font('DejaVu', '', fname=font_path, uni=True)
-            for style in ('B', 'I', 'BI'):
-                try:
-                    pdf.add_font('DejaVu', style, fname=font_path, uni=True)
-                except Exception:
-                    pass
-            unicode_font = True
-        except Exception:
-            unicode_font = False
-
-    if force_ascii:
-        unicode_font = False
-
-    base_font = 'DejaVu' if unicode_font else 'Helvetica'
-
-    # Layout settings
-    primary = (0,40,30)
-    accent = (202, 155, 26)
-    header_h = 80
-    left_margin = 30
-    right_margin = 30
-    bottom_margin = 50
-    row_h = 18
-
-    logo_path = 'logo.png'
-
-    try:
-        import qrcode
-        from PIL import Image
-        QR_AVAILABLE = True
-    except Exception:
-        QR_AVAILABLE = False
-
-    def header():
-        pdf.set_fill_color(*primary)
-        pdf.rect(0, 0, pdf.w, header_h, 'F')
-        if os.path.exists(logo_path):
-            try:
-                pdf.image(logo_path, x=90, y=5, w=240, h=60)
-            except Exception:
-                pass
-        pdf.set_text_color(255, 255, 220)
-        pdf.set_font(base_font, 'B', 22)
-        pdf.set_xy(90, 30)
-        pdf.set_x(30)
-        pdf.set_font(base_font, 'B', 12)
-        pdf.cell(30, 90, 'Relling Bihibaray | Dist-Darjeeling | Mobile: 9832025468', ln=1)
-        bw = 150
-        bh = 44
-        pdf.set_fill_color(255, 255, 255)
-        pdf.rect(pdf.w - bw - 30, 20, bw, bh, 'F')
-        pdf.set_xy(pdf.w - bw - 30, 28)
-        pdf.set_text_color(*primary)
-        pdf.set_font(base_font, 'B', 12)
-        pdf.cell(bw, 12, 'INVOICE', align='C', ln=1)
-        pdf.set_font(base_font, '', 9)
-        pdf.set_xy(pdf.w - bw - 30, 44)
-        pdf.cell(bw, 10, f"Bill No: {bill_no}", align='C')
-        pdf.set_text_color(0, 0, 0)
-
-    def table_header():
-        pdf.set_fill_color(*primary)
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font(base_font, 'B', 11)
-        pdf.set_x(left_margin)
-        pdf.cell(300, 22, 'Description', border=0, fill=True)
-        pdf.set_x(330)
-        pdf.cell(60, 22, 'Qty', border=0, align='C', fill=True)
-        pdf.set_x(390)
-        pdf.cell(80, 22, 'Rate', border=0, align='R', fill=True)
-        pdf.set_x(470)
-        pdf.cell(80, 22, 'Amount', border=0, align='R', ln=1, fill=True)
-        pdf.set_text_color(0, 0, 0)
-
-    def footer():
-        page_no = pdf.page_no()
-        pdf.set_xy(0, pdf.h - bottom_margin + 10)
-        pdf.set_font(base_font, 'I', 8)
-        pdf.set_text_color(120, 120, 120)
-        pdf.cell(0, 10, f'Page {page_no}', align='C')
-        pdf.set_text_color(0, 0, 0)
-
-    header()
-    pdf.ln(10)
-    pdf.set_font(base_font, 'B', 11)
-    pdf.set_x(left_margin)
-    pdf.cell(80, 70, 'Customer:', ln=0)
-    pdf.set_font(base_font, '', 11)
-    pdf.cell(260, 70, f"{bill.get('customer_name','')}  {bill.get('customer_mobile','')}", ln=1)
-    pdf.set_x(left_margin)
-    pdf.set_font(base_font, 'B', 11)
-    pdf.cell(80, 2, 'Date & Time:', ln=0)
-    pdf.set_font(base_font, '', 11)
-    pdf.cell(260, 2, f"{bill.get('date','')}      {bill.get('time','')}", ln=1)
-    pdf.ln(6)
-
-    table_header()
-    pdf.set_font(base_font, '', 10)
-    fill = False
-    items = bill.get('items', [])
-    
-    gst_total = 0.0
-    for it in items:
-        try:
-            gst_total += float(it.get('gst_amount', 0) or 0)
-        except Exception:
-            pass
-
-    total_qty = 0
-    for it in items:
-        try:
-            total_qty += int(float(it.get('qty', 0) or 0))
-        except Exception:
-            pass
-
-    for it in items:
-        if pdf.get_y() + row_h + bottom_margin > pdf.h:
-            footer()
-            pdf.add_page()
-            header()
-            pdf.ln(10)
-            table_header()
-            pdf.set_font(base_font, '', 10)
-
-        if fill:
-            pdf.set_fill_color(*accent)
-            fill_flag = True
-        else:
-            pdf.set_fill_color(255,247,230)
-            fill_flag = True
-
-        pdf.set_x(left_margin)
-        desc = str(it.get('item_name', ''))[:60]
-        pdf.cell(300, row_h, desc, border=0, fill=fill_flag)
-        pdf.set_x(330)
-        pdf.cell(60, row_h, str(it.get('qty', '')), border=0, align='C', fill=fill_flag)
-        
-        def fmt(v):
-            try:
-                val = float(v)
-            except Exception:
-                val = 0.0
-            return (f"₹{val:.2f}") if unicode_font else (f"Rs.{val:.2f}")
-
-        pdf.set_x(390)
-        pdf.cell(80, row_h, fmt(it.get('rate', 0)), border=2, align='R', fill=fill_flag)
-        pdf.set_x(470)
-        pdf.cell(80, row_h, fmt(it.get('amount', 0)), border=2, align='R', ln=1, fill=fill_flag)
-        fill = not fill
-
-    t = bill.get('totals', {})
-    if pdf.get_y() + 140 + bottom_margin > pdf.h:
-        footer()
-        pdf.add_page()
-        header()
-        pdf.ln(10)
-
-    right_x = 410
-    pdf.set_x(right_x)
-    pdf.set_font(base_font, '', 11)
-    def fmt_total(v):
-        try:
-            val = float(v)
-        except Exception:
-            val = 0.0
-        return (f"₹{val:.2f}") if unicode_font else (f"Rs.{val:.2f}")
-
-    pdf.set_x(0)
-    pdf.cell(0,18,'______________________________________________________________________________________________',align='C',ln=1)
-    pdf.set_x(230)
-    pdf.set_fill_color(100,123,23)
-    pdf.cell(70, 18, 'Total Qty:', border=0,fill=True)
-    pdf.cell(70, 18, str(total_qty), border=0, align='R', ln=0,fill=True)
-    pdf.set_x(right_x)
-    pdf.cell(70, 18, 'Subtotal:', border=4)    
-    pdf.cell(70, 18, fmt_total(t.get('subtotal', 0)), border=0, align='R', ln=1)
-    pdf.set_x(right_x)
-    pdf.cell(70, 18, 'GST Total:', border=0)
-    pdf.cell(70, 18, fmt_total(gst_total), border=4, align='R', ln=1)
-    pdf.set_x(right_x)
-    pdf.cell(70, 18, 'Discount:', border=0)
-    pdf.cell(70, 18, fmt_total(t.get('discount', 0)), border=0, align='R', ln=1)
-
-    pdf.set_x(right_x)
-    pdf.set_fill_color(*primary)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font(base_font, 'B', 13)
-    pdf.cell(70, 22, 'Total:', border=0, fill=True)
-    pdf.cell(70, 22, fmt_total(t.get('total', 0)), border=0, align='R', ln=1, fill=True)
-    pdf.set_text_color(0, 0, 0)
-
-    pdf.set_x(right_x)
-    pdf.set_font(base_font, '', 11)
-    pdf.cell(70, 18, 'Tender:', border=0)
-    pdf.cell(70, 18, fmt_total(t.get('tender', 0)), border=0, align='R', ln=1)
-    pdf.set_x(right_x)
-    pdf.cell(70, 18, 'Change:', border=0)
-    pdf.cell(70, 18, fmt_total(t.get('change', 0)), border=0, align='R', ln=1)
-    pdf.ln(12)
-    
-    qr_tmp_path = None
-    try:
-        if QR_AVAILABLE:
-            import json, tempfile
-            qr_payload = {
-                'bill_no': bill_no,
-                'date': bill.get('date'),
-                'total': t.get('total')
-            }
-            qr = qrcode.QRCode(box_size=4, border=1)
-            qr.add_data(json.dumps(qr_payload))
-            qr.make(fit=True)
-            img = qr.make_image(fill_color='black', back_color='white')
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            qr_tmp_path = tmp.name
-            tmp.close()
-            img.save(qr_tmp_path)
-            try:
-                pdf.image(qr_tmp_path, x=left_margin, y=pdf.get_y(), w=80)
-            except Exception:
-                pass
-    except Exception:
-        qr_tmp_path = None
-
-    pdf.set_x(left_margin + 90)
-    pdf.cell(240, 40, 'Received By: ______________________', ln=0)
-    pdf.set_x(350)
-    pdf.cell(240, 40, 'Authorised Signatory: ______________', ln=1)
-    pdf.ln(6)
-    pdf.set_x(left_margin)
-    pdf.set_font(base_font, '', 9)
-    pdf.multi_cell(0, 90, 'Bank Details: ABC Bank, IFSC: ABCD0123456, A/C: 1234567890', align='L')
-
-    try:
-        if qr_tmp_path and os.path.exists(qr_tmp_path):
-            os.unlink(qr_tmp_path)
-    except Exception:
-        pass
-
-    footer()
-
-    try:
-        s = pdf.output(dest='S')
-    except UnicodeEncodeError:
-        if not force_ascii:
-            return generate_pdf(bill, return_bytes=return_bytes, force_ascii=True)
-        raise
-
-    if isinstance(s, (bytes, bytearray)):
-        pdf_bytes = bytes(s)
-    else:
-        try:
-            pdf_bytes = s.encode('latin-1')
-        except Exception:
-            pdf_bytes = s.encode('utf-8', errors='replace')
-
-    if return_bytes:
-        return pdf_bytes
-
-    try:
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_bytes)
-        return pdf_path
-    except Exception:
-        return pdf_bytes
-
 def logout():
     """Logout user"""
     st.session_state.logged_in = False
     st.session_state.username = ""
     st.session_state.user_role = ""
-    st.session_state.cart_items = []
+    st.session_state.cart.clear()
     st.rerun()
 
-# Initialize database
+# Initialize database (the backend applies the schema once per process)
 init_database()
 
 # Login Page
@@ -541,11 +235,11 @@ def main_app():
         
         if st.session_state.user_role == "admin":
             page = st.radio("Navigation", 
-                            ["🏠 Billing", "📦 Inventory", "➕ Add New Items","📊 Reports", "🔍 Search Bills", "👥 User Management","👥 Vendor Management"],
+                            ["🏠 Billing", "📦 Inventory", "📥 Goods Received", "➕ Add New Items","📊 Reports", "🔍 Search Bills", "👥 User Management","👥 Vendor Management"],
                             label_visibility="collapsed")
         elif st.session_state.user_role == "manager":
             page = st.radio("Navigation", 
-                            ["🏠 Billing", "📦 Inventory","➕ Add New Items","📊 Reports", "🔍 Search Bills","👥 Vendor Management"],
+                            ["🏠 Billing", "📦 Inventory", "📥 Goods Received", "➕ Add New Items","📊 Reports", "🔍 Search Bills","👥 Vendor Management"],
                             label_visibility="collapsed")
         else:
             page = st.radio("Navigation", 
@@ -553,14 +247,42 @@ def main_app():
                             label_visibility="collapsed")
         
         st.markdown("---")
-        st.info(f"**Bill No:** {st.session_state.invoice_no}")
+        if st.session_state.last_invoice_no:
+            st.info(f"**Last Bill No:** {st.session_state.last_invoice_no}")
         st.info(f"**Date:** {now_in_india().strftime('%d/%m/%Y')}")
         st.info(f"**Time:** {now_in_india().strftime('%H:%M:%S')}")
-    
+
+        if OFFLINE_ENABLED:
+            queue_status = offline_queue.get_queue_status()
+            if queue_status['pending']:
+                st.warning(f"📴 {queue_status['pending']} bill(s) waiting to sync")
+            if queue_status['conflicts']:
+                st.error(f"⚠️ {len(queue_status['conflicts'])} bill(s) failed to sync")
+                if st.session_state.user_role == "admin":
+                    st.dataframe(pd.DataFrame(queue_status['conflicts']), hide_index=True)
+
+        if st.session_state.user_role == "admin":
+            with st.expander("🗄️ DB Connection Pool"):
+                st.json(db_ops.get_pool_stats())
+            with st.expander("📦 Item Catalog Cache"):
+                st.json(db_ops.get_catalog_stats())
+            if storage.STORAGE_BACKEND == "mongo":
+                with st.expander("⏱️ DB Call Metrics"):
+                    metrics = db_ops.get_call_metrics()
+                    if metrics:
+                        st.dataframe(
+                            pd.DataFrame(metrics)[['function', 'calls', 'avg_ms', 'p95_ms', 'round_trips', 'documents', 'kb_received', 'errors']],
+                            hide_index=True
+                        )
+                    else:
+                        st.caption("No database calls recorded yet")
+
     if page == "🏠 Billing":
         billing_page()
     elif page == "📦 Inventory":
         inventory_page()
+    elif page == "📥 Goods Received":
+        goods_received_page()
     elif page == "➕ Add New Items":
         add_items()    
     elif page == "📊 Reports":
@@ -587,9 +309,14 @@ def billing_page():
             if st.button("🔍 Search Customer"):
                 result = db_ops.search_customer_by_mobile(customer_mobile)
                 if result:
-                    st.session_state.customer_name = result.get('cust_name', '')
+                    st.session_state.customer_name = result.get('cust_name') or ''
                     st.session_state.customer_mobile = result.get('cust_mobile', '')
-                    st.success(f"Customer found: {result.get('cust_name', '')}")
+                    st.success(f"Customer found: {result.get('cust_name') or ''}")
+                    last_visit = result.get('last_visit')
+                    st.caption(
+                        f"Visits: {result.get('visits', 0)} | Lifetime spend: ₹{result.get('lifetime_spend', 0):.2f}"
+                        + (f" | Last visit: {last_visit:%d/%m/%Y}" if last_visit else "")
+                    )
                 else:
                     @st.dialog("New Customer Entry")
                     def addcust():
@@ -633,61 +360,34 @@ def billing_page():
                 search_term = item_search or selected_item
                 i = search_item(search_term)
                 if i:
-                    item_code = i.get('item_code')
-                    item_name = i.get('item_name')
-                    rate = i.get('rate')
-                    gstin = i.get('gstin')
-                    discount = i.get('discount')
-                    soh = i.get('soh')
-                    cost = i.get('cost')
-                    
-                    # Calculate amounts
-                    total_rate = rate * quantity
-                    dis_amount = total_rate * discount / 100
-                    amount = total_rate - dis_amount
-                    gst_amount = amount * gstin / 100
-                    gross_amount = amount
-                    net_amount = amount - gst_amount
-                    costnew = (cost * quantity)
-                    
-                    # Add to cart
-                    cart_item = {
-                        'item_code': item_code,
-                        'item_name': item_name,
-                        'qty': quantity,
-                        'rate': rate,
-                        'gstin': gstin,
-                        'gst_amount': gst_amount,
-                        'discount': discount,
-                        'dis_amount': dis_amount,
-                        'gross_amount': gross_amount,
-                        'amount': net_amount,
-                        'cost': costnew,
-                        'catagory': i.get('catagory'),
-                        'sub_catagory': i.get('sub_catagory'),
-                        'brand': i.get('brand'),
-                        'expiry_date': i.get('expiry_date'),
-                        'store_code': i.get('store_code'),
-                        'store_name': i.get('store_name'),
-                        'vendor_name': i.get('vendor_name'),
-                        'vendor_gst': i.get('vendor_gst')
-                    }
-                    st.session_state.cart_items.append(cart_item)
-                    st.success(f"✅ Added {item_name} to cart!") 
+                    # A repeated scan adds to the item's existing line
+                    st.session_state.cart.add(i, quantity)
+                    st.success(f"✅ Added {i.get('item_name')} to cart!") 
                     item_reset()
                     st.rerun()
                 else:
                     st.error("❌ Item not found!")
-    
+
+    # Batch scan: the whole burst is looked up at once and added in this run,
+    # above the cart display, so it needs no st.rerun()
+    with st.form("batch_scan", clear_on_submit=True):
+        scan_text = st.text_area(
+            "📦 Batch Scan",
+            placeholder="Scan or paste item codes, one per line or space separated (3*1001 adds 3 of item 1001)"
+        )
+        if st.form_submit_button("➕ Add All to Cart", width='stretch'):
+            unknown = st.session_state.cart.add_scans(scan_text, db_ops.get_items_by_codes)
+            if unknown:
+                st.error(f"❌ Items not found: {', '.join(unknown)}")
+
     # Display Cart
     st.markdown("---")
     st.subheader("🛒 Shopping Cart")
     
-    if st.session_state.cart_items:
-        cart_df = pd.DataFrame(st.session_state.cart_items)
-        
+    cart = st.session_state.cart
+    if cart:
         st.dataframe(
-            cart_df[['item_code', 'item_name', 'qty', 'rate', 'gst_amount','discount', 'amount']],
+            cart.table(),
             width='stretch',
             hide_index=True,
             column_config={
@@ -701,16 +401,35 @@ def billing_page():
             }
         )
         
-        # Totals
-        total_qty = sum(item['qty'] for item in st.session_state.cart_items)
-        total_discount = sum(item['dis_amount'] for item in st.session_state.cart_items)
-        total_amount = sum(item['gross_amount'] for item in st.session_state.cart_items)
+        # Change or remove a line
+        line_codes = [line.item_code for line in cart]
+        edit_col1, edit_col2, edit_col3, edit_col4 = st.columns([3, 1, 1, 1])
+        with edit_col1:
+            edit_code = st.selectbox(
+                "Cart Line", line_codes,
+                format_func=lambda code: f"{code} - {cart[code].item_name}"
+            )
+        with edit_col2:
+            edit_qty = st.number_input("New Qty", min_value=1, value=int(cart[edit_code].qty))
+        with edit_col3:
+            if st.button("✏️ Update Qty", width='stretch'):
+                cart.set_qty(edit_code, edit_qty)
+                st.rerun()
+        with edit_col4:
+            if st.button("❌ Remove Line", width='stretch'):
+                cart.remove(edit_code)
+                st.rerun()
+
+        # Totals (kept up to date by the cart on every change)
+        total_qty = cart.total_qty
+        total_discount = cart.total_discount
+        total_amount = cart.total_amount
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("Total Items", total_qty)
         with col2:
-            st.metric("Sub Total", f"₹{sum(item['gross_amount'] for item in st.session_state.cart_items):.2f}")
+            st.metric("Sub Total", f"₹{cart.subtotal:.2f}")
         with col3:
             st.metric("Discount", f"₹{total_discount:.2f}")
         with col4:
@@ -722,7 +441,7 @@ def billing_page():
         
         with btn_col1:
             if st.button("🗑️ Clear Cart", width='stretch'):
-                st.session_state.cart_items = []
+                cart.clear()
                 st.rerun()
         
         with btn_col2:
@@ -730,17 +449,17 @@ def billing_page():
         
         with btn_col3:
             if st.button("💾 Save & Print Bill", type="primary", width='stretch'):
-                if not st.session_state.cart_items:
+                if not cart:
                     st.error("Cart is empty!")
                 else:
                     # Generate bill
-                    current_date = now_in_india().strftime('%d/%m/%Y')
-                    current_time = now_in_india().strftime('%H:%M:%S')
-                    bill_no = f"{st.session_state.invoice_no}"
+                    sold_at = now_in_india()
+                    current_date = sold_at.strftime('%d/%m/%Y')
+                    current_time = sold_at.strftime('%H:%M:%S')
+                    # Numbered at checkout, so an abandoned page or session uses no number
+                    bill_no = f"{next_invoice_no()}"
                     
-                    # Insert invoice
-                    invoice_data = {'bill_no': bill_no}
-                    db_ops.insert_invoice(invoice_data)
+                    invoice_data = {'bill_no': bill_no, 'store_code': db_ops.STORE_CODE, 'terminal_id': db_ops.TERMINAL_ID}
                     
                     # Prepare bill data
                     bill_data = (
@@ -751,19 +470,19 @@ def billing_page():
                     
                     # Prepare sale details
                     sale_details = []
-                    for item in st.session_state.cart_items:
+                    for item in cart:
                         sale_detail = (
                             current_date, current_time, bill_no,
-                            item['item_code'], item['item_name'], item['qty'],
-                            item['rate'], item['gstin'], item['gst_amount'], item['discount'],
-                            item['dis_amount'], item['gross_amount'], item['amount'], 0,
-                            item['cost'],item['catagory'],item['sub_catagory'],item['brand'],item['expiry_date'],
-                            item['store_code'],item['store_name'],item['vendor_name'],item['vendor_gst']
+                            item.item_code, item.item_name, item.qty,
+                            item.rate, item.gstin, item.gst_amount, item.discount,
+                            item.dis_amount, item.gross_amount, item.amount, 0,
+                            item.cost,item.catagory,item.sub_catagory,item.brand,item.expiry_date,
+                            item.store_code,item.store_name,item.vendor_name,item.vendor_gst
                         )
                         sale_details.append(sale_detail)
                     
                     # Save to database
-                    save_bill(bill_data, sale_details)
+                    save_bill(bill_data, sale_details, invoice_data, sold_at)
                     
                     # Generate bill text
                     bill_text = f"""
@@ -783,8 +502,8 @@ def billing_page():
     =====================================
     """
                     
-                    for item in st.session_state.cart_items:
-                        bill_text += f"\n   {item['item_name'][:20]:20}{item['qty']:3} {item['rate']:7.2f} {item['amount']:8.2f}"
+                    for item in cart:
+                        bill_text += f"\n   {item.item_name[:20]:20}{item.qty:3} {item.rate:7.2f} {item.amount:8.2f}"
                     
                     bill_text += f"""
     =====================================
@@ -810,14 +529,14 @@ def billing_page():
                         'cashier': st.session_state.username,
                         'items': [
                             {
-                                'item_name': it.get('item_name'),
-                                'qty': it.get('qty'),
-                                'rate': it.get('rate'),
-                                'amount': it.get('amount')
-                            } for it in st.session_state.cart_items
+                                'item_name': it.item_name,
+                                'qty': it.qty,
+                                'rate': it.rate,
+                                'amount': it.amount
+                            } for it in cart
                         ],
                         'totals': {
-                            'subtotal': sum(it.get('gross_amount', 0) for it in st.session_state.cart_items),
+                            'subtotal': cart.subtotal,
                             'discount': total_discount,
                             'total': total_amount,
                             'tender': tender_amount,
@@ -848,8 +567,8 @@ def billing_page():
                     billprint()
                     
                     # Reset for next bill
-                    st.session_state.invoice_no = db_ops.get_max_invoice_no()
-                    st.session_state.cart_items = []
+                    st.session_state.last_invoice_no = bill_no
+                    cart.clear()
                     st.session_state.customer_name = ""
                     st.session_state.customer_mobile = ""
                     st.session_state.item_search = ""
@@ -882,7 +601,7 @@ def inventory_page():
                             mrp=st.text_input("MRP",value=str(i.get('rate')))
                             gstv=st.text_input("Gstin%",value=str(i.get('gstin')))
                             dis=st.text_input("Discount%",value=str(i.get('discount')))
-                            sohinhand=st.number_input("SOH",value=i.get('soh',0))
+                            st.number_input("SOH",value=i.get('soh',0),disabled=True)
                             costp=st.number_input("COST",value=i.get('cost',0))
                         with col2:
                             cat=st.text_input("catagory",value=i.get('catagory',''))
@@ -894,13 +613,11 @@ def inventory_page():
 
                         sohin=st.number_input("SOH INPUT",value=0)
                         if st.button("Click to Update Item Details"):
-                            new_soh = sohin + sohinhand
                             update_data = {
                                 'item_name': itemn,
                                 'rate': float(mrp),
                                 'gstin': float(gstv),
                                 'discount': float(dis),
-                                'soh': new_soh,
                                 'cost': int(costp),
                                 'catagory': cat,
                                 'sub_catagory': subc,
@@ -910,6 +627,9 @@ def inventory_page():
                                 'vendor_gst': vdg
                             }
                             db_ops.update_item(i['item_code'], update_data)
+                            # Added to the stored SOH with $inc, so sales made meanwhile are kept
+                            if sohin:
+                                db_ops.adjust_item_soh(i['item_code'], sohin)
                             st.success("Item updated successfully!")
                             st.rerun()
 
@@ -942,6 +662,131 @@ def inventory_page():
     else:
         st.info("No items in inventory")
 
+def add_receipt_lines(lines):
+    """Add scanned or imported lines to the goods receipt being entered, merged by item code"""
+    grn_lines = st.session_state.grn_lines
+    # Keep qty/cost edits made in the table, which is rebuilt with the new lines
+    edits = st.session_state.pop('grn_editor', None)
+    if edits:
+        rows = list(grn_lines.values())
+        for index, changes in edits.get('edited_rows', {}).items():
+            rows[int(index)].update(changes)
+    items = db_ops.get_items_by_codes([line['item_code'] for line in lines]) if lines else {}
+    unknown = []
+    for line in lines:
+        item = items.get(line['item_code'])
+        if item is None:
+            unknown.append(str(line['item_code']))
+            continue
+        entry = grn_lines.setdefault(line['item_code'], {
+            'item_code': line['item_code'],
+            'item_name': item.get('item_name'),
+            'qty': 0,
+            'cost': item.get('cost') or 0
+        })
+        entry['qty'] += line['qty']
+        if line.get('cost') is not None:
+            entry['cost'] = line['cost']
+    return list(dict.fromkeys(unknown))
+
+def goods_received_page():
+    st.subheader("📥 Goods Received")
+    if 'grn_lines' not in st.session_state:
+        st.session_state.grn_lines = {}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        vendor = st_searchbox(search_vendor_func, clear_on_submit=False, label="Search Vendor", key="grn_vendor")
+    with col2:
+        vendor_invoice_no = st.text_input("Vendor Invoice No")
+
+    scan_col, file_col = st.columns(2)
+    with scan_col:
+        with st.form("grn_scan", clear_on_submit=True):
+            scan_text = st.text_area(
+                "📦 Scan Delivery",
+                placeholder="Item codes, one per line or space separated (12*1001 receives 12 of item 1001)"
+            )
+            if st.form_submit_button("➕ Add Lines", width='stretch'):
+                scans, invalid = parse_scans(scan_text)
+                unknown = invalid + add_receipt_lines([{'item_code': code, 'qty': qty} for code, qty in scans])
+                if unknown:
+                    st.error(f"❌ Items not found: {', '.join(unknown)}")
+    with file_col:
+        receipt_file = st.file_uploader("Import Delivery (item_code, qty, cost)", type=["csv", "xlsx"], key="grn_file")
+        if st.button("📄 Add Lines from File", disabled=receipt_file is None, width='stretch'):
+            import item_import
+            lines, errors = item_import.read_receipt_lines(receipt_file, filename=receipt_file.name)
+            unknown = add_receipt_lines(lines)
+            if errors:
+                st.dataframe(pd.DataFrame(errors), width='stretch', hide_index=True)
+            if unknown:
+                st.error(f"❌ Items not found: {', '.join(unknown)}")
+
+    if st.session_state.grn_lines:
+        lines_df = st.data_editor(
+            pd.DataFrame(list(st.session_state.grn_lines.values())),
+            width='stretch',
+            hide_index=True,
+            disabled=['item_code', 'item_name'],
+            column_config={
+                'item_code': 'Item Code',
+                'item_name': 'Item Name',
+                'qty': st.column_config.NumberColumn('Qty Received', min_value=1, step=1),
+                'cost': st.column_config.NumberColumn('Unit Cost', min_value=0.0, format="₹%.2f")
+            },
+            key="grn_editor"
+        )
+        lines_df = lines_df.dropna(subset=['qty'])
+        total_col1, total_col2, total_col3 = st.columns(3)
+        with total_col1:
+            st.metric("Lines", len(lines_df))
+        with total_col2:
+            st.metric("Total Qty", int(lines_df['qty'].sum()))
+        with total_col3:
+            st.metric("Total Cost", f"₹{(lines_df['qty'] * lines_df['cost'].fillna(0)).sum():.2f}")
+
+        btn_col1, btn_col2 = st.columns(2)
+        with btn_col1:
+            if st.button("🗑️ Clear Lines", width='stretch'):
+                st.session_state.grn_lines = {}
+                st.session_state.pop('grn_editor', None)
+                st.rerun()
+        with btn_col2:
+            if st.button("💾 Post Goods Receipt", type="primary", width='stretch'):
+                try:
+                    db_ops.receive_goods(
+                        vendor, vendor_invoice_no,
+                        lines_df.astype(object).where(lines_df.notna(), None).to_dict('records'),
+                        st.session_state.username
+                    )
+                except Exception as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.session_state.grn_lines = {}
+                    st.session_state.pop('grn_editor', None)
+                    st.success(f"✅ Received {len(lines_df)} lines from {vendor}")
+
+    st.subheader("Recent Goods Receipts")
+    receipts = db_ops.get_goods_receipts()
+    if receipts:
+        st.dataframe(
+            pd.DataFrame(receipts)[['received_at', 'vendor_name', 'vendor_invoice_no', 'lines', 'total_qty', 'total_cost', 'received_by']],
+            width='stretch',
+            hide_index=True,
+            column_config={
+                'received_at': 'Received',
+                'vendor_name': 'Vendor',
+                'vendor_invoice_no': 'Vendor Invoice',
+                'lines': 'Lines',
+                'total_qty': 'Qty',
+                'total_cost': st.column_config.NumberColumn('Cost', format="₹%.2f"),
+                'received_by': 'Received By'
+            }
+        )
+    else:
+        st.info("No goods received yet")
+
 def add_items():
     st.subheader("➕ Add New Items")
 
@@ -989,7 +834,30 @@ def add_items():
         except Exception as e:
             st.error(f"❌ Error: {e}")
 
-    st.subheader("Category, Sub-Category and Brand Update Below ") 
+    st.subheader("📥 Bulk Import Items")
+    st.caption("CSV or Excel with item_code, item_name, rate and any other item fields; existing codes are updated")
+    import_file = st.file_uploader("Item Sheet", type=["csv", "xlsx"])
+    import_col1, import_col2 = st.columns(2)
+    with import_col1:
+        dry_run = st.checkbox("Validate only (write nothing)")
+    with import_col2:
+        if st.button("Import Items", disabled=import_file is None):
+            import item_import
+            try:
+                with st.spinner("Importing items..."):
+                    report = item_import.import_items(db_ops, import_file, filename=import_file.name, dry_run=dry_run)
+            except Exception as e:
+                st.error(f"❌ Error: {e}")
+            else:
+                if dry_run:
+                    st.info(f"{report['valid']} of {report['rows']} rows would be imported")
+                else:
+                    st.success(f"✅ {report['inserted']} items added, {report['updated']} updated")
+                if report['error_count']:
+                    st.warning(f"{report['error_count']} rows have errors")
+                    st.dataframe(pd.DataFrame(report['errors']), width='stretch', hide_index=True)
+
+    st.subheader("Category, Sub-Category and Brand Update Below ")
     cat_col1, cat_col2, cat_col3 = st.columns(3)
     
     with cat_col1:
@@ -1051,48 +919,107 @@ def vendor_add_page():
         except Exception as e:
             st.error(f"❌ Error: {e}")
 
+def paginated_table(fetch_page, filters=None, projection=None, column_config=None, page_size=50):
+    """Show one page of rows at a time with Previous/Next, keyed by the page cursors in session state"""
+    cursors = st.session_state.setdefault('report_cursors', [None])
+    page = fetch_page(filters=filters, after=cursors[-1], page_size=page_size, projection=projection)
+    if page['rows']:
+        page_df = pd.DataFrame(page['rows']).drop(columns=['_id', 'id'], errors='ignore')
+        if projection:
+            page_df = page_df[[col for col in projection if col in page_df.columns]]
+        st.dataframe(page_df, width='stretch', hide_index=True, column_config=column_config)
+    else:
+        st.info("No rows to show")
+    pc1, pc2, pc3 = st.columns([1, 1, 4])
+    with pc1:
+        if st.button("⬅️ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with pc2:
+        if st.button("Next ➡️", disabled=page['next'] is None):
+            cursors.append(page['next'])
+            st.rerun()
+    with pc3:
+        st.caption(f"Page {len(cursors)} · {page_size} rows per page")
+
 def reports_page():
     st.subheader("📊 Sales Reports")
     
     current_date = now_in_india().strftime('%d/%m/%Y')
-    sales_data = db_ops.get_all_bills()
-    sale_details = db_ops.get_all_sale_details()
-    daysale = db_ops.get_day_sales(current_date)
+    today = now_in_india().strftime('%Y-%m-%d')
+    # Headline numbers come from the pre-aggregated rollups, not the raw bills
+    summary = db_ops.get_sales_summary(store_code=db_ops.STORE_CODE)
+    today_summary = db_ops.get_sales_summary(store_code=db_ops.STORE_CODE, start_day=today, end_day=today)
     
-    if sales_data:
-        sales_df = pd.DataFrame(sales_data)
-        sale_details_df = pd.DataFrame(sale_details)
-        daysale_df = pd.DataFrame(daysale)
-        
+    if summary['bills']:
         co1,co2=st.columns(2)
-        total_Revenue=sales_df['amount'].sum()
-        total_day=sales_df[sales_df['date']== current_date]['amount'].sum()
         with co1:
-            st.markdown(f'<div class="total-rev">Total Revenue = ₹{total_Revenue:.2f}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="total-rev">Total Revenue = ₹{summary["amount"]:.2f}</div>', unsafe_allow_html=True)
         with co2:
-            st.markdown(f'<div class="total-rev">Today Sale = ₹{total_day:.2f}</div>', unsafe_allow_html=True)    
+            st.markdown(f'<div class="total-rev">Today Sale = ₹{today_summary["amount"]:.2f}</div>', unsafe_allow_html=True)    
         st.markdown("---")
         col1, col2, col3, col4, col5 = st.columns(5)
         with col1:
-            st.metric("Total Bills", len(sales_df))        
+            st.metric("Total Bills", summary['bills'])        
         with col2:
-            st.metric("Avg Bill Value", f"₹{sales_df['amount'].mean():.2f}")
+            st.metric("Avg Bill Value", f"₹{summary['avg_bill']:.2f}")
         with col3:
-            cash_sales = sales_df[sales_df['payment_mode'] == 'CASH']['amount'].sum()
-            st.metric("Cash Sales", f"₹{cash_sales:.2f}")
+            st.metric("Cash Sales", f"₹{summary['by_payment_mode'].get('CASH', 0):.2f}")
         with col4:
-            card_sales = sales_df[sales_df['payment_mode'] == 'CARD']['amount'].sum()
-            st.metric("Card Sales", f"₹{card_sales:.2f}")
+            st.metric("Card Sales", f"₹{summary['by_payment_mode'].get('CARD', 0):.2f}")
         with col5:
-            upi_sales = sales_df[sales_df['payment_mode'] == 'UPI']['amount'].sum()
-            st.metric("UPI Sales", f"₹{upi_sales:.2f}")    
+            st.metric("UPI Sales", f"₹{summary['by_payment_mode'].get('UPI', 0):.2f}")    
+        
+        with st.expander("📅 Custom Report"):
+            rc1, rc2, rc3 = st.columns(3)
+            with rc1:
+                report_range = st.date_input("Date Range", value=(now_in_india().date(), now_in_india().date()))
+            with rc2:
+                report_cashier = st.selectbox("Cashier", ["All"] + db_ops.get_cashiers())
+            with rc3:
+                report_payment = st.selectbox("Payment Mode", ["All", "CASH", "CARD", "UPI"])
+            if len(report_range) == 2:
+                filters = {
+                    'start_date': report_range[0],
+                    'end_date': report_range[1],
+                    'store_code': db_ops.STORE_CODE,
+                    'cashier': None if report_cashier == "All" else report_cashier,
+                    'payment_mode': None if report_payment == "All" else report_payment
+                }
+                report = db_ops.get_sales_report(**filters)
+                mc1, mc2, mc3 = st.columns(3)
+                with mc1:
+                    st.metric("Bills", report['bills'])
+                with mc2:
+                    st.metric("Revenue", f"₹{report['amount']:.2f}")
+                with mc3:
+                    st.metric("Avg Bill Value", f"₹{report['avg_bill']:.2f}")
+                daily = db_ops.get_daily_sales_report(**filters)
+                if daily:
+                    st.dataframe(
+                        pd.DataFrame(daily),
+                        width='stretch',
+                        hide_index=True,
+                        column_config={
+                            'date': 'Date',
+                            'bills': 'Bills',
+                            'amount': st.column_config.NumberColumn('Amount', format="₹ %.2f")
+                        }
+                    )
         
         st.markdown("---")
-        if st.button("Show Sale Invoice Data"):
-            st.dataframe(
-                sales_df[['bill_no', 'date', 'time', 'cust_name','cust_mobile', 'amount', 'payment_mode', 'cashier']],
-                width='stretch',
-                hide_index=True,
+        bc1, bc2, bc3, bc4 = st.columns(4)
+        for column, view in zip((bc1, bc2, bc3, bc4), ("Show Sale Invoice Data", "Show Todays Sale", "Show Sale Details All", "Show Category Sales")):
+            with column:
+                if st.button(view):
+                    st.session_state.report_view = view
+                    st.session_state.report_cursors = [None]
+        
+        view = st.session_state.get('report_view')
+        if view == "Show Sale Invoice Data":
+            paginated_table(
+                db_ops.get_bills_page,
+                projection=['bill_no', 'date', 'time', 'cust_name','cust_mobile', 'amount', 'payment_mode', 'cashier'],
                 column_config={
                     'bill_no': 'Bill No',
                     'date': 'Date',
@@ -1104,10 +1031,12 @@ def reports_page():
                     'cashier': 'Cashier'
                 }
             )
-        elif st.button("Show Todays Sale"):
-            st.dataframe(daysale_df, width='stretch', hide_index=True)
-        elif st.button("Show Sale Details All"):
-            st.dataframe(sale_details_df, width='stretch', hide_index=True)
+        elif view == "Show Todays Sale":
+            paginated_table(db_ops.get_sale_details_page, filters={'date': current_date})
+        elif view == "Show Sale Details All":
+            paginated_table(db_ops.get_sale_details_page)
+        elif view == "Show Category Sales":
+            st.dataframe(pd.DataFrame(db_ops.get_category_sales(store_code=db_ops.STORE_CODE)), width='stretch', hide_index=True)
     else:
         st.info("No sales data available")
 
@@ -0,0 +1,166 @@
+"""
+Shopping cart for the Billing App billing page
+Lines are compact slotted records indexed by item_code, so a repeated scan
+adds to its existing line, and the cart keeps running totals that are
+adjusted by each change instead of re-summed on every rerun
+"""
+
+# Item fields copied onto each line as they were when it was scanned
+ITEM_FIELDS = ('item_name', 'rate', 'gstin', 'discount', 'catagory', 'sub_catagory', 'brand',
+               'expiry_date', 'store_code', 'store_name', 'vendor_name', 'vendor_gst')
+
+# Columns shown in the cart table
+TABLE_COLUMNS = ('item_code', 'item_name', 'qty', 'rate', 'gst_amount', 'discount', 'amount')
+
+
+def parse_scans(text):
+    """Split a burst of scanner input into (item_code, qty) pairs.
+
+    Codes are separated by spaces or newlines and `qty*code` scans qty of
+    an item at once. Returns the pairs in scan order and the tokens that
+    are not a valid code.
+    """
+    scans = []
+    invalid = []
+    for token in text.split():
+        qty, _, code = token.rpartition('*')
+        try:
+            qty = int(qty) if qty else 1
+            item_code = int(code)
+        except ValueError:
+            invalid.append(token)
+            continue
+        if qty <= 0:
+            invalid.append(token)
+        else:
+            scans.append((item_code, qty))
+    return scans, invalid
+
+
+class CartLine:
+    """One cart line priced the way the billing page always has.
+
+    `gross_amount` is the discounted amount incl. GST, `amount` the net
+    amount after taking the GST out and `cost` the cost of the whole qty.
+    """
+
+    __slots__ = ('item_code', 'qty', 'unit_cost', 'dis_amount', 'gross_amount', 'gst_amount', 'amount',
+                 'cost') + ITEM_FIELDS
+
+    def __init__(self, item, qty):
+        self.item_code = item.get('item_code')
+        for field in ITEM_FIELDS:
+            setattr(self, field, item.get(field))
+        self.rate = self.rate or 0
+        self.gstin = self.gstin or 0
+        self.discount = self.discount or 0
+        self.unit_cost = item.get('cost') or 0
+        self.set_qty(qty)
+
+    def set_qty(self, qty):
+        self.qty = qty
+        total_rate = self.rate * qty
+        self.dis_amount = total_rate * self.discount / 100
+        self.gross_amount = total_rate - self.dis_amount
+        self.gst_amount = self.gross_amount * self.gstin / 100
+        self.amount = self.gross_amount - self.gst_amount
+        self.cost = self.unit_cost * qty
+
+
+class Cart:
+    """Cart lines keyed by item_code (in scan order) with running totals"""
+
+    def __init__(self):
+        self._lines = {}
+        self.total_qty = 0
+        self.total_discount = 0.0
+        self.subtotal = 0.0
+        self.version = 0
+        self._table = None
+        self._table_version = -1
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __contains__(self, item_code):
+        return item_code in self._lines
+
+    def __getitem__(self, item_code):
+        return self._lines[item_code]
+
+    @property
+    def total_amount(self):
+        """The bill total: the discounted amount incl. GST of every line"""
+        return self.subtotal
+
+    def _apply(self, line, sign):
+        self.total_qty += sign * line.qty
+        self.total_discount += sign * line.dis_amount
+        self.subtotal += sign * line.gross_amount
+        self.version += 1
+
+    def add(self, item, qty=1):
+        """Add a scanned item; a repeated scan increases its line's qty. Returns the line."""
+        line = self._lines.get(item.get('item_code'))
+        if line is None:
+            line = self._lines[item.get('item_code')] = CartLine(item, qty)
+            self._apply(line, 1)
+        else:
+            self.set_qty(line.item_code, line.qty + qty)
+        return line
+
+    def add_scans(self, text, lookup):
+        """Add every code in a burst of scanner input (see parse_scans).
+
+        `lookup` resolves all the codes in one call, returning items keyed
+        by item code. Returns the tokens that matched no item.
+        """
+        scans, unknown = parse_scans(text)
+        items = lookup([item_code for item_code, _ in scans]) if scans else {}
+        for item_code, qty in scans:
+            item = items.get(item_code)
+            if item is None:
+                unknown.append(str(item_code))
+            else:
+                self.add(item, qty)
+        return list(dict.fromkeys(unknown))
+
+    def set_qty(self, item_code, qty):
+        """Change a line's qty; a qty of 0 or less removes the line"""
+        if qty <= 0:
+            return self.remove(item_code)
+        line = self._lines[item_code]
+        self._apply(line, -1)
+        line.set_qty(qty)
+        self._apply(line, 1)
+        return line
+
+    def remove(self, item_code):
+        line = self._lines.pop(item_code, None)
+        if line is not None:
+            self._apply(line, -1)
+        if not self._lines:
+            # Reset so float drift from many adds/removes cannot linger
+            self.clear()
+        return line
+
+    def clear(self):
+        self._lines.clear()
+        self.total_qty = 0
+        self.total_discount = 0.0
+        self.subtotal = 0.0
+        self.version += 1
+
+    def table(self):
+        """Column lists of the displayed fields, rebuilt only after a change"""
+        if self._table_version != self.version:
+            lines = self._lines.values()
+            self._table = {column: [getattr(line, column) for line in lines] for column in TABLE_COLUMNS}
+            self._table_version = self.version
+        return self._table
@@ -0,0 +1,152 @@
+"""
+In-memory item catalog cache for Billing App
+Keeps itemadd documents keyed by item_code with a name index so barcode
+scans and name lookups are served locally instead of by a database query
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from search_index import ItemSearchIndex
+
+CATALOG_CACHE_MAX_ITEMS = int(os.getenv("CATALOG_CACHE_MAX_ITEMS", "200000"))
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "5"))
+
+
+class CatalogCache:
+    """Process-wide item cache with LRU bounding and hit/miss counters.
+
+    The cache is `complete` when every item in the catalog fits within
+    `max_items`; a miss is then authoritative and needs no database lookup.
+    `version` is the newest `updated_at` seen and drives incremental refresh.
+    Cached items are also kept in an ItemSearchIndex for ranked name search.
+    """
+
+    def __init__(self, max_items=CATALOG_CACHE_MAX_ITEMS, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        self.max_items = max_items
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._items = OrderedDict()
+        self.index = ItemSearchIndex()
+        self.loaded = False
+        self.complete = False
+        self.version = None
+        self._last_refresh = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def load(self, items, total=None):
+        """Replace the cache contents with a full catalog load"""
+        with self._lock:
+            self._items.clear()
+            self.index.clear()
+            self.version = None
+            for item in items:
+                self._put(item, index=False)
+            self.index.rebuild(
+                (item_code, item.get('item_name'), item.get('brand'))
+                for item_code, item in self._items.items()
+            )
+            count = total if total is not None else len(self._items)
+            self.complete = count <= self.max_items
+            self.loaded = True
+            self._last_refresh = time.monotonic()
+
+    def clear(self):
+        """Drop everything; the next lookup reloads the catalog"""
+        with self._lock:
+            self._items.clear()
+            self.index.clear()
+            self.loaded = False
+            self.complete = False
+            self.version = None
+
+    def refresh_due(self):
+        with self._lock:
+            return time.monotonic() - self._last_refresh >= self.refresh_seconds
+
+    def postpone_refresh(self):
+        """Wait another refresh interval before the next refresh (used while the database is unreachable)"""
+        with self._lock:
+            self._last_refresh = time.monotonic()
+
+    def apply(self, items):
+        """Apply changed items from an incremental refresh"""
+        with self._lock:
+            for item in items:
+                self._put(item)
+            self.refreshes += 1
+            self._last_refresh = time.monotonic()
+
+    def put(self, item):
+        with self._lock:
+            self._put(item)
+
+    def _put(self, item, index=True):
+        item_code = item.get('item_code')
+        if item_code is None:
+            return
+        self._items.pop(item_code, None)
+        self._items[item_code] = item
+        if index:
+            self.index.add(item_code, item.get('item_name'), item.get('brand'))
+        updated_at = item.get('updated_at')
+        if updated_at is not None and (self.version is None or updated_at > self.version):
+            self.version = updated_at
+        while len(self._items) > self.max_items:
+            evicted_code, _ = self._items.popitem(last=False)
+            self.index.remove(evicted_code)
+            self.evictions += 1
+            self.complete = False
+
+    def adjust_soh(self, item_code, delta):
+        """Apply a local stock movement without waiting for the next refresh"""
+        with self._lock:
+            item = self._items.get(item_code)
+            if item is not None:
+                item['soh'] = (item.get('soh') or 0) + delta
+
+    def get(self, item_code):
+        """Get a copy of the item with this code, or None"""
+        with self._lock:
+            item = self._items.get(item_code)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(item_code)
+            self.hits += 1
+            return dict(item)
+
+    def search(self, term, limit=20):
+        """Get copies of the best matching items for a search term, best first"""
+        with self._lock:
+            items = [dict(self._items[item_code]) for item_code in self.index.search(term, limit)]
+            if items:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return items
+
+    def find_by_name(self, term):
+        """Get the best matching item for a name search, or None"""
+        items = self.search(term, 1)
+        return items[0] if items else None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "complete": self.complete,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "evictions": self.evictions,
+            }
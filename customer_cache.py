@@ -0,0 +1,69 @@
+"""
+In-memory customer lookup cache for Billing App
+Keeps recently searched customers keyed by mobile so repeat visits and
+repeated "Search Customer" clicks are served without a database query
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CUSTOMER_CACHE_MAX_ITEMS = int(os.getenv("CUSTOMER_CACHE_MAX_ITEMS", "5000"))
+CUSTOMER_CACHE_TTL = float(os.getenv("CUSTOMER_CACHE_TTL", "300"))
+
+
+class CustomerCache:
+    """Process-wide LRU of customer documents with a time-to-live.
+
+    Only found customers are cached, so a customer first billed on another
+    till is picked up on the next search. Entries expire after `ttl`
+    seconds so visit counts and names edited elsewhere do not go stale;
+    this till's own checkouts drop their entry straight away.
+    """
+
+    def __init__(self, max_items=CUSTOMER_CACHE_MAX_ITEMS, ttl=CUSTOMER_CACHE_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, mobile):
+        """Return the cached customer for a mobile, or None"""
+        with self._lock:
+            entry = self._items.get(mobile)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                self._items.pop(mobile, None)
+                self.misses += 1
+                return None
+            self._items.move_to_end(mobile)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, mobile, customer):
+        with self._lock:
+            self._items.pop(mobile, None)
+            self._items[mobile] = (time.monotonic(), customer)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def discard(self, mobile):
+        with self._lock:
+            self._items.pop(mobile, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "customers": len(self._items),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,307 @@
+"""
+Database call instrumentation for Billing App
+Wraps the public functions of a storage module to record call counts,
+errors and latency histograms, and uses pymongo command monitoring to add
+the round trips, documents returned and bytes sent/received by each call.
+Metrics are exported in Prometheus text format over HTTP and/or to a file.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bson
+from pymongo import monitoring
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DB_METRICS = os.getenv("DB_METRICS", "1") == "1"
+# Serve /metrics on this port (unset: no endpoint)
+DB_METRICS_PORT = os.getenv("DB_METRICS_PORT")
+DB_METRICS_ADDRESS = os.getenv("DB_METRICS_ADDRESS", "127.0.0.1")
+# Write the metrics to this file every DB_METRICS_FILE_INTERVAL seconds (unset: no file)
+DB_METRICS_FILE = os.getenv("DB_METRICS_FILE")
+DB_METRICS_FILE_INTERVAL = float(os.getenv("DB_METRICS_FILE_INTERVAL", "15"))
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Commands sent outside any instrumented call (e.g. the catalog change stream)
+BACKGROUND = "(background)"
+
+_local = threading.local()
+
+
+class CallStats:
+    """Counters for one instrumented function"""
+
+    __slots__ = ("calls", "errors", "seconds", "buckets", "round_trips", "documents", "bytes_sent", "bytes_received")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.round_trips = 0
+        self.documents = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None past the last bucket)"""
+        target = q * self.calls
+        for bound, count in zip(BUCKETS, self.buckets):
+            if count >= target:
+                return bound
+        return None
+
+
+class MetricsRegistry:
+    """Process-wide CallStats keyed by function name"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.started_at = time.time()
+
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = CallStats()
+        return stats
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            stats = self._get(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.seconds += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+
+    def add_command(self, name, bytes_sent=0, bytes_received=0, documents=0, round_trips=0):
+        with self._lock:
+            stats = self._get(name)
+            stats.round_trips += round_trips
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.documents += documents
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def summary(self):
+        """One dict per function, slowest total time first"""
+        with self._lock:
+            rows = [
+                {
+                    "function": name,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "avg_ms": round(stats.seconds / stats.calls * 1000, 2) if stats.calls else 0.0,
+                    "p95_ms": None if stats.quantile(0.95) is None else stats.quantile(0.95) * 1000,
+                    "total_s": round(stats.seconds, 3),
+                    "round_trips": stats.round_trips,
+                    "documents": stats.documents,
+                    "kb_sent": round(stats.bytes_sent / 1024, 1),
+                    "kb_received": round(stats.bytes_received / 1024, 1),
+                }
+                for name, stats in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: -row["total_s"])
+
+    def prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        p = self.prefix
+        with self._lock:
+            items = sorted(self._stats.items())
+            lines = []
+
+            def family(name, kind, help_text, values):
+                lines.append(f"# HELP {p}_{name} {help_text}")
+                lines.append(f"# TYPE {p}_{name} {kind}")
+                for function, value in values:
+                    lines.append(f'{p}_{name}{{function="{function}"}} {value}')
+
+            family("calls_total", "counter", "Calls of each database function.",
+                   [(n, s.calls) for n, s in items])
+            family("errors_total", "counter", "Calls that raised an exception.",
+                   [(n, s.errors) for n, s in items])
+            lines.append(f"# HELP {p}_call_duration_seconds Wall time of each database function call.")
+            lines.append(f"# TYPE {p}_call_duration_seconds histogram")
+            for name, stats in items:
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(f'{p}_call_duration_seconds_bucket{{function="{name}",le="{bound}"}} {count}')
+                lines.append(f'{p}_call_duration_seconds_bucket{{function="{name}",le="+Inf"}} {stats.calls}')
+                lines.append(f'{p}_call_duration_seconds_sum{{function="{name}"}} {stats.seconds:.6f}')
+                lines.append(f'{p}_call_duration_seconds_count{{function="{name}"}} {stats.calls}')
+            family("round_trips_total", "counter", "Commands sent to the server.",
+                   [(n, s.round_trips) for n, s in items])
+            family("documents_returned_total", "counter", "Documents in command replies.",
+                   [(n, s.documents) for n, s in items])
+            family("bytes_sent_total", "counter", "BSON bytes of commands sent.",
+                   [(n, s.bytes_sent) for n, s in items])
+            family("bytes_received_total", "counter", "BSON bytes of command replies.",
+                   [(n, s.bytes_received) for n, s in items])
+            lines.append(f"# HELP {p}_metrics_start_time_seconds When these counters started.")
+            lines.append(f"# TYPE {p}_metrics_start_time_seconds gauge")
+            lines.append(f"{p}_metrics_start_time_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry("mongo_db")
+
+
+# Call wrapping
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_function():
+    """The innermost instrumented call running on this thread"""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else BACKGROUND
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(name)
+        failed = False
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            registry.observe(name, time.perf_counter() - start, failed)
+            stack.pop()
+    return wrapper
+
+
+def instrument(module, exclude=()):
+    """Replace the module's public functions with timed wrappers.
+
+    Calls between the module's own functions go through the wrappers too,
+    so each function's figures cover the commands it sends itself.
+    """
+    for name, func in list(vars(module).items()):
+        if name.startswith("_") or name in exclude or not inspect.isfunction(func) or func.__module__ != module.__name__:
+            continue
+        if getattr(func, "__wrapped__", None) is None:
+            setattr(module, name, _wrap(name, func))
+    return module
+
+
+# Command monitoring
+def _reply_documents(reply):
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return int(reply["value"] is not None)
+    if "values" in reply:
+        return len(reply["values"])
+    return 0
+
+
+def _bson_size(document):
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Adds each command's size and reply to the instrumented call that sent it.
+
+    pymongo publishes these events on the thread running the operation, so
+    the call is read from that thread's stack.
+    """
+
+    def started(self, event):
+        registry.add_command(current_function(), bytes_sent=_bson_size(event.command), round_trips=1)
+
+    def succeeded(self, event):
+        registry.add_command(
+            current_function(),
+            bytes_received=_bson_size(event.reply),
+            documents=_reply_documents(event.reply)
+        )
+
+    def failed(self, event):
+        pass
+
+
+command_listener = CommandMetricsListener()
+
+
+# Exporters
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_prometheus(path):
+    """Write the metrics to `path` atomically (for node_exporter's textfile collector)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.prometheus())
+    os.replace(tmp_path, path)
+
+
+def _file_writer(path, interval):
+    while True:
+        try:
+            write_prometheus(path)
+        except OSError as e:
+            print(f"Writing metrics to {path} failed: {e}")
+        time.sleep(interval)
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters(port=DB_METRICS_PORT, path=DB_METRICS_FILE):
+    """Start the /metrics endpoint and/or file writer once per process"""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started or not DB_METRICS:
+            return
+        _exporters_started = True
+        if port:
+            try:
+                server = ThreadingHTTPServer((DB_METRICS_ADDRESS, int(port)), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint on port {port} not started: {e}")
+            else:
+                threading.Thread(target=server.serve_forever, name="db-metrics-http", daemon=True).start()
+        if path:
+            threading.Thread(
+                target=_file_writer, args=(path, DB_METRICS_FILE_INTERVAL), name="db-metrics-file", daemon=True
+            ).start()
@@ -0,0 +1,388 @@
+"""
+Index advisor for Billing App
+Calls every public mongo_db function against a seeded scratch database,
+captures the commands they send, runs explain() on each query shape and
+reports collection scans together with the index that would avoid them.
+With --live only the read functions run, against the existing data in
+DB_NAME, so the plans reflect production sizes without changing anything.
+--create builds the recommended indexes in DB_NAME.
+
+Usage:
+    python index_advisor.py              # report
+    python index_advisor.py --check      # exit 1 if a query regressed to COLLSCAN
+    python index_advisor.py --live       # explain the read queries on DB_NAME
+    python index_advisor.py --create     # create the recommended indexes in DB_NAME
+"""
+
+import argparse
+import datetime as dt
+import json
+import sys
+import threading
+from pymongo import monitoring
+
+import mongo_db
+
+# Maintenance jobs that walk whole collections; a COLLSCAN there is expected.
+# Reads with an empty filter and no sort (get_all_items, the catalog load)
+# are whole-collection reads too.
+FULL_SCAN_OK = {"rebuild_rollups", "rebuild_customers", "backfill_sold_at"}
+
+# Commands that carry a query plan, and where each keeps its filter
+QUERY_COMMANDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": None,
+    "update": None,
+    "delete": None,
+}
+
+# Commands that change data; --live stops at the first one
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify", "create", "createIndexes", "drop",
+                  "dropDatabase", "dropIndexes", "renameCollection", "collMod"}
+
+# Fields explain() rejects when copied from a captured command
+DROP_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "cursor", "$db",
+               "$clusterTime", "$readPreference", "maxTimeMS", "singleBatch", "batchSize", "ordered"}
+
+
+class CommandCapture(monitoring.CommandListener):
+    """Records query commands, tagged with the function being exercised"""
+
+    def __init__(self):
+        self.function = None
+        self.commands = []
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if self.function is None:
+            return
+        with self._lock:
+            if event.command_name in QUERY_COMMANDS:
+                self.commands.append((self.function, event.command_name, dict(event.command)))
+            if event.command_name in WRITE_COMMANDS or _writes_output(event.command):
+                self.writes.append(f"{event.command_name} {event.command.get(event.command_name)}")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _writes_output(command):
+    """Whether an aggregate ends in a $out/$merge stage"""
+    return any({"$out", "$merge"} & set(stage) for stage in command.get("pipeline", []) if isinstance(stage, dict))
+
+
+def _query_parts(name, command):
+    """Get the (collection, filter, sort) a command plans for"""
+    collection = command[name]
+    if name == "aggregate":
+        pipeline = command.get("pipeline", [])
+        query = pipeline[0].get("$match", {}) if pipeline else {}
+        sort = pipeline[1].get("$sort") if len(pipeline) > 1 and query else None
+        return collection, query, sort
+    if name in ("update", "delete"):
+        statement = command.get("updates" if name == "update" else "deletes", [{}])[0]
+        return collection, statement.get("q", {}), None
+    return collection, command.get(QUERY_COMMANDS[name]) or {}, command.get("sort")
+
+
+def _shape(value):
+    """Replace the values in a query with 1 so equal shapes compare equal"""
+    if isinstance(value, dict):
+        return {key: _shape(val) if key.startswith("$") or isinstance(val, dict) else 1 for key, val in value.items()}
+    if isinstance(value, list):
+        return [_shape(val) for val in value[:1]]
+    return 1
+
+
+def recommend_index(query, sort=None):
+    """Suggest an index for a filter and sort: equality fields, then sort, then ranges"""
+    equality, ranges, sort_keys = [], [], []
+    for field, cond in (query or {}).items():
+        if field.startswith("$"):
+            continue
+        if isinstance(cond, dict) and any(op in cond for op in ("$gt", "$gte", "$lt", "$lte", "$regex", "$exists", "$ne")):
+            ranges.append(field)
+        else:
+            equality.append(field)
+    for field, direction in (sort or {}).items():
+        if field not in equality:
+            sort_keys.append((field, direction))
+    keys = [(field, 1) for field in equality] + sort_keys + [(field, 1) for field in ranges if field not in dict(sort_keys)]
+    return [key for key in keys if key[0] != "_id"] or None
+
+
+def _stages(plan):
+    """Collect the stage names of a winning plan"""
+    stages = []
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage":
+                stages.append(value)
+            else:
+                stages.extend(_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_stages(value))
+    return stages
+
+
+def explain(db, name, command):
+    """Explain a captured command and return its plan stages"""
+    command = {key: value for key, value in command.items() if key not in DROP_FIELDS}
+    if name == "aggregate":
+        command["cursor"] = {}
+        # $out/$merge stages cannot be explained; the $match is what matters
+        command["pipeline"] = [stage for stage in command.get("pipeline", []) if not ({"$out", "$merge"} & set(stage))]
+    result = db.command("explain", command, verbosity="queryPlanner")
+    return _stages(result)
+
+
+def seed(db):
+    """Create the schema and a few documents in every collection the app queries"""
+    mongo_db._create_schema(db)
+    now = dt.datetime.now(mongo_db.INDIA_TZ)
+    bill = {
+        "date": now.strftime('%d/%m/%Y'), "time": now.strftime('%H:%M:%S'), "bill_no": "900001",
+        "amount": 150, "cust_name": "Advisor", "cust_mobile": "9000000001", "payment_mode": "CASH",
+        "cashier": "cashier", "store_code": mongo_db.STORE_CODE, "sold_at": now
+    }
+    lines = [dict(
+        date=bill["date"], time=bill["time"], bill_no=bill["bill_no"], line_no=1, item_code=1001,
+        item_name="White Bread", qty=1, rate=150, gross_amount=150, net_amount=150, cost=140,
+        catagory="Bakery", store_code=mongo_db.STORE_CODE, sold_at=now
+    )]
+    mongo_db.checkout(bill, lines, {"bill_no": 900001, "store_code": mongo_db.STORE_CODE})
+    db.catagory.update_one({"catagory": "Bakery"}, {"$set": {"catagory": "Bakery"}}, upsert=True)
+    db.sub_catagory.update_one({"sub_catagory": "Bread"}, {"$set": {"sub_catagory": "Bread"}}, upsert=True)
+    db.brand.update_one({"brand": "Raja"}, {"$set": {"brand": "Raja"}}, upsert=True)
+    db.vendor_details.update_one(
+        {"vendor_id": 1},
+        {"$set": {"vendor_id": 1, "vendor_name": "Jupiter Enterprise", "vendor_gst": "CDFX65567FCC575Z"}},
+        upsert=True
+    )
+    mongo_db.receive_goods("Jupiter Enterprise", "ADVISOR-SEED", [{"item_code": 1001, "qty": 1}], "advisor")
+
+
+def sample(db):
+    """Parameters for the exercises, taken from the newest bill, item, vendor and receipt"""
+    bill = db.billdata.find_one({}, sort=[("_id", -1)]) or {}
+    item = db.itemadd.find_one({}, {"item_code": 1, "item_name": 1}) or {}
+    vendor = db.vendor_details.find_one({"vendor_name": {"$ne": None}}, {"vendor_name": 1}) or {}
+    receipt = db.goods_received.find_one({}, {"_id": 1}, sort=[("_id", -1)]) or {}
+    try:
+        day = dt.datetime.strptime(bill.get("date", ""), '%d/%m/%Y').date()
+    except ValueError:
+        day = dt.date.today()
+    return {
+        "bill_no": bill.get("bill_no", "1"),
+        "date": day.strftime('%d/%m/%Y'),
+        "day": day,
+        "store_code": bill.get("store_code", mongo_db.STORE_CODE),
+        "cashier": bill.get("cashier") or "cashier",
+        "payment_mode": bill.get("payment_mode") or "CASH",
+        "cust_mobile": bill.get("cust_mobile") or "9000000001",
+        "item_code": item.get("item_code", 1001),
+        "item_name": item.get("item_name") or "White Bread",
+        "vendor_name": vendor.get("vendor_name") or "Jupiter Enterprise",
+        "grn_id": receipt.get("_id"),
+    }
+
+
+def read_exercises(params):
+    """(name, call) pairs covering the read paths of mongo_db; safe on a live database"""
+    day, store_code = params["day"], params["store_code"]
+    code = str(params["item_code"])
+    return [
+        ("verify_login", lambda: mongo_db.verify_login("admin", "x")),
+        ("get_all_users", mongo_db.get_all_users),
+        ("catalog load", lambda: mongo_db.search_item(code)),
+        ("search_item", lambda: mongo_db.search_item(code)),
+        ("search_item", lambda: mongo_db.search_item(params["item_name"].split()[0])),
+        ("search_items", lambda: mongo_db.search_items(params["item_name"][:3].lower())),
+        ("get_all_items", mongo_db.get_all_items),
+        ("get_items_by_codes", lambda: (mongo_db.invalidate_catalog(), mongo_db.get_items_by_codes([params["item_code"]]))),
+        ("search_bill", lambda: mongo_db.search_bill(params["bill_no"])),
+        ("search_bills", lambda: mongo_db.search_bills([params["bill_no"]])),
+        ("get_bill_items", lambda: mongo_db.get_bill_items(params["bill_no"])),
+        ("get_bill_items_many", lambda: mongo_db.get_bill_items_many([params["bill_no"]])),
+        ("get_all_bills", mongo_db.get_all_bills),
+        ("get_all_sale_details", mongo_db.get_all_sale_details),
+        ("get_day_sales", lambda: mongo_db.get_day_sales(params["date"])),
+        ("get_bills_page", lambda: mongo_db.get_bills_page()),
+        ("get_sale_details_page", lambda: mongo_db.get_sale_details_page(filters={"date": params["date"]})),
+        ("get_bills_between", lambda: mongo_db.get_bills_between(day, day, store_code)),
+        ("get_sale_details_between", lambda: mongo_db.get_sale_details_between(day, day, store_code)),
+        ("get_sales_summary", lambda: mongo_db.get_sales_summary(store_code, day.isoformat(), day.isoformat())),
+        ("get_category_sales", lambda: mongo_db.get_category_sales(store_code, day.isoformat(), day.isoformat())),
+        ("get_sales_report", lambda: mongo_db.get_sales_report(day, day, store_code, params["cashier"], params["payment_mode"])),
+        ("get_daily_sales_report", lambda: mongo_db.get_daily_sales_report(day, day, store_code)),
+        ("get_cashiers", mongo_db.get_cashiers),
+        ("get_max_invoice_no", lambda: mongo_db.get_max_invoice_no(store_code)),
+        ("get_invoice_gaps", lambda: mongo_db.get_invoice_gaps(store_code)),
+        ("search_catagory", lambda: mongo_db.search_catagory("bak")),
+        ("search_subcatagory", lambda: mongo_db.search_subcatagory("bre")),
+        ("search_brand", lambda: mongo_db.search_brand("raj")),
+        ("search_vendor", lambda: mongo_db.search_vendor(params["vendor_name"][:3].lower())),
+        ("get_vendor_gst", lambda: mongo_db.get_vendor_gst(params["vendor_name"])),
+        ("get_item_references", mongo_db.get_item_references),
+        ("get_goods_receipts", lambda: mongo_db.get_goods_receipts(params["vendor_name"])),
+        ("get_goods_receipt_lines", lambda: mongo_db.get_goods_receipt_lines(params["grn_id"])),
+        ("search_customer_by_mobile", lambda: mongo_db.search_customer_by_mobile(params["cust_mobile"])),
+    ]
+
+
+def write_exercises(params):
+    """(name, call) pairs covering the update paths and maintenance jobs; scratch database only"""
+    return [
+        ("update_user", lambda: mongo_db.update_user("advisor", "x", "cashier")),
+        ("delete_user", lambda: mongo_db.delete_user("advisor")),
+        ("update_item", lambda: mongo_db.update_item(params["item_code"], {"rate": 150})),
+        ("adjust_item_soh", lambda: mongo_db.adjust_item_soh(params["item_code"], 0)),
+        ("upsert_items", lambda: mongo_db.upsert_items([{"item_code": params["item_code"], "rate": 150}])),
+        ("reserve_invoice_numbers", lambda: mongo_db.reserve_invoice_numbers(1, params["store_code"])),
+        ("receive_goods", lambda: mongo_db.receive_goods(
+            params["vendor_name"], f"ADVISOR-{dt.datetime.now().timestamp()}",
+            [{"item_code": params["item_code"], "qty": 1}], "advisor"
+        )),
+        ("backfill_sold_at", mongo_db.backfill_sold_at),
+        ("rebuild_rollups", mongo_db.rebuild_rollups),
+        ("rebuild_customers", mongo_db.rebuild_customers),
+    ]
+
+
+def expected_scan(finding):
+    """Whether a collection scan is the intended plan for this query shape"""
+    return (not finding["filter"] and not finding["sort"]) or finding["functions"] <= FULL_SCAN_OK
+
+
+def analyze(db, capture):
+    """Explain each distinct captured query shape; returns one finding per shape"""
+    findings = {}
+    for function, name, command in capture.commands:
+        collection, query, sort = _query_parts(name, command)
+        key = json.dumps([name, collection, _shape(query), _shape(sort or {})], sort_keys=True, default=str)
+        if key in findings:
+            findings[key]["functions"].add(function)
+            continue
+        try:
+            stages = explain(db, name, command)
+            error = None
+        except Exception as e:
+            stages, error = [], str(e)
+        findings[key] = {
+            "functions": {function},
+            "command": name,
+            "collection": collection,
+            "filter": _shape(query),
+            "sort": sort,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "index": recommend_index(query, sort),
+            "error": error,
+        }
+    return list(findings.values())
+
+
+def run(live=False, keep=False):
+    """Exercise mongo_db, explain its queries and return the findings.
+
+    The scratch database is seeded and every exercise runs; `live` only
+    runs the read exercises against the existing data in DB_NAME and stops
+    if any of them sends a write. The scratch database is selected with
+    mongo_db.use_database, so other threads keep using DB_NAME.
+    """
+    capture = CommandCapture()
+    monitoring.register(capture)
+    max_items = mongo_db._catalog.max_items
+    db_name = mongo_db.DB_NAME if live else f"{mongo_db.DB_NAME}_index_advisor"
+    try:
+        with mongo_db.use_database(db_name) as db:
+            return _run(db, capture, live, keep)
+    finally:
+        capture.function = None
+        mongo_db._catalog.max_items = max_items
+        mongo_db.invalidate_catalog()
+
+
+def _run(db, capture, live, keep):
+    """Seed (unless live), run the exercises with `capture` listening and explain them"""
+    if not live:
+        seed(db)
+    params = sample(db)
+    mongo_db.invalidate_catalog()
+    calls = read_exercises(params) + ([] if live else write_exercises(params))
+    for name, call in calls:
+        capture.function = name
+        try:
+            call()
+        except Exception as e:
+            print(f"  {name} failed: {e}")
+        if live and capture.writes:
+            raise RuntimeError(f"{name} sent {capture.writes[0]} to the live database, stopping")
+        if name == "catalog load":
+            # Exercise the database fallbacks a cache too small for the catalog uses
+            mongo_db._catalog.max_items = 1
+            mongo_db.invalidate_catalog()
+    capture.function = None
+    findings = analyze(db, capture)
+    if not live and not keep:
+        mongo_db.get_client().drop_database(db.name)
+    return findings
+
+
+def create_indexes(db, findings):
+    """Create the recommended index for each unexpected collection scan, returns their names"""
+    created = []
+    for finding in findings:
+        if finding["collscan"] and finding["index"] and not expected_scan(finding):
+            created.append(f"{finding['collection']}.{db[finding['collection']].create_index(finding['index'])}")
+    return created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Explain every mongo_db query shape and flag collection scans")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a query uses a collection scan")
+    parser.add_argument("--live", action="store_true",
+                        help=f"explain the read queries against the data in {mongo_db.DB_NAME} (writes nothing)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--create", action="store_true",
+                        help=f"create the recommended indexes in {mongo_db.DB_NAME}")
+    args = parser.parse_args(argv)
+
+    findings = run(live=args.live, keep=args.keep)
+    regressions = []
+    for finding in sorted(findings, key=lambda f: (f["collection"], f["command"])):
+        expected = expected_scan(finding)
+        if finding["error"]:
+            status = "ERROR"
+        elif finding["collscan"]:
+            status = "SCAN-OK" if expected else "COLLSCAN"
+        else:
+            status = "ok"
+        print(f"{status:<9} {finding['collection']}.{finding['command']} {json.dumps(finding['filter'], default=str)}"
+              f" sort={finding['sort']} <- {', '.join(sorted(finding['functions']))}")
+        if status == "COLLSCAN":
+            print(f"          recommended index: {finding['index']}")
+            regressions.append(finding)
+        elif status == "ERROR":
+            print(f"          {finding['error']}")
+    if args.create and regressions:
+        for name in create_indexes(mongo_db.get_db(), regressions):
+            print(f"created index {name}")
+    if args.check and regressions:
+        print(f"{len(regressions)} query shape(s) use a collection scan")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Bulk invoice reprint/export for Billing App
+Streams bills and their lines from storage in batches and renders the PDFs
+in a process pool, writing them to a zip file or a directory
+"""
+
+import collections
+import datetime as dt
+import multiprocessing
+import os
+import zipfile
+
+import invoice_pdf
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+# Invoices handed to the pool but not yet written, per worker
+EXPORT_IN_FLIGHT_PER_WORKER = 4
+
+
+def bill_to_invoice(bill, lines):
+    """Build the generate_pdf bill dict from a stored bill and its sale lines"""
+    total = bill.get('amount') or 0
+    return {
+        'bill_no': bill.get('bill_no'),
+        'date': bill.get('date'),
+        'time': bill.get('time'),
+        'customer_name': bill.get('cust_name'),
+        'customer_mobile': bill.get('cust_mobile'),
+        'cashier': bill.get('cashier'),
+        'items': [
+            {
+                'item_name': line.get('item_name'),
+                'qty': line.get('qty'),
+                'rate': line.get('rate'),
+                'amount': line.get('net_amount'),
+                'gst_amount': line.get('gst_amount')
+            } for line in lines
+        ],
+        # The tender is not stored, so reprints show the bill as paid exactly
+        'totals': {
+            'subtotal': sum(line.get('gross_amount') or 0 for line in lines),
+            'discount': sum(line.get('dis_amount') or 0 for line in lines),
+            'total': total,
+            'tender': total,
+            'change': 0
+        }
+    }
+
+
+def _with_items(db_ops, bills):
+    items = db_ops.get_bill_items_many([bill['bill_no'] for bill in bills])
+    return [bill_to_invoice(bill, items.get(str(bill['bill_no']), [])) for bill in bills]
+
+
+def iter_invoices(db_ops, start_date=None, end_date=None, bill_nos=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield generate_pdf bill dicts for a date range or a list of bill numbers.
+
+    Bills are read a page at a time and their lines fetched per page, so
+    memory stays flat however many bills the range holds.
+    """
+    if bill_nos:
+        bill_nos = list(bill_nos)
+        for i in range(0, len(bill_nos), batch_size):
+            batch = [str(bill_no) for bill_no in bill_nos[i:i + batch_size]]
+            found = db_ops.search_bills(batch)
+            yield from _with_items(db_ops, [found[bill_no] for bill_no in batch if bill_no in found])
+        return
+    day = start_date
+    while day <= end_date:
+        after = None
+        while True:
+            page = db_ops.get_bills_page(
+                filters={'date': day.strftime('%d/%m/%Y')}, after=after, page_size=batch_size
+            )
+            if page['rows']:
+                yield from _with_items(db_ops, page['rows'])
+            after = page['next']
+            if after is None:
+                break
+        day += dt.timedelta(days=1)
+
+
+def _init_worker():
+    # Each worker prepares its own template once and reuses it for every bill
+    invoice_pdf.get_invoice_template()
+
+
+def _render(bill):
+    return str(bill['bill_no']), invoice_pdf.generate_pdf(bill, return_bytes=True)
+
+
+def export_invoices(db_ops, output, start_date=None, end_date=None, bill_nos=None,
+                    workers=None, progress=None):
+    """Render invoices into `output` (a .zip file or a directory).
+
+    Give either a date range (date objects, inclusive) or a list of bill
+    numbers. `progress(done, total)` is called as each PDF is written.
+    Returns the number written.
+    """
+    if not bill_nos and (start_date is None or end_date is None):
+        raise ValueError("Give a start and end date or a list of bill numbers")
+    total = len(bill_nos) if bill_nos else db_ops.get_sales_report(start_date, end_date)['bills']
+    invoices = iter_invoices(db_ops, start_date, end_date, bill_nos)
+
+    if output.lower().endswith('.zip'):
+        archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED)
+        write = archive.writestr
+    else:
+        archive = None
+        os.makedirs(output, exist_ok=True)
+
+        def write(name, data):
+            with open(os.path.join(output, name), 'wb') as f:
+                f.write(data)
+
+    done = 0
+    workers = workers or os.cpu_count() or 1
+    ext = 'pdf' if invoice_pdf.FPDF_AVAILABLE else 'txt'
+    # Pool.imap would drain the invoice generator up front; only a bounded
+    # window is submitted so memory stays flat however long the range is
+    in_flight = collections.deque()
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            def write_oldest():
+                nonlocal done
+                bill_no, data = in_flight.popleft().get()
+                write(f"{bill_no}.{ext}", data)
+                done += 1
+                if progress:
+                    progress(done, total)
+
+            for invoice in invoices:
+                in_flight.append(pool.apply_async(_render, (invoice,)))
+                if len(in_flight) >= workers * EXPORT_IN_FLIGHT_PER_WORKER:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+    finally:
+        if archive is not None:
+            archive.close()
+    return done
@@ -0,0 +1,417 @@
+"""
+Invoice PDF rendering for Billing App
+An InvoiceTemplate is built once per process with the fonts loaded and the
+logo decoded and scaled; each bill only fills in the variable parts
+"""
+
+import functools
+import json
+import os
+import threading
+import zlib
+try:
+    from fpdf import FPDF, FPDF_VERSION
+    FPDF_AVAILABLE = True
+except Exception:
+    FPDF_AVAILABLE = False
+try:
+    import qrcode
+    from PIL import Image
+    QR_AVAILABLE = True
+except Exception:
+    QR_AVAILABLE = False
+
+FONT_CANDIDATES = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+    'DejaVuSans.ttf',
+]
+LOGO_PATH = 'logo.png'
+# Encode invoice QR codes as 'bill_no|date|total' instead of JSON
+QR_COMPACT_PAYLOAD = os.getenv("QR_COMPACT_PAYLOAD", "false").lower() in ("1", "true", "yes")
+# QR images kept for reprints of recent bills
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "128"))
+
+# Layout settings
+PRIMARY = (0, 40, 30)
+ACCENT = (202, 155, 26)
+HEADER_H = 80
+LEFT_MARGIN = 30
+BOTTOM_MARGIN = 50
+ROW_H = 18
+LOGO_BOX = (90, 5, 240, 60)
+# Logo pixels per point of its box on the page (2 = 144 dpi)
+LOGO_SCALE = 2
+
+
+def _image_info(image, background=None):
+    """Turn a PIL image into an image dict the PDF writer embeds as-is.
+
+    With `background` the alpha channel is flattened onto that colour so no
+    soft mask is needed.
+    """
+    if image.mode in ('RGBA', 'LA', 'P') and background is not None:
+        flat = Image.new('RGB', image.size, background)
+        flat.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = flat
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return {
+        'w': image.width,
+        'h': image.height,
+        'cs': 'DeviceGray' if image.mode == 'L' else 'DeviceRGB',
+        'bpc': 8,
+        'f': 'FlateDecode',
+        'pal': '',
+        'trns': '',
+        'data': zlib.compress(image.tobytes()),
+        'image': image,
+    }
+
+
+def qr_payload(bill_no, date, total, compact=None):
+    """Build the text encoded in an invoice QR code.
+
+    The compact form 'bill_no|date|total' needs a smaller QR version than
+    the JSON object.
+    """
+    if compact is None:
+        compact = QR_COMPACT_PAYLOAD
+    if compact:
+        return f"{bill_no}|{date}|{total}"
+    return json.dumps({'bill_no': bill_no, 'date': date, 'total': total})
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def _qr_image_info(payload):
+    """Encode a payload as a QR image held in memory, cached for reprints.
+
+    One pixel per module: PDF viewers scale images without smoothing, so
+    the code prints as sharp as a box_size=4 PNG.
+    """
+    qr = qrcode.QRCode(border=1)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    image = Image.frombytes(
+        'L', (len(matrix[0]), len(matrix)),
+        bytes(0 if dark else 255 for row in matrix for dark in row)
+    )
+    return _image_info(image)
+
+
+def _fmt(value, unicode_font):
+    try:
+        val = float(value)
+    except Exception:
+        val = 0.0
+    return (f"₹{val:.2f}") if unicode_font else (f"Rs.{val:.2f}")
+
+
+class InvoiceTemplate:
+    """Invoice layout with its fonts and logo prepared once.
+
+    PyFPDF 1.7 keeps fonts and images per document, so the parsed font
+    metrics and the encoded logo are copied into each new document instead
+    of being re-read from disk. Every style of the Unicode font maps to the
+    one regular face (the file registered for all of them before), so each
+    PDF embeds a single font subset.
+    """
+
+    def __init__(self, font_path=None, logo_path=LOGO_PATH):
+        if font_path is None:
+            font_path = next((p for p in FONT_CANDIDATES if os.path.exists(p)), None)
+        self.font_path = font_path
+        self.legacy = FPDF_VERSION.startswith('1.')
+        self._fonts = None
+        if font_path:
+            try:
+                probe = FPDF(unit='pt', format='A4')
+                probe.add_font('DejaVu', '', fname=font_path, uni=True)
+                self._fonts = (dict(probe.fonts), dict(probe.font_files))
+            except Exception:
+                self._fonts = None
+        self.logo = None
+        if os.path.exists(logo_path):
+            try:
+                with Image.open(logo_path) as img:
+                    img.load()
+                    size = (LOGO_BOX[2] * LOGO_SCALE, LOGO_BOX[3] * LOGO_SCALE)
+                    self.logo = _image_info(img.resize(size, Image.LANCZOS), background=PRIMARY)
+            except Exception:
+                self.logo = None
+
+    def _new_pdf(self, unicode_font):
+        pdf = FPDF(unit='pt', format='A4')
+        if unicode_font:
+            if self.legacy:
+                fonts, font_files = self._fonts
+                for key, font in fonts.items():
+                    pdf.fonts[key] = dict(font, subset=list(font['subset']))
+                pdf.font_files.update(font_files)
+            else:
+                pdf.add_font('DejaVu', '', fname=self.font_path, uni=True)
+        pdf.add_page()
+        pdf.set_auto_page_break(False)
+        return pdf
+
+    def _image(self, pdf, key, info, x, y, w, h=0):
+        """Place a prepared image; it is embedded once per document"""
+        if not self.legacy:
+            pdf.image(info['image'], x=x, y=y, w=w, h=h)
+            return
+        if key not in pdf.images:
+            # The writer drops 'data' after output, so each document gets its own dict
+            pdf.images[key] = dict(info, i=len(pdf.images) + 1)
+        pdf.image(key, x=x, y=y, w=w, h=h)
+
+    def render(self, bill, force_ascii=False):
+        """Render a bill dict to PDF bytes"""
+        unicode_font = self._fonts is not None and not force_ascii
+        pdf = self._new_pdf(unicode_font)
+        base_font = 'DejaVu' if unicode_font else 'Helvetica'
+
+        def font(style, size):
+            pdf.set_font(base_font, '' if unicode_font else style, size)
+
+        bill_no = str(bill.get('bill_no', 'invoice'))
+
+        def header():
+            pdf.set_fill_color(*PRIMARY)
+            pdf.rect(0, 0, pdf.w, HEADER_H, 'F')
+            if self.logo is not None:
+                try:
+                    self._image(pdf, 'logo', self.logo, *LOGO_BOX)
+                except Exception:
+                    pass
+            pdf.set_text_color(255, 255, 220)
+            pdf.set_xy(90, 30)
+            pdf.set_x(30)
+            font('B', 12)
+            pdf.cell(30, 90, 'Relling Bihibaray | Dist-Darjeeling | Mobile: 9832025468', ln=1)
+            bw = 150
+            bh = 44
+            pdf.set_fill_color(255, 255, 255)
+            pdf.rect(pdf.w - bw - 30, 20, bw, bh, 'F')
+            pdf.set_xy(pdf.w - bw - 30, 28)
+            pdf.set_text_color(*PRIMARY)
+            font('B', 12)
+            pdf.cell(bw, 12, 'INVOICE', align='C', ln=1)
+            font('', 9)
+            pdf.set_xy(pdf.w - bw - 30, 44)
+            pdf.cell(bw, 10, f"Bill No: {bill_no}", align='C')
+            pdf.set_text_color(0, 0, 0)
+
+        def table_header():
+            pdf.set_fill_color(*PRIMARY)
+            pdf.set_text_color(255, 255, 255)
+            font('B', 11)
+            pdf.set_x(LEFT_MARGIN)
+            pdf.cell(300, 22, 'Description', border=0, fill=True)
+            pdf.set_x(330)
+            pdf.cell(60, 22, 'Qty', border=0, align='C', fill=True)
+            pdf.set_x(390)
+            pdf.cell(80, 22, 'Rate', border=0, align='R', fill=True)
+            pdf.set_x(470)
+            pdf.cell(80, 22, 'Amount', border=0, align='R', ln=1, fill=True)
+            pdf.set_text_color(0, 0, 0)
+
+        def footer():
+            page_no = pdf.page_no()
+            pdf.set_xy(0, pdf.h - BOTTOM_MARGIN + 10)
+            font('I', 8)
+            pdf.set_text_color(120, 120, 120)
+            pdf.cell(0, 10, f'Page {page_no}', align='C')
+            pdf.set_text_color(0, 0, 0)
+
+        header()
+        pdf.ln(10)
+        font('B', 11)
+        pdf.set_x(LEFT_MARGIN)
+        pdf.cell(80, 70, 'Customer:', ln=0)
+        font('', 11)
+        pdf.cell(260, 70, f"{bill.get('customer_name','')}  {bill.get('customer_mobile','')}", ln=1)
+        pdf.set_x(LEFT_MARGIN)
+        font('B', 11)
+        pdf.cell(80, 2, 'Date & Time:', ln=0)
+        font('', 11)
+        pdf.cell(260, 2, f"{bill.get('date','')}      {bill.get('time','')}", ln=1)
+        pdf.ln(6)
+
+        table_header()
+        font('', 10)
+        fill = False
+        items = bill.get('items', [])
+
+        gst_total = 0.0
+        total_qty = 0
+        for it in items:
+            try:
+                gst_total += float(it.get('gst_amount', 0) or 0)
+            except Exception:
+                pass
+            try:
+                total_qty += int(float(it.get('qty', 0) or 0))
+            except Exception:
+                pass
+
+        for it in items:
+            if pdf.get_y() + ROW_H + BOTTOM_MARGIN > pdf.h:
+                footer()
+                pdf.add_page()
+                header()
+                pdf.ln(10)
+                table_header()
+                font('', 10)
+
+            if fill:
+                pdf.set_fill_color(*ACCENT)
+            else:
+                pdf.set_fill_color(255, 247, 230)
+
+            pdf.set_x(LEFT_MARGIN)
+            desc = str(it.get('item_name', ''))[:60]
+            pdf.cell(300, ROW_H, desc, border=0, fill=True)
+            pdf.set_x(330)
+            pdf.cell(60, ROW_H, str(it.get('qty', '')), border=0, align='C', fill=True)
+            pdf.set_x(390)
+            pdf.cell(80, ROW_H, _fmt(it.get('rate', 0), unicode_font), border=2, align='R', fill=True)
+            pdf.set_x(470)
+            pdf.cell(80, ROW_H, _fmt(it.get('amount', 0), unicode_font), border=2, align='R', ln=1, fill=True)
+            fill = not fill
+
+        t = bill.get('totals', {})
+        if pdf.get_y() + 140 + BOTTOM_MARGIN > pdf.h:
+            footer()
+            pdf.add_page()
+            header()
+            pdf.ln(10)
+
+        right_x = 410
+        pdf.set_x(right_x)
+        font('', 11)
+
+        pdf.set_x(0)
+        pdf.cell(0,18,'______________________________________________________________________________________________',align='C',ln=1)
+        pdf.set_x(230)
+        pdf.set_fill_color(100,123,23)
+        pdf.cell(70, 18, 'Total Qty:', border=0,fill=True)
+        pdf.cell(70, 18, str(total_qty), border=0, align='R', ln=0,fill=True)
+        pdf.set_x(right_x)
+        pdf.cell(70, 18, 'Subtotal:', border=4)
+        pdf.cell(70, 18, _fmt(t.get('subtotal', 0), unicode_font), border=0, align='R', ln=1)
+        pdf.set_x(right_x)
+        pdf.cell(70, 18, 'GST Total:', border=0)
+        pdf.cell(70, 18, _fmt(gst_total, unicode_font), border=4, align='R', ln=1)
+        pdf.set_x(right_x)
+        pdf.cell(70, 18, 'Discount:', border=0)
+        pdf.cell(70, 18, _fmt(t.get('discount', 0), unicode_font), border=0, align='R', ln=1)
+
+        pdf.set_x(right_x)
+        pdf.set_fill_color(*PRIMARY)
+        pdf.set_text_color(255, 255, 255)
+        font('B', 13)
+        pdf.cell(70, 22, 'Total:', border=0, fill=True)
+        pdf.cell(70, 22, _fmt(t.get('total', 0), unicode_font), border=0, align='R', ln=1, fill=True)
+        pdf.set_text_color(0, 0, 0)
+
+        pdf.set_x(right_x)
+        font('', 11)
+        pdf.cell(70, 18, 'Tender:', border=0)
+        pdf.cell(70, 18, _fmt(t.get('tender', 0), unicode_font), border=0, align='R', ln=1)
+        pdf.set_x(right_x)
+        pdf.cell(70, 18, 'Change:', border=0)
+        pdf.cell(70, 18, _fmt(t.get('change', 0), unicode_font), border=0, align='R', ln=1)
+        pdf.ln(12)
+
+        if QR_AVAILABLE:
+            try:
+                qr_info = _qr_image_info(qr_payload(bill_no, bill.get('date'), t.get('total')))
+                self._image(pdf, 'qr', qr_info, LEFT_MARGIN, pdf.get_y(), 80)
+            except Exception:
+                pass
+
+        pdf.set_x(LEFT_MARGIN + 90)
+        pdf.cell(240, 40, 'Received By: ______________________', ln=0)
+        pdf.set_x(350)
+        pdf.cell(240, 40, 'Authorised Signatory: ______________', ln=1)
+        pdf.ln(6)
+        pdf.set_x(LEFT_MARGIN)
+        font('', 9)
+        pdf.multi_cell(0, 90, 'Bank Details: ABC Bank, IFSC: ABCD0123456, A/C: 1234567890', align='L')
+
+        footer()
+
+        s = pdf.output(dest='S')
+        if isinstance(s, (bytes, bytearray)):
+            return bytes(s)
+        try:
+            return s.encode('latin-1')
+        except Exception:
+            return s.encode('utf-8', errors='replace')
+
+
+_template = None
+_template_lock = threading.Lock()
+
+def get_invoice_template():
+    """Get the process-wide invoice template, building it on first use"""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = InvoiceTemplate()
+    return _template
+
+
+def _text_invoice(bill):
+    txt = []
+    txt.append('Alam Megastore\n')
+    txt.append(f"Bill No: {bill.get('bill_no')}  Date: {bill.get('date')} {bill.get('time')}\n")
+    txt.append(f"Customer: {bill.get('customer_name')}  Mobile: {bill.get('customer_mobile')}\n\n")
+    txt.append('Description\tQty\tRate\tAmount\n')
+    for it in bill.get('items', []):
+        txt.append(f"{it.get('item_name')}\t{it.get('qty')}\t{it.get('rate')}\t{it.get('amount')}\n")
+    try:
+        total_qty_txt = sum(int(float(it.get('qty', 0) or 0)) for it in bill.get('items', []))
+    except Exception:
+        total_qty_txt = 0
+    t = bill.get('totals', {})
+    txt.append(f"\nTotal Quantity: {total_qty_txt}\n")
+    txt.append(f"Subtotal: {t.get('subtotal')}  Discount: {t.get('discount')}  Total: {t.get('total')}\n")
+    return ''.join(txt)
+
+
+def generate_pdf(bill: dict, return_bytes: bool = False, force_ascii: bool = False):
+    """Generate a professional PDF invoice. Returns bytes when `return_bytes=True`."""
+    bill_no = str(bill.get('bill_no', 'invoice'))
+
+    # Text fallback
+    if not FPDF_AVAILABLE:
+        txt_str = _text_invoice(bill)
+        if return_bytes:
+            return txt_str.encode('utf-8')
+        os.makedirs('bills', exist_ok=True)
+        txt_path = os.path.join('bills', f"{bill_no}.txt")
+        with open(txt_path, 'w', encoding='utf-8') as f:
+            f.write(txt_str)
+        return txt_path
+
+    try:
+        pdf_bytes = get_invoice_template().render(bill, force_ascii=force_ascii)
+    except UnicodeEncodeError:
+        if not force_ascii:
+            return generate_pdf(bill, return_bytes=return_bytes, force_ascii=True)
+        raise
+
+    if return_bytes:
+        return pdf_bytes
+
+    try:
+        os.makedirs('bills', exist_ok=True)
+        pdf_path = os.path.join('bills', f"{bill_no}.pdf")
+        with open(pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+        return pdf_path
+    except Exception:
+        return pdf_bytes
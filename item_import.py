@@ -0,0 +1,249 @@
+"""
+Bulk item import for Billing App
+Reads a CSV or Excel sheet of items in chunks with pandas, validates and
+normalises each chunk a column at a time (codes, rates, GST slabs, expiry
+dates, category/brand/vendor names), collects row-level errors and upserts
+the valid rows on item_code through the storage backend.
+
+The header names the itemadd fields (item_code, item_name, rate, gstin,
+discount, soh, cost, catagory, sub_catagory, brand, expiry_date, store_code,
+store_name, vendor_name, vendor_gst); only item_code, item_name and rate are
+required. Blank cells leave an existing item's value as it is.
+
+Usage:
+    python manage.py import-items catalog.csv
+    python manage.py import-items vendor_catalog.xlsx --dry-run
+"""
+
+import os
+
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "10000"))
+# Keep at most this many row errors in the report (the count is always exact)
+IMPORT_MAX_ERRORS = 1000
+
+GST_SLABS = (0, 5, 12, 18, 28)
+REQUIRED = ("item_code", "item_name", "rate")
+NUMBER_COLUMNS = ("rate", "gstin", "discount", "soh", "cost", "store_code")
+TEXT_COLUMNS = ("item_name", "catagory", "sub_catagory", "brand", "store_name", "vendor_name", "vendor_gst")
+REFERENCE_COLUMNS = ("catagory", "sub_catagory", "brand")
+COLUMNS = ("item_code",) + NUMBER_COLUMNS + TEXT_COLUMNS + ("expiry_date",)
+
+# Other header spellings seen in vendor sheets
+ALIASES = {
+    "code": "item_code", "itemcode": "item_code", "sku": "item_code",
+    "name": "item_name", "itemname": "item_name",
+    "price": "rate", "mrp": "rate",
+    "gst": "gstin", "gst_%": "gstin", "gst_rate": "gstin",
+    "discount_%": "discount", "stock": "soh", "stock_on_hand": "soh",
+    "purchase_cost": "cost", "category": "catagory", "sub_category": "sub_catagory",
+    "subcategory": "sub_catagory", "expiry": "expiry_date", "vendor": "vendor_name",
+    "quantity": "qty", "received_qty": "qty",
+}
+
+# Fields given to new items when the sheet leaves them out
+IMPORT_DEFAULTS = {"qty": 1, "gstin": 0, "discount": 0, "soh": 0, "cost": 0}
+
+
+def read_chunks(source, filename=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows, every cell as stripped text.
+
+    `source` is a path or a file object (e.g. a Streamlit upload); the
+    format comes from the file name. Excel has no streaming reader in
+    pandas, so a workbook's first sheet is read whole and then sliced.
+    """
+    name = (filename or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(source, dtype=str, keep_default_na=False)
+        chunks = (frame.iloc[start:start + chunk_rows] for start in range(0, len(frame), chunk_rows))
+    else:
+        chunks = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                             skipinitialspace=True, encoding_errors="replace")
+    for chunk in chunks:
+        chunk.columns = [_column_name(column) for column in chunk.columns]
+        yield chunk.apply(lambda column: column.str.strip())
+
+
+def _column_name(header):
+    name = str(header).strip().lower().replace(" ", "_").replace("-", "_")
+    return ALIASES.get(name, name)
+
+
+def _canonical(values):
+    """Map each name's lower-case form to its stored spelling"""
+    return {str(value).strip().lower(): value for value in values if value}
+
+
+def validate_chunk(chunk, references, first_row=2):
+    """Check and normalise one chunk.
+
+    The chunk must have the REQUIRED columns. Returns the valid rows as
+    item dicts (blank cells left out) and a list of {"row", "item_code",
+    "error"} dicts. `first_row` is the sheet row number of the chunk's
+    first line (the header is row 1).
+    """
+    chunk = chunk.reset_index(drop=True)
+    rows = pd.Series(range(first_row, first_row + len(chunk)))
+
+    data = pd.DataFrame(index=chunk.index)
+    problems = []
+
+    def check(mask, message):
+        if mask.any():
+            problems.append((mask, message))
+
+    raw_code = chunk["item_code"]
+    code = pd.to_numeric(raw_code, errors="coerce")
+    check(raw_code.eq(""), "item_code is blank")
+    check(raw_code.ne("") & (code.isna() | (code % 1 != 0) | (code <= 0)), "item_code is not a positive whole number")
+    data["item_code"] = code
+
+    check(chunk["item_name"].eq(""), "item_name is blank")
+    for column in TEXT_COLUMNS:
+        if column in chunk.columns:
+            data[column] = chunk[column].where(chunk[column].ne(""))
+
+    for column in NUMBER_COLUMNS:
+        if column not in chunk.columns:
+            continue
+        raw = chunk[column].str.replace(",", "", regex=False).str.lstrip("₹").str.rstrip("%")
+        number = pd.to_numeric(raw, errors="coerce")
+        given = raw.ne("")
+        check(given & number.isna(), f"{column} is not a number")
+        check(number < 0, f"{column} is negative")
+        data[column] = number
+    check(chunk["rate"].eq(""), "rate is blank")
+    if "discount" in data:
+        check(data["discount"] > 100, "discount is over 100%")
+    if "gstin" in data:
+        check(data["gstin"].notna() & ~data["gstin"].isin(GST_SLABS),
+              f"gstin is not a GST slab ({', '.join(str(slab) for slab in GST_SLABS)})")
+    for column in ("soh", "store_code"):
+        if column in data:
+            check(data[column].notna() & (data[column] % 1 != 0), f"{column} is not a whole number")
+
+    if "expiry_date" in chunk.columns:
+        raw = chunk["expiry_date"]
+        # ISO dates first, then the day-first dates typed at the counter (20-6-2026, 20/06/26)
+        expiry = pd.to_datetime(raw, format="%Y-%m-%d", errors="coerce")
+        expiry = expiry.fillna(pd.to_datetime(raw.where(expiry.isna()), format="mixed", dayfirst=True, errors="coerce"))
+        check(raw.ne("") & expiry.isna(), "expiry_date is not a date")
+        data["expiry_date"] = expiry.dt.strftime("%Y-%m-%d").where(expiry.notna())
+
+    for column in REFERENCE_COLUMNS:
+        if column in data:
+            known = _canonical(references.get(column, []))
+            lowered = data[column].str.lower()
+            check(data[column].notna() & ~lowered.isin(list(known)), f"unknown {column}")
+            data[column] = lowered.map(known).where(data[column].notna())
+    if "vendor_name" in data:
+        vendors = {name.strip().lower(): (name, gst) for name, gst in references.get("vendors", {}).items()}
+        lowered = data["vendor_name"].str.lower()
+        check(data["vendor_name"].notna() & ~lowered.isin(list(vendors)), "unknown vendor_name")
+        data["vendor_name"] = lowered.map({key: name for key, (name, _) in vendors.items()}).where(data["vendor_name"].notna())
+        gst = lowered.map({key: gst for key, (_, gst) in vendors.items()})
+        data["vendor_gst"] = data["vendor_gst"].fillna(gst) if "vendor_gst" in data else gst.where(gst.ne(""))
+
+    bad = pd.Series(False, index=chunk.index)
+    errors = []
+    for mask, message in problems:
+        bad |= mask
+        errors.extend(
+            {"row": row, "item_code": item_code, "error": message}
+            for row, item_code in zip(rows[mask].tolist(), raw_code[mask].tolist())
+        )
+    # Only the last row for a code is written, as a file read top to bottom would leave it
+    codes = data["item_code"].where(~bad)
+    repeated = codes.duplicated(keep="last") & codes.notna()
+    errors.extend(
+        {"row": row, "item_code": item_code, "error": "item_code repeated in a later row, skipped"}
+        for row, item_code in zip(rows[repeated].tolist(), raw_code[repeated].tolist())
+    )
+    data = data[~(bad | repeated)]
+
+    # A bad cell turns a column to float; keep whole-number columns as ints
+    for column in ("item_code",) + NUMBER_COLUMNS:
+        if column in data and (data[column].dropna() % 1 == 0).all():
+            data[column] = data[column].astype("Int64")
+    columns = [column for column in COLUMNS if column in data]
+    # tolist() gives Python ints/floats/str, which the drivers can store
+    values = [data[column].astype(object).where(data[column].notna(), None).tolist() for column in columns]
+    items = [
+        {column: value for column, value in zip(columns, row) if value is not None}
+        for row in zip(*values)
+    ]
+    errors.sort(key=lambda error: error["row"])
+    return items, errors
+
+
+def import_items(db_ops, source, filename=None, chunk_rows=IMPORT_CHUNK_ROWS, dry_run=False, progress=None):
+    """Validate and upsert every row of a CSV/Excel item sheet; returns a report dict"""
+    references = db_ops.get_item_references()
+    report = {"rows": 0, "valid": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    defaults = dict(IMPORT_DEFAULTS, store_code=db_ops.STORE_CODE)
+    first_row = 2
+    for chunk in read_chunks(source, filename, chunk_rows):
+        missing = [column for column in REQUIRED if column not in chunk.columns]
+        if missing:
+            report["error_count"] = 1
+            report["errors"] = [{"row": 1, "item_code": "", "error": f"Missing column(s): {', '.join(missing)}"}]
+            break
+        items, errors = validate_chunk(chunk, references, first_row)
+        if not dry_run and items:
+            written = db_ops.upsert_items(items, defaults)
+            report["inserted"] += written["inserted"]
+            report["updated"] += written["updated"]
+            errors += [{"row": None, "item_code": error["item_code"], "error": error["error"]}
+                       for error in written["errors"]]
+        report["rows"] += len(chunk)
+        report["valid"] += len(items)
+        report["error_count"] += len(errors)
+        report["errors"].extend(errors[:IMPORT_MAX_ERRORS - len(report["errors"])])
+        first_row += len(chunk)
+        if progress:
+            progress(report)
+    return report
+
+
+def read_receipt_lines(source, filename=None):
+    """Read goods-received lines (item_code, qty and optional cost) from a CSV/Excel sheet.
+
+    Returns {item_code, qty, cost} dicts (cost None when blank) and the
+    row-level errors, in the same form as validate_chunk.
+    """
+    lines, errors = [], []
+    first_row = 2
+    for chunk in read_chunks(source, filename):
+        chunk = chunk.reset_index(drop=True)
+        if "item_code" not in chunk.columns or "qty" not in chunk.columns:
+            return [], [{"row": 1, "item_code": "", "error": "Missing column(s): item_code and qty are required"}]
+        rows = pd.Series(range(first_row, first_row + len(chunk)))
+        code = pd.to_numeric(chunk["item_code"], errors="coerce")
+        qty = pd.to_numeric(chunk["qty"], errors="coerce")
+        cost = pd.to_numeric(chunk["cost"], errors="coerce") if "cost" in chunk.columns else pd.Series(float("nan"), index=chunk.index)
+        problems = [
+            (code.isna() | (code % 1 != 0) | (code <= 0), "item_code is not a positive whole number"),
+            (qty.isna() | (qty % 1 != 0) | (qty <= 0), "qty is not a positive whole number"),
+        ]
+        if "cost" in chunk.columns:
+            problems.append(((chunk["cost"].ne("") & cost.isna()) | (cost < 0), "cost is not a valid amount"))
+        bad = pd.Series(False, index=chunk.index)
+        for mask, message in problems:
+            bad |= mask
+            errors.extend(
+                {"row": row, "item_code": item_code, "error": message}
+                for row, item_code in zip(rows[mask].tolist(), chunk["item_code"][mask].tolist())
+            )
+        good = ~bad
+        lines.extend(
+            {"item_code": int(item_code), "qty": int(item_qty), "cost": None if item_cost != item_cost else item_cost}
+            for item_code, item_qty, item_cost in zip(code[good].tolist(), qty[good].tolist(), cost[good].tolist())
+        )
+        first_row += len(chunk)
+    errors.sort(key=lambda error: error["row"])
+    return lines, errors
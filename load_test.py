@@ -0,0 +1,259 @@
+"""
+Concurrent-cashier load test for Billing App
+Runs N simulated cashiers (threads or processes) through the billing flow
+against a scratch database: take the next invoice number, scan each item
+with search_item, build the cart as billing_page does, save the checkout
+and render the invoice PDF. Reports throughput, checkout latency
+percentiles, duplicate invoice numbers and stock-count drift.
+
+Usage:
+    python load_test.py --cashiers 8 --duration 60
+    python load_test.py --backend sqlite --cashiers 4 --mode process --bills 200 --no-pdf
+"""
+
+import argparse
+import datetime as dt
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+import storage
+import synthetic_data
+from invoice_export import bill_to_invoice
+
+
+class Cashier:
+    """One lane: runs checkouts until the deadline or its bill quota"""
+
+    def __init__(self, lane, db_ops, options):
+        self.lane = lane
+        self.db_ops = db_ops
+        self.options = options
+        self.rng = random.Random(f"{options['seed']}:lane:{lane}")
+        self.results = {
+            "lane": lane, "latencies": [], "scan": [], "save": [], "pdf": [],
+            "invoice_nos": [], "sold": Counter(), "lines": 0, "errors": Counter(),
+        }
+
+    def checkout_once(self):
+        db_ops, rng, options = self.db_ops, self.rng, self.options
+        start = time.perf_counter()
+        bill_no = db_ops.next_invoice_no()
+
+        # Scan each item as the billing page does: search_item by code
+        cart = []
+        for _ in range(min(60, 1 + int(rng.expovariate(1 / options["cart"])))):
+            index = synthetic_data.popular_index(rng, options["items"])
+            item = db_ops.search_item(str(synthetic_data.FIRST_ITEM_CODE + index))
+            if item:
+                cart.append((item, synthetic_data.weighted_choice(rng, synthetic_data.LINE_QTY)))
+        scanned = time.perf_counter()
+
+        bill, lines, invoice = synthetic_data.make_bill(
+            bill_no, db_ops.STORE_CODE, dt.datetime.now(db_ops.INDIA_TZ), cart,
+            cashier=f"lane{self.lane}",
+            payment_mode=synthetic_data.weighted_choice(rng, synthetic_data.PAYMENT_MODES),
+            terminal_id=f"load-{self.lane}"
+        )
+        db_ops.checkout(bill, lines, invoice)
+        saved = time.perf_counter()
+
+        if options["pdf"]:
+            import invoice_pdf
+            invoice_pdf.generate_pdf(bill_to_invoice(bill, lines), return_bytes=True)
+        done = time.perf_counter()
+
+        r = self.results
+        r["latencies"].append(done - start)
+        r["scan"].append(scanned - start)
+        r["save"].append(saved - scanned)
+        r["pdf"].append(done - saved)
+        r["invoice_nos"].append(bill_no)
+        r["lines"] += len(lines)
+        for line in lines:
+            r["sold"][line["item_code"]] += line["qty"]
+
+    def run(self, start_at, deadline, quota):
+        time.sleep(max(0.0, start_at - time.time()))
+        count = 0
+        while (quota is None or count < quota) and (deadline is None or time.time() < deadline):
+            try:
+                self.checkout_once()
+            except Exception as e:
+                self.results["errors"][f"{type(e).__name__}: {e}"[:120]] += 1
+            count += 1
+            if self.options["think_ms"]:
+                time.sleep(self.options["think_ms"] / 1000)
+        return self.results
+
+
+def _point_at(db_ops, backend, database):
+    if backend == "sqlite":
+        db_ops.SQLITE_DB_PATH = database
+    else:
+        db_ops.DB_NAME = database
+
+
+def _run_process_lane(args):
+    """Process mode: each lane is its own terminal with its own connections and invoice blocks"""
+    lane, backend, database, options, start_at, deadline, quota = args
+    os.environ["TERMINAL_ID"] = f"load-{lane}"
+    db_ops = storage.get_backend(backend)
+    _point_at(db_ops, backend, database)
+    db_ops.init_database()
+    return Cashier(lane, db_ops, options).run(start_at, deadline, quota)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def check_database(db_ops, initial_soh, sold):
+    """Compare what the cashiers recorded with what the database holds"""
+    bill_counts = Counter()
+    after = None
+    while True:
+        page = db_ops.get_bills_page(after=after, page_size=1000, projection=["bill_no"])
+        bill_counts.update(str(bill["bill_no"]) for bill in page["rows"])
+        after = page["next"]
+        if after is None:
+            break
+    lines_sold = Counter()
+    for line in db_ops.get_all_sale_details():
+        lines_sold[line["item_code"]] += line["qty"]
+    soh = {item["item_code"]: item.get("soh") or 0 for item in db_ops.get_all_items()}
+    drift = {}
+    for item_code, start in initial_soh.items():
+        # Stock must fall by exactly what was sold, per the sale lines and per the lanes
+        expected = start - lines_sold.get(item_code, 0)
+        if soh.get(item_code, 0) != expected or lines_sold.get(item_code, 0) != sold.get(item_code, 0):
+            drift[item_code] = {
+                "initial": start, "now": soh.get(item_code, 0), "expected": expected,
+                "sold_lanes": sold.get(item_code, 0), "sold_lines": lines_sold.get(item_code, 0),
+            }
+    return {
+        "bills": sum(bill_counts.values()),
+        "duplicate_bills": {bill_no: n for bill_no, n in bill_counts.items() if n > 1},
+        "drift": drift,
+    }
+
+
+def run(backend, database, cashiers=4, mode="thread", duration=None, bills=None, items=2000, cart=3.5,
+        pdf=True, think_ms=0, seed=1, workers=None):
+    """Seed the catalog, run the lanes and return the report dict"""
+    print(f"Seeding {items} items into {backend}:{database}")
+    synthetic_data.generate(backend, database, seed=seed, items=items, bills=0, workers=workers,
+                            drop=True, progress=lambda message: None)
+    db_ops = storage.get_backend(backend)
+    _point_at(db_ops, backend, database)
+    db_ops.invalidate_catalog()
+    initial_soh = {item["item_code"]: item.get("soh") or 0 for item in db_ops.get_all_items()}
+
+    options = {"seed": seed, "items": items, "cart": cart, "pdf": pdf, "think_ms": think_ms}
+    start_at = time.time() + (5 if mode == "process" else 0.5)
+    deadline = start_at + duration if duration else None
+    print(f"Running {cashiers} cashiers as {mode}s")
+    if mode == "process":
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(cashiers) as pool:
+            results = pool.map(_run_process_lane, [
+                (lane, backend, database, options, start_at, deadline, bills) for lane in range(cashiers)
+            ])
+    else:
+        lanes = [Cashier(lane, db_ops, options) for lane in range(cashiers)]
+        results = [None] * cashiers
+
+        def lane_thread(i):
+            results[i] = lanes[i].run(start_at, deadline, bills)
+
+        threads = [threading.Thread(target=lane_thread, args=(i,), name=f"lane-{i}") for i in range(cashiers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.time() - start_at
+
+    latencies = sorted(x for r in results for x in r["latencies"])
+    invoice_nos = Counter(n for r in results for n in r["invoice_nos"])
+    sold = Counter()
+    errors = Counter()
+    for r in results:
+        sold.update(r["sold"])
+        errors.update(r["errors"])
+    report = {
+        "cashiers": cashiers,
+        "mode": mode,
+        "seconds": round(elapsed, 2),
+        "checkouts": len(latencies),
+        "lines": sum(r["lines"] for r in results),
+        "throughput_bills_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)
+        },
+        "stage_median_ms": {
+            stage: round(statistics.median([x for r in results for x in r[stage]] or [0]) * 1000, 1)
+            for stage in ("scan", "save", "pdf")
+        },
+        "duplicate_invoice_nos": {n: count for n, count in invoice_nos.items() if count > 1},
+        "errors": dict(errors),
+    }
+    report.update(check_database(db_ops, initial_soh, sold))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run simulated cashiers through the billing flow")
+    parser.add_argument("--backend", choices=sorted(storage.BACKENDS), default=storage.STORAGE_BACKEND)
+    parser.add_argument("--database", help="MongoDB database name or SQLite file "
+                        "(default: <MONGO_DB_NAME>_loadtest or billing_app_loadtest.db); it is emptied first")
+    parser.add_argument("--cashiers", type=int, default=4)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--duration", type=float, help="seconds to run (default: 30 unless --bills is given)")
+    parser.add_argument("--bills", type=int, help="checkouts per cashier")
+    parser.add_argument("--items", type=int, default=2000, help="catalog size")
+    parser.add_argument("--cart", type=float, default=3.5, help="mean items per bill")
+    parser.add_argument("--no-pdf", dest="pdf", action="store_false", help="skip rendering the invoice PDF")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a lane's checkouts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        if args.backend == "sqlite":
+            database = "billing_app_loadtest.db"
+        else:
+            database = f"{storage.get_backend(args.backend).DB_NAME}_loadtest"
+    duration = args.duration if args.duration or args.bills else 30
+    report = run(args.backend, database, cashiers=args.cashiers, mode=args.mode, duration=duration,
+                 bills=args.bills, items=args.items, cart=args.cart, pdf=args.pdf,
+                 think_ms=args.think_ms, seed=args.seed)
+
+    print(f"\n{report['checkouts']} checkouts ({report['lines']} lines) by {report['cashiers']} {report['mode']} "
+          f"cashiers in {report['seconds']}s: {report['throughput_bills_s']} bills/s")
+    latency = report["latency_ms"]
+    print(f"checkout latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}")
+    stages = report["stage_median_ms"]
+    print(f"median ms per stage: scan {stages['scan']}  save {stages['save']}  pdf {stages['pdf']}")
+    print(f"bills in database: {report['bills']}")
+    print(f"duplicate invoice numbers: {len(report['duplicate_invoice_nos'])} handed out, "
+          f"{len(report['duplicate_bills'])} stored")
+    print(f"items with stock drift: {len(report['drift'])}")
+    for item_code, drift in list(report["drift"].items())[:10]:
+        print(f"  {item_code}: {drift}")
+    for error, count in report["errors"].items():
+        print(f"error x{count}: {error}")
+    failed = report["duplicate_invoice_nos"] or report["duplicate_bills"] or report["drift"] or report["errors"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Admin commands for Billing App
+Usage: python manage.py <command>
+"""
+
+import argparse
+import datetime as dt
+import sys
+import storage
+
+
+def migrate(args):
+    """Apply the schema (collections, indexes, data migrations) now"""
+    db_ops = storage.get_backend(args.backend)
+    before = db_ops.get_schema_version()
+    db_ops.init_database(force=args.force)
+    print(f"Schema version {before} -> {db_ops.get_schema_version()} (code expects {db_ops.SCHEMA_VERSION})")
+
+
+def rebuild_rollups(args):
+    """Regenerate the sales rollups from bill history"""
+    db_ops = storage.get_backend(args.backend)
+    counts = db_ops.rebuild_rollups()
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+
+
+def rebuild_customers(args):
+    """Regenerate the customers collection from bill history"""
+    db_ops = storage.get_backend(args.backend)
+    print(f"customers: {db_ops.rebuild_customers()} rows")
+
+
+def backfill_sold_at(args):
+    """Add sold_at timestamps to bills and sale lines saved before they existed"""
+    db_ops = storage.get_backend(args.backend)
+    for name, count in db_ops.backfill_sold_at().items():
+        print(f"{name}: {count} updated")
+
+
+def export_invoices(args):
+    """Reprint invoices for a date range or bill list into a zip or directory"""
+    import invoice_export
+    db_ops = storage.get_backend(args.backend)
+
+    def progress(done, total):
+        sys.stdout.write(f"\r{done}/{total} invoices")
+        sys.stdout.flush()
+
+    count = invoice_export.export_invoices(
+        db_ops, args.output,
+        start_date=dt.date.fromisoformat(args.start) if args.start else None,
+        end_date=dt.date.fromisoformat(args.end) if args.end else None,
+        bill_nos=args.bills,
+        workers=args.workers,
+        progress=progress
+    )
+    print(f"\nWrote {count} invoices to {args.output}")
+
+
+def import_items(args):
+    """Validate and upsert items from a CSV/Excel sheet"""
+    import item_import
+    db_ops = storage.get_backend(args.backend)
+
+    def progress(report):
+        sys.stdout.write(f"\r{report['rows']} rows read, {report['valid']} valid, {report['error_count']} errors")
+        sys.stdout.flush()
+
+    report = item_import.import_items(db_ops, args.file, dry_run=args.dry_run, progress=progress)
+    print()
+    for error in report["errors"][:50]:
+        print(f"row {error['row']}: item {error['item_code']}: {error['error']}")
+    if report["error_count"] > 50:
+        print(f"... and {report['error_count'] - 50} more errors")
+    if args.dry_run:
+        print(f"Dry run: {report['valid']} of {report['rows']} rows would be imported")
+    else:
+        print(f"{report['inserted']} items added, {report['updated']} updated")
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-customers": rebuild_customers,
+    "backfill-sold-at": backfill_sold_at,
+    "export-invoices": export_invoices,
+    "import-items": import_items,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Billing App admin commands")
+    parser.add_argument("--backend", help="storage backend (defaults to STORAGE_BACKEND)")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("file", nargs="?", help="import-items: .csv or .xlsx file of items")
+    parser.add_argument("--force", action="store_true", help="migrate: re-apply the schema even if it is current")
+    parser.add_argument("--from", dest="start", help="export-invoices: first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="export-invoices: last day (YYYY-MM-DD)")
+    parser.add_argument("--bills", nargs="+", help="export-invoices: bill numbers instead of a date range")
+    parser.add_argument("--output", default="invoices.zip", help="export-invoices: .zip file or directory")
+    parser.add_argument("--workers", type=int, help="export-invoices: render processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="import-items: validate only, write nothing")
+    args = parser.parse_args(argv)
+    if args.command == "import-items" and not args.file:
+        parser.error("import-items needs a file")
+    COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
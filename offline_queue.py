@@ -0,0 +1,413 @@
+"""
+Offline-first checkout queue for Billing App
+Checkouts are committed to a local SQLite journal and a background worker
+drains them to MongoDB in batches, so a slow or dropped link to the server
+never blocks the till. The journal also holds invoice number blocks leased
+ahead, the last applied schema version and the logins seen online, so a
+till can start and bill while MongoDB is unreachable.
+"""
+
+import atexit
+import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import pymongo
+from bson import ObjectId
+from pymongo.errors import ConnectionFailure, PyMongoError
+from dotenv import load_dotenv
+import mongo_db
+
+# Load environment variables
+load_dotenv()
+
+# off: write straight to MongoDB; auto: queue only when MongoDB is unreachable
+# or slow; always: every checkout goes through the local queue
+OFFLINE_MODE = os.getenv("OFFLINE_MODE", "off")
+OFFLINE_QUEUE_PATH = os.getenv("OFFLINE_QUEUE_PATH", "till_queue.db")
+OFFLINE_ONLINE_TIMEOUT = float(os.getenv("OFFLINE_ONLINE_TIMEOUT", "3"))
+OFFLINE_SYNC_INTERVAL = float(os.getenv("OFFLINE_SYNC_INTERVAL", "5"))
+OFFLINE_SYNC_BATCH = int(os.getenv("OFFLINE_SYNC_BATCH", "50"))
+# Invoice number blocks kept leased in the journal for billing offline
+OFFLINE_INVOICE_BLOCKS = int(os.getenv("OFFLINE_INVOICE_BLOCKS", "2"))
+# An entry that fails this many times on its own is set aside as 'error'
+OFFLINE_MAX_ATTEMPTS = int(os.getenv("OFFLINE_MAX_ATTEMPTS", "5"))
+
+_local = threading.local()
+
+def _json_default(value):
+    if isinstance(value, dt.datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot queue value of type {type(value).__name__}")
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and "$date" in obj:
+        return dt.datetime.fromisoformat(obj["$date"])
+    return obj
+
+def _strip_ids(doc):
+    return {key: value for key, value in doc.items() if key != '_id'}
+
+def get_queue_db():
+    """Get this thread's connection to the local queue journal"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(OFFLINE_QUEUE_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Every queued bill must survive a power cut
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bill_no TEXT UNIQUE NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            synced_at TEXT
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_outbox_status ON outbox (status, id)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS invoice_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_code INTEGER NOT NULL,
+            next INTEGER NOT NULL,
+            last INTEGER NOT NULL,
+            lease_id TEXT
+        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS logins (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            role TEXT
+        )""")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _local.conn = conn
+    return conn
+
+def _offline_error(e):
+    """Whether a MongoDB error means the server could not be reached in time"""
+    return isinstance(e, ConnectionFailure) or e.timeout
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(conn, key, value):
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, str(value))
+    )
+
+_schema_ready = False
+
+def init_database():
+    """Apply the MongoDB schema, or start on the schema version cached in the journal.
+
+    Called once per process. When MongoDB is unreachable the till starts
+    if the journal recorded the current SCHEMA_VERSION on an earlier run.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    conn = get_queue_db()
+    try:
+        with pymongo.timeout(OFFLINE_ONLINE_TIMEOUT):
+            mongo_db.init_database()
+    except PyMongoError as e:
+        cached = _get_meta(conn, "schema_version")
+        if not _offline_error(e) or cached is None or int(cached) < mongo_db.SCHEMA_VERSION:
+            raise
+        mongo_db.mark_unreachable()
+        print(f"MongoDB unavailable, starting on cached schema version {cached}: {e}")
+    else:
+        _set_meta(conn, "schema_version", mongo_db.SCHEMA_VERSION)
+    _schema_ready = True
+
+def verify_login(username, password):
+    """Verify a login against MongoDB, or against the logins seen online while it is unreachable"""
+    conn = get_queue_db()
+    if not mongo_db.is_unreachable():
+        try:
+            with pymongo.timeout(OFFLINE_ONLINE_TIMEOUT):
+                user = mongo_db.verify_login(username, password)
+        except PyMongoError as e:
+            if not _offline_error(e):
+                raise
+            mongo_db.mark_unreachable()
+        else:
+            if user:
+                conn.execute(
+                    "INSERT INTO logins (username, password, role) VALUES (?, ?, ?) "
+                    "ON CONFLICT(username) DO UPDATE SET password = excluded.password, role = excluded.role",
+                    (user.get('username'), password, user.get('role'))
+                )
+            else:
+                conn.execute("DELETE FROM logins WHERE username = ?", (username,))
+            return user
+    row = conn.execute(
+        "SELECT username, role FROM logins WHERE username = ? AND password = ?", (username, password)
+    ).fetchone()
+    return dict(row) if row else None
+
+def _release_blocks(conn, spent_only):
+    """Release journal blocks' leases on MongoDB and forget them, returns False if unreachable"""
+    blocks = conn.execute(
+        "SELECT id, lease_id FROM invoice_blocks" + (" WHERE next > last" if spent_only else "")
+    ).fetchall()
+    for block in blocks:
+        try:
+            if block['lease_id']:
+                with pymongo.timeout(OFFLINE_ONLINE_TIMEOUT):
+                    mongo_db.release_invoice_lease(ObjectId(block['lease_id']))
+        except PyMongoError as e:
+            if not _offline_error(e):
+                raise
+            mongo_db.mark_unreachable()
+            return False
+        conn.execute("DELETE FROM invoice_blocks WHERE id = ?", (block['id'],))
+    return True
+
+def _lease_invoice_blocks(conn, store_code):
+    """Lease blocks from MongoDB until OFFLINE_INVOICE_BLOCKS have numbers left"""
+    if not mongo_db.is_unreachable() and not _release_blocks(conn, spent_only=True):
+        return
+    remaining = conn.execute(
+        "SELECT COUNT(*) FROM invoice_blocks WHERE store_code = ? AND next <= last", (store_code,)
+    ).fetchone()[0]
+    while remaining < OFFLINE_INVOICE_BLOCKS and not mongo_db.is_unreachable():
+        try:
+            with pymongo.timeout(OFFLINE_ONLINE_TIMEOUT):
+                first, last, lease_id = mongo_db.lease_invoice_block(store_code, holder="journal")
+        except PyMongoError as e:
+            if not _offline_error(e):
+                raise
+            mongo_db.mark_unreachable()
+            return
+        conn.execute(
+            "INSERT INTO invoice_blocks (store_code, next, last, lease_id) VALUES (?, ?, ?, ?)",
+            (store_code, first, last, str(lease_id))
+        )
+        remaining += 1
+
+def next_invoice_no(store_code=mongo_db.STORE_CODE):
+    """Get the next invoice number from the blocks leased into the journal.
+
+    Blocks are leased ahead while MongoDB is reachable, so an offline till
+    (even after a restart) keeps numbering bills until they run out.
+    """
+    conn = get_queue_db()
+    _lease_invoice_blocks(conn, store_code)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        block = conn.execute(
+            "SELECT id, next, last FROM invoice_blocks WHERE store_code = ? AND next <= last ORDER BY id LIMIT 1",
+            (store_code,)
+        ).fetchone()
+        if block is None:
+            raise Exception("No invoice numbers left offline; reconnect to MongoDB to lease more")
+        # A spent block is kept until its lease can be released online
+        conn.execute("UPDATE invoice_blocks SET next = next + 1 WHERE id = ?", (block['id'],))
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return block['next']
+
+def release_invoice_blocks():
+    """Give the journal's leased blocks back at shutdown so their unused numbers show as gaps.
+
+    Only while MongoDB is reachable: a till that shuts down offline keeps
+    its blocks for billing on its next start.
+    """
+    if OFFLINE_MODE == "off" or mongo_db.is_unreachable():
+        return
+    try:
+        _release_blocks(get_queue_db(), spent_only=False)
+    except Exception as e:
+        print(f"Could not release invoice blocks: {e}")
+
+atexit.register(release_invoice_blocks)
+
+def enqueue_checkout(bill_data, sale_details, invoice_data=None):
+    """Commit a checkout to the local queue, returns the queue entry id"""
+    payload = json.dumps({
+        "bill": _strip_ids(bill_data),
+        "lines": [_strip_ids(line) for line in sale_details],
+        "invoice": _strip_ids(invoice_data) if invoice_data else None
+    }, default=_json_default)
+    conn = get_queue_db()
+    entry_id = conn.execute(
+        "INSERT INTO outbox (bill_no, payload, created_at) VALUES (?, ?, ?)",
+        (str(bill_data['bill_no']), payload, dt.datetime.now(dt.timezone.utc).isoformat())
+    ).lastrowid
+    mongo_db.record_local_checkout(sale_details, invoice_data)
+    return entry_id
+
+def checkout(bill_data, sale_details, invoice_data=None):
+    """Save a checkout according to OFFLINE_MODE"""
+    # The queued copy keeps the id of a direct attempt that may have reached the server
+    bill_data.setdefault('checkout_id', uuid.uuid4().hex)
+    if OFFLINE_MODE == "always":
+        start_sync_worker()
+        return enqueue_checkout(bill_data, sale_details, invoice_data)
+    if OFFLINE_MODE == "auto":
+        start_sync_worker()
+        if mongo_db.is_unreachable():
+            return enqueue_checkout(bill_data, sale_details, invoice_data)
+        try:
+            with pymongo.timeout(OFFLINE_ONLINE_TIMEOUT):
+                return mongo_db.checkout(bill_data, sale_details, invoice_data)
+        except PyMongoError as e:
+            if not _offline_error(e):
+                raise
+            # The sync is idempotent, so a checkout that did reach the
+            # server before the timeout is completed or skipped
+            print(f"MongoDB unavailable, queueing bill {bill_data['bill_no']}: {e}")
+            mongo_db.mark_unreachable()
+            return enqueue_checkout(bill_data, sale_details, invoice_data)
+    return mongo_db.checkout(bill_data, sale_details, invoice_data)
+
+def _record_statuses(conn, results):
+    """Store the outcome of synced entries: (entry id, status or None, error)"""
+    now = dt.datetime.now(dt.timezone.utc).isoformat()
+    conn.execute("BEGIN")
+    for entry_id, status, error in results:
+        if status == "conflict":
+            conn.execute(
+                "UPDATE outbox SET status = 'conflict', attempts = attempts + 1, "
+                "last_error = 'bill number already used by another bill' WHERE id = ?",
+                (entry_id,)
+            )
+        elif status is None:
+            # Failed on its own: give up after OFFLINE_MAX_ATTEMPTS so the rest can sync
+            conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'error' ELSE status END WHERE id = ?",
+                (error, OFFLINE_MAX_ATTEMPTS, entry_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE outbox SET status = 'synced', attempts = attempts + 1, "
+                "last_error = NULL, synced_at = ? WHERE id = ?",
+                (now, entry_id)
+            )
+    conn.execute("COMMIT")
+
+def _sync_one_by_one(rows):
+    """Sync a failed batch entry by entry, returns ([(id, status, error)], stopped offline)"""
+    results = []
+    for row in rows:
+        try:
+            entry = json.loads(row['payload'], object_hook=_json_object_hook)
+            status = mongo_db.sync_checkouts([(entry['bill'], entry['lines'], entry['invoice'])])[0]
+        except PyMongoError as e:
+            if _offline_error(e):
+                mongo_db.mark_unreachable()
+                return results, True
+            results.append((row['id'], None, str(e)))
+        except Exception as e:
+            results.append((row['id'], None, f"{type(e).__name__}: {e}"))
+        else:
+            results.append((row['id'], status, None))
+    return results, False
+
+def sync_pending(batch_size=OFFLINE_SYNC_BATCH):
+    """Push queued checkouts to MongoDB, returns the number of entries synced.
+
+    A batch that fails for any reason other than MongoDB being unreachable
+    is retried one entry at a time, so one bad entry cannot hold up the
+    queue; an entry that keeps failing is set aside with status 'error'.
+    """
+    conn = get_queue_db()
+    processed = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, payload FROM outbox WHERE status = 'pending' ORDER BY id LIMIT ?",
+            (batch_size,)
+        ).fetchall()
+        if not rows:
+            return processed
+        try:
+            entries = [json.loads(row['payload'], object_hook=_json_object_hook) for row in rows]
+            statuses = mongo_db.sync_checkouts(
+                [(entry['bill'], entry['lines'], entry['invoice']) for entry in entries]
+            )
+        except PyMongoError as e:
+            if not _offline_error(e):
+                results, stopped = _sync_one_by_one(rows)
+            else:
+                mongo_db.mark_unreachable()
+                conn.executemany(
+                    "UPDATE outbox SET last_error = ? WHERE id = ?", [(str(e), row['id']) for row in rows]
+                )
+                return processed
+        except Exception:
+            results, stopped = _sync_one_by_one(rows)
+        else:
+            results, stopped = [(row['id'], status, None) for row, status in zip(rows, statuses)], False
+        if results:
+            _record_statuses(conn, results)
+        synced = sum(1 for _, status, _ in results if status is not None)
+        processed += synced
+        if stopped or synced < len(rows):
+            # Failed entries stay pending until the next run
+            return processed
+        mongo_db.mark_reachable()
+
+def get_queue_status():
+    """Get queued checkout counts by status and the entries that did not sync (conflicts and errors)"""
+    conn = get_queue_db()
+    counts = {row['status']: row['n'] for row in conn.execute(
+        "SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"
+    )}
+    conflicts = [dict(row) for row in conn.execute(
+        "SELECT id, bill_no, status, created_at, last_error FROM outbox "
+        "WHERE status IN ('conflict', 'error') ORDER BY id"
+    )]
+    last_error = conn.execute(
+        "SELECT last_error FROM outbox WHERE status = 'pending' AND last_error IS NOT NULL ORDER BY id LIMIT 1"
+    ).fetchone()
+    return {
+        "mode": OFFLINE_MODE,
+        "pending": counts.get("pending", 0),
+        "synced": counts.get("synced", 0),
+        "errors": counts.get("error", 0),
+        "conflicts": conflicts,
+        "last_error": last_error[0] if last_error else None,
+    }
+
+class SyncWorker(threading.Thread):
+    """Background thread that drains the queue every OFFLINE_SYNC_INTERVAL seconds"""
+
+    def __init__(self, interval=OFFLINE_SYNC_INTERVAL):
+        super().__init__(name="offline-sync", daemon=True)
+        self.interval = interval
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                sync_pending()
+            except Exception as e:
+                print(f"Offline sync failed: {e}")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def start_sync_worker():
+    """Start the background sync worker once per process"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = SyncWorker()
+            _worker.start()
+    return _worker
@@ -0,0 +1,215 @@
+"""
+In-process item search index for Billing App
+Ranks item matches by code, name prefix, word prefix and substring using a
+sorted name/token list (prefix lookups) and a trigram index (substrings)
+"""
+
+import bisect
+import heapq
+import threading
+
+
+def _tokens(text):
+    return set(text.replace('-', ' ').replace('/', ' ').split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize(item_code, item_name, brand):
+    return str(item_name or '').lower().strip(), str(brand or '').lower().strip(), str(item_code).lower()
+
+
+class ItemSearchIndex:
+    """Search index over item names, codes and brands.
+
+    Results come back in rank order (exact code, exact name, name prefix,
+    word prefix, substring) and alphabetically within a rank. Later tiers
+    are only computed when earlier ones have not filled the result limit.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._by_code = {}
+            self._by_name = {}
+            self._sorted_names = []
+            self._postings = {}
+            self._sorted_tokens = []
+            self._trigram_postings = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, item_code, name, brand, code):
+        self._entries[item_code] = (name, brand, code)
+        self._by_code[code] = item_code
+        self._by_name.setdefault(name, set()).add(item_code)
+        text = f"{name} {brand} {code}"
+        new_tokens = []
+        for token in _tokens(text):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                new_tokens.append(token)
+            posting.add(item_code)
+        for gram in _trigrams(text):
+            posting = self._trigram_postings.get(gram)
+            if posting is None:
+                posting = self._trigram_postings[gram] = set()
+            posting.add(item_code)
+        return new_tokens
+
+    def rebuild(self, items):
+        """Replace the index from (item_code, item_name, brand) tuples"""
+        with self._lock:
+            self.clear()
+            for item_code, item_name, brand in items:
+                self._index(item_code, *_normalize(item_code, item_name, brand))
+            self._sorted_names = sorted(
+                (entry[0], entry[2], item_code) for item_code, entry in self._entries.items()
+            )
+            self._sorted_tokens = sorted(self._postings)
+
+    def add(self, item_code, item_name, brand=''):
+        """Index an item, replacing its previous entry"""
+        name, brand, code = _normalize(item_code, item_name, brand)
+        with self._lock:
+            old = self._entries.get(item_code)
+            if old is not None:
+                if old == (name, brand, code):
+                    return
+                self.remove(item_code)
+            for token in self._index(item_code, name, brand, code):
+                bisect.insort(self._sorted_tokens, token)
+            bisect.insort(self._sorted_names, (name, code, item_code))
+
+    def remove(self, item_code):
+        """Drop an item from the index"""
+        with self._lock:
+            entry = self._entries.pop(item_code, None)
+            if entry is None:
+                return
+            name, brand, code = entry
+            text = f"{name} {brand} {code}"
+            if self._by_code.get(code) == item_code:
+                del self._by_code[code]
+            names = self._by_name.get(name)
+            if names is not None:
+                names.discard(item_code)
+                if not names:
+                    del self._by_name[name]
+            i = bisect.bisect_left(self._sorted_names, (name, code))
+            while i < len(self._sorted_names) and self._sorted_names[i][0] == name:
+                if self._sorted_names[i][2] == item_code:
+                    del self._sorted_names[i]
+                    break
+                i += 1
+            for token in _tokens(text):
+                posting = self._postings.get(token)
+                if posting is not None:
+                    posting.discard(item_code)
+                    if not posting:
+                        del self._postings[token]
+                        j = bisect.bisect_left(self._sorted_tokens, token)
+                        if j < len(self._sorted_tokens) and self._sorted_tokens[j] == token:
+                            del self._sorted_tokens[j]
+            for gram in _trigrams(text):
+                posting = self._trigram_postings.get(gram)
+                if posting is not None:
+                    posting.discard(item_code)
+                    if not posting:
+                        del self._trigram_postings[gram]
+
+    def _token_prefix_matches(self, prefix):
+        codes = set()
+        i = bisect.bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            codes |= self._postings[self._sorted_tokens[i]]
+            i += 1
+        return codes
+
+    def _substring_matches(self, term):
+        postings = sorted(
+            (self._trigram_postings.get(gram, set()) for gram in _trigrams(term)),
+            key=len
+        )
+        if not postings or not postings[0]:
+            return set()
+        codes = set(postings[0])
+        for posting in postings[1:]:
+            codes &= posting
+            if not codes:
+                return codes
+        return {
+            item_code for item_code in codes
+            if term in self._entries[item_code][0]
+            or term in self._entries[item_code][1]
+            or term in self._entries[item_code][2]
+        }
+
+    def search(self, term, limit=20):
+        """Get up to `limit` item codes matching the term, best matches first"""
+        term = str(term or '').lower().strip()
+        if not term or limit <= 0:
+            return []
+        with self._lock:
+            results = []
+            seen = set()
+
+            def take(codes):
+                for item_code in codes:
+                    if len(results) >= limit:
+                        return
+                    if item_code not in seen:
+                        seen.add(item_code)
+                        results.append(item_code)
+
+            def by_name(codes):
+                need = limit - len(results)
+                if len(codes) * 64 > len(self._sorted_names):
+                    # Dense matches: walking the names in order finds the first few soonest
+                    ordered = []
+                    for _, _, item_code in self._sorted_names:
+                        if item_code in codes and item_code not in seen:
+                            ordered.append(item_code)
+                            if len(ordered) >= need:
+                                break
+                    return ordered
+                codes = codes - seen
+                if len(codes) > need:
+                    return heapq.nsmallest(need, codes, key=self._entries.__getitem__)
+                return sorted(codes, key=self._entries.__getitem__)
+
+            if term in self._by_code:
+                take([self._by_code[term]])
+            if term in self._by_name:
+                take(by_name(self._by_name[term]))
+
+            # Name prefix: walk the sorted names, already in name order
+            i = bisect.bisect_left(self._sorted_names, (term,))
+            while len(results) < limit and i < len(self._sorted_names):
+                name, _, item_code = self._sorted_names[i]
+                if not name.startswith(term):
+                    break
+                take([item_code])
+                i += 1
+
+            # Every query word is a prefix of some word of the name, brand or code
+            if len(results) < limit:
+                words = sorted(_tokens(term), key=len, reverse=True)
+                codes = self._token_prefix_matches(words[0])
+                for word in words[1:]:
+                    if not codes:
+                        break
+                    codes &= self._token_prefix_matches(word)
+                take(by_name(codes))
+
+            if len(results) < limit and len(term) >= 3:
+                take(by_name(self._substring_matches(term)))
+            return results
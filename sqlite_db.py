@@ -0,0 +1,1305 @@
+"""
+SQLite database utilities for Billing App
+Local-disk storage backend exposing the same functions as mongo_db
+"""
+
+import datetime as dt
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from catalog_cache import CatalogCache
+from customer_cache import CustomerCache
+
+# Load environment variables
+load_dotenv()
+
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "billing_app.db")
+STORE_CODE = int(os.getenv("STORE_CODE", "7001"))
+TERMINAL_ID = os.getenv("TERMINAL_ID", socket.gethostname())
+
+# Timezone of the tills; sold_at timestamps and day boundaries use it
+INDIA_TZ = ZoneInfo("Asia/Kolkata")
+
+# SQL expression for item change versions (sortable UTC text)
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Same layout as the tables in the shipped billing_app.db
+TABLES = [
+    """CREATE TABLE IF NOT EXISTS user_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT DEFAULT 'cashier'
+    )""",
+    """CREATE TABLE IF NOT EXISTS itemadd (
+        item_code INTEGER,
+        item_name TEXT,
+        qty INTEGER,
+        rate INTEGER,
+        gstin INTEGER,
+        discount INTEGER,
+        soh INTEGER,
+        cost INTEGER,
+        catagory TEXT,
+        sub_catagory TEXT,
+        brand TEXT,
+        expiry_date TEXT,
+        store_code INTEGER,
+        store_name TEXT,
+        vendor_name TEXT,
+        vendor_gst TEXT,
+        updated_at TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS vendor_details (
+        vendor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendor_name TEXT,
+        vendor_mobile INTEGER,
+        vendor_gst TEXT,
+        vendor_address TEXT,
+        bank_name TEXT,
+        bank_ac_no TEXT,
+        bank_ifsc TEXT,
+        bank_branch TEXT
+    )""",
+    "CREATE TABLE IF NOT EXISTS catagory (catagory TEXT)",
+    "CREATE TABLE IF NOT EXISTS sub_catagory (sub_catagory TEXT)",
+    "CREATE TABLE IF NOT EXISTS brand (brand TEXT)",
+    """CREATE TABLE IF NOT EXISTS billdata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        time TEXT,
+        bill_no TEXT,
+        amount REAL,
+        cust_name TEXT,
+        cust_mobile TEXT,
+        payment_mode TEXT,
+        cashier TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS saledetails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        time TEXT,
+        bill_no TEXT,
+        item_code INTEGER,
+        item_name TEXT,
+        qty INTEGER,
+        rate REAL,
+        gstin REAL,
+        gst_amount REAL,
+        discount REAL,
+        dis_amount REAL,
+        gross_amount REAL,
+        net_amount REAL,
+        soh INTEGER,
+        cost INTEGER,
+        catagory TEXT,
+        sub_catagory TEXT,
+        brand TEXT,
+        expiry_date TEXT,
+        store_code INTEGER,
+        store_name TEXT,
+        vendor_name TEXT,
+        vendor_gst TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS invoicedata (
+        key_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_code INTEGER,
+        store_name TEXT,
+        reg_no INTEGER,
+        cm_no INTEGER,
+        bill_no INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS sales_rollup_hourly (
+        store_code INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        payment_mode TEXT NOT NULL,
+        cashier TEXT NOT NULL,
+        bills INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (store_code, day, hour, payment_mode, cashier)
+    )""",
+    """CREATE TABLE IF NOT EXISTS sales_rollup_category (
+        store_code INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        catagory TEXT NOT NULL,
+        qty INTEGER NOT NULL DEFAULT 0,
+        lines INTEGER NOT NULL DEFAULT 0,
+        gross_amount REAL NOT NULL DEFAULT 0,
+        net_amount REAL NOT NULL DEFAULT 0,
+        cost REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (store_code, day, catagory)
+    )""",
+    """CREATE TABLE IF NOT EXISTS customers (
+        cust_mobile TEXT PRIMARY KEY,
+        cust_name TEXT,
+        visits INTEGER NOT NULL DEFAULT 0,
+        lifetime_spend REAL NOT NULL DEFAULT 0,
+        first_visit TEXT,
+        last_visit TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS goods_received (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendor_id INTEGER,
+        vendor_name TEXT,
+        vendor_gst TEXT,
+        vendor_invoice_no TEXT,
+        store_code INTEGER,
+        terminal_id TEXT,
+        received_at TEXT,
+        received_by TEXT,
+        lines INTEGER,
+        total_qty INTEGER,
+        total_cost REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS goods_received_lines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        grn_id INTEGER NOT NULL,
+        item_code INTEGER,
+        item_name TEXT,
+        qty INTEGER,
+        cost REAL,
+        amount REAL,
+        received_at TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS counters (
+        id TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        store_code INTEGER,
+        seeded_from INTEGER
+    )""",
+]
+
+# Columns added to tables that older databases were created without
+COLUMNS = [
+    ("itemadd", "updated_at", "TEXT"),
+    ("invoicedata", "terminal_id", "TEXT"),
+    ("billdata", "store_code", "INTEGER"),
+    ("billdata", "sold_at", "TEXT"),
+    ("saledetails", "sold_at", "TEXT"),
+]
+
+# (index DDL, unique?) - unique indexes are skipped when old data has duplicates
+INDEXES = [
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_itemadd_item_code ON itemadd (item_code)", True),
+    ("CREATE INDEX IF NOT EXISTS ix_itemadd_updated_at ON itemadd (updated_at)", False),
+    # Bill numbers are unique within a store's series; each store has its own counter
+    ("DROP INDEX IF EXISTS ux_billdata_bill_no", False),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_billdata_store_bill ON billdata (store_code, bill_no)", True),
+    ("CREATE INDEX IF NOT EXISTS ix_billdata_bill_no ON billdata (bill_no)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_billdata_date ON billdata (date)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_billdata_cust_mobile ON billdata (cust_mobile)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_billdata_cashier ON billdata (cashier)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_saledetails_bill_no ON saledetails (bill_no)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_saledetails_date ON saledetails (date)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_billdata_store_sold_at ON billdata (store_code, sold_at)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_saledetails_store_sold_at ON saledetails (store_code, sold_at)", False),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_invoicedata_store_bill ON invoicedata (store_code, bill_no)", True),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_catagory ON catagory (catagory)", True),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_sub_catagory ON sub_catagory (sub_catagory)", True),
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_brand ON brand (brand)", True),
+    ("CREATE INDEX IF NOT EXISTS ix_vendor_details_vendor_name ON vendor_details (vendor_name)", False),
+    # A vendor invoice can be received only once
+    ("CREATE UNIQUE INDEX IF NOT EXISTS ux_goods_received_vendor_invoice ON goods_received (vendor_name, vendor_invoice_no)", True),
+    ("CREATE INDEX IF NOT EXISTS ix_goods_received_received_at ON goods_received (received_at)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_goods_received_lines_grn_id ON goods_received_lines (grn_id)", False),
+    ("CREATE INDEX IF NOT EXISTS ix_goods_received_lines_item ON goods_received_lines (item_code, received_at)", False),
+]
+
+_local = threading.local()
+_connections_opened = 0
+_stats_lock = threading.Lock()
+_columns = {}
+
+def get_db():
+    """Get this thread's SQLite connection (WAL mode, autocommit)"""
+    global _connections_opened
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SQLITE_DB_PATH, timeout=30, isolation_level=None, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+        with _stats_lock:
+            _connections_opened += 1
+    return conn
+
+def close_connection():
+    """Close this thread's SQLite connection"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def _transaction(conn):
+    """Run statements in one write transaction"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _table_columns(conn, table):
+    if table not in _columns:
+        _columns[table] = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+    return _columns[table]
+
+def _db_value(value):
+    """Store datetimes as UTC ISO-8601 text, which sorts in time order"""
+    if isinstance(value, dt.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(dt.timezone.utc)
+        return value.isoformat()
+    return value
+
+def _insert(conn, table, doc):
+    """Insert the fields of a document that the table has columns for"""
+    cols = [col for col in doc if col in _table_columns(conn, table)]
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})"
+    return conn.execute(sql, [_db_value(doc[col]) for col in cols]).lastrowid
+
+def _insert_many(conn, table, docs):
+    cols = [col for col in docs[0] if col in _table_columns(conn, table)]
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})"
+    conn.executemany(sql, [[_db_value(doc.get(col)) for col in cols] for doc in docs])
+
+def _rows(cursor):
+    return [dict(row) for row in cursor]
+
+def _one(cursor):
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+def get_pool_stats():
+    """Get connection statistics for the SQLite backend"""
+    return {
+        "backend": "sqlite",
+        "path": SQLITE_DB_PATH,
+        "connections_opened": _connections_opened,
+        "journal_mode": get_db().execute("PRAGMA journal_mode").fetchone()[0],
+    }
+
+# Bump when _create_schema gains tables, columns or indexes, or a migration is added
+SCHEMA_VERSION = 5
+
+_schema_checked = False
+_schema_lock = threading.Lock()
+
+def get_schema_version():
+    """Get the schema version recorded in the database (PRAGMA user_version)"""
+    return get_db().execute("PRAGMA user_version").fetchone()[0]
+
+def init_database(force=False):
+    """Bring tables, indexes and sample data up to SCHEMA_VERSION.
+
+    Checked once per process: when the database already records the
+    current version this is a single PRAGMA read. `force` re-applies the schema.
+    """
+    global _schema_checked
+    if _schema_checked and not force:
+        return
+    with _schema_lock:
+        if _schema_checked and not force:
+            return
+        conn = get_db()
+        applied = get_schema_version()
+        if force or applied < SCHEMA_VERSION:
+            _create_schema(conn)
+            _run_migrations(applied)
+            conn.execute(f"PRAGMA user_version = {max(applied, SCHEMA_VERSION)}")
+            print("SQLite initialized successfully!")
+        _schema_checked = True
+
+def _run_migrations(applied):
+    """Run the data migrations newer than the applied schema version"""
+    if applied < 2:
+        backfill_sold_at()
+        _backfill_store_code(get_db())
+        # Reports read only the rollups, so build them from the existing history
+        rebuild_rollups()
+    if applied < 4:
+        rebuild_customers()
+
+def _backfill_store_code(conn):
+    """Give invoices and bills saved before stores had their own series this store's code"""
+    with _transaction(conn):
+        for table in ("invoicedata", "billdata"):
+            conn.execute(f"UPDATE {table} SET store_code = ? WHERE store_code IS NULL", (STORE_CODE,))
+
+def _create_schema(conn):
+    """Create tables, columns, indexes and sample data; safe to re-run"""
+    for ddl in TABLES:
+        conn.execute(ddl)
+    for table, column, column_type in COLUMNS:
+        if column not in {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    _columns.clear()
+    for ddl, unique in INDEXES:
+        try:
+            conn.execute(ddl)
+        except sqlite3.IntegrityError:
+            if not unique:
+                raise
+
+    # Add default users if none exist
+    if conn.execute("SELECT COUNT(*) FROM user_data").fetchone()[0] == 0:
+        with _transaction(conn):
+            for username, password, role in [
+                ("admin", "admin123", "admin"),
+                ("cashier", "cashier123", "cashier"),
+                ("manager", "manager123", "manager"),
+            ]:
+                insert_user(username, hashlib.sha256(password.encode()).hexdigest(), role)
+
+    # Add sample items if none exist
+    if conn.execute("SELECT COUNT(*) FROM itemadd").fetchone()[0] == 0:
+        sample = {
+            "qty": 1, "gstin": 5, "discount": 0, "catagory": "Bakery",
+            "sub_catagory": "Bread", "brand": "Raja", "expiry_date": "20-6-2026",
+            "store_code": 7001, "store_name": "Alam Megastore Relling",
+            "vendor_name": "Jupiter Enterprise", "vendor_gst": "CDFX65567FCC575Z"
+        }
+        insert_item(dict(sample, item_code=1001, item_name="White Bread", rate=150, soh=50, cost=140))
+        insert_item(dict(sample, item_code=1002, item_name="Brown Bread", rate=100, soh=100, cost=90))
+
+# User operations
+def verify_login(username, password):
+    """Verify user credentials"""
+    conn = get_db()
+    return _one(conn.execute(
+        "SELECT * FROM user_data WHERE username = ? AND password = ?", (username, password)
+    ))
+
+def get_all_users():
+    """Get all users"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT id, username, role FROM user_data"))
+
+def insert_user(username, password, role):
+    """Insert new user"""
+    conn = get_db()
+    try:
+        return _insert(conn, "user_data", {"username": username, "password": password, "role": role})
+    except sqlite3.IntegrityError:
+        raise Exception("Username already exists!")
+
+def update_user(username, password, role):
+    """Update user"""
+    conn = get_db()
+    return conn.execute(
+        "UPDATE user_data SET password = ?, role = ? WHERE username = ?", (password, role, username)
+    ).rowcount
+
+def delete_user(username):
+    """Delete user"""
+    conn = get_db()
+    return conn.execute("DELETE FROM user_data WHERE username = ?", (username,)).rowcount
+
+# Item catalog cache
+_catalog = CatalogCache()
+_catalog_load_lock = threading.Lock()
+
+def _ensure_catalog(conn):
+    """Load the catalog on first use and pull items changed since the last refresh"""
+    if not _catalog.loaded:
+        with _catalog_load_lock:
+            if not _catalog.loaded:
+                items = _rows(conn.execute("SELECT * FROM itemadd LIMIT ?", (_catalog.max_items + 1,)))
+                _catalog.load(items, total=len(items))
+    elif _catalog.refresh_due():
+        if _catalog.version is not None:
+            cursor = conn.execute(
+                "SELECT * FROM itemadd WHERE updated_at >= strftime('%Y-%m-%d %H:%M:%f', ?, '-2 seconds')",
+                (_catalog.version,)
+            )
+        else:
+            cursor = conn.execute("SELECT * FROM itemadd WHERE updated_at IS NOT NULL")
+        _catalog.apply(_rows(cursor))
+
+def get_catalog_stats():
+    """Get item catalog cache statistics"""
+    stats = _catalog.stats()
+    stats["change_stream"] = False
+    return stats
+
+def invalidate_catalog():
+    """Drop the cached catalog so the next lookup reloads it"""
+    _catalog.clear()
+
+# Item operations
+def search_item(search_term):
+    """Search for item by code or name"""
+    conn = get_db()
+    _ensure_catalog(conn)
+    try:
+        item_code = int(search_term)
+        item = _catalog.get(item_code)
+        if item is None and not _catalog.complete:
+            item = _one(conn.execute("SELECT * FROM itemadd WHERE item_code = ?", (item_code,)))
+            if item:
+                _catalog.put(dict(item))
+        if item:
+            return item
+    except ValueError:
+        pass
+
+    item = _catalog.find_by_name(search_term)
+    if item is None and not _catalog.complete:
+        item = _one(conn.execute(
+            "SELECT * FROM itemadd WHERE item_name LIKE ? LIMIT 1", (f"%{search_term}%",)
+        ))
+    return item
+
+def search_items(search_term):
+    """Search function for streamlit-searchbox - returns item names"""
+    if not search_term:
+        return []
+
+    conn = get_db()
+    _ensure_catalog(conn)
+    items = _catalog.search(search_term, 20)
+    if not items and not _catalog.complete:
+        items = _rows(conn.execute(
+            "SELECT item_name FROM itemadd WHERE item_name LIKE ? LIMIT 20", (f"%{search_term}%",)
+        ))
+    return [item['item_name'] for item in items]
+
+def get_items_by_codes(item_codes):
+    """Get several items by code in one lookup, keyed by item code (unknown codes are left out)"""
+    conn = get_db()
+    _ensure_catalog(conn)
+    items = {}
+    missing = []
+    for item_code in dict.fromkeys(item_codes):
+        item = _catalog.get(item_code)
+        if item is None:
+            missing.append(item_code)
+        else:
+            items[item_code] = item
+    if missing and not _catalog.complete:
+        for item in _rows(conn.execute(
+            f"SELECT * FROM itemadd WHERE item_code IN ({', '.join('?' for _ in missing)})", missing
+        )):
+            _catalog.put(dict(item))
+            items[item["item_code"]] = item
+    return items
+
+def get_all_items():
+    """Get all items from database"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM itemadd"))
+
+def insert_item(item_data):
+    """Insert new item"""
+    conn = get_db()
+    item_data.pop('updated_at', None)
+    cols = [col for col in item_data if col in _table_columns(conn, "itemadd")]
+    try:
+        conn.execute(
+            f"INSERT INTO itemadd ({', '.join(cols)}, updated_at) VALUES ({', '.join('?' for _ in cols)}, {NOW})",
+            [item_data[col] for col in cols]
+        )
+    except sqlite3.IntegrityError:
+        raise Exception("Item code already exists!")
+    item = _one(conn.execute("SELECT * FROM itemadd WHERE item_code = ?", (item_data.get('item_code'),)))
+    if item:
+        _catalog.put(item)
+    return item_data.get('item_code')
+
+def upsert_items(items, defaults=None):
+    """Insert or update items by item_code in one transaction.
+
+    Each item sets only its own fields; `defaults` fill the missing ones on
+    insert. Returns the inserted/updated counts and per-item write errors.
+    """
+    report = {"inserted": 0, "updated": 0, "errors": []}
+    if not items:
+        return report
+    conn = get_db()
+    columns = _table_columns(conn, "itemadd")
+    # Rows with blank cells carry fewer fields, so group them by field set for executemany
+    groups = {}
+    for item in items:
+        groups.setdefault(tuple(key for key in item if key in columns and key != 'updated_at'), []).append(item)
+    codes = list({item["item_code"] for item in items})
+    try:
+        with _transaction(conn):
+            existing = {row[0] for row in conn.execute(
+                f"SELECT item_code FROM itemadd WHERE item_code IN ({', '.join('?' for _ in codes)})", codes
+            )}
+            for keys, group in groups.items():
+                extra = [key for key in (defaults or {}) if key not in keys and key in columns]
+                cols = list(keys) + extra
+                updates = [f"{key} = excluded.{key}" for key in keys if key != 'item_code'] + ["updated_at = excluded.updated_at"]
+                conn.executemany(
+                    f"INSERT INTO itemadd ({', '.join(cols)}, updated_at) VALUES ({', '.join('?' for _ in cols)}, {NOW}) "
+                    f"ON CONFLICT(item_code) DO UPDATE SET {', '.join(updates)}",
+                    [[_db_value(item[key]) for key in keys] + [defaults[key] for key in extra] for item in group]
+                )
+    except sqlite3.OperationalError as e:
+        if "ON CONFLICT" in str(e):
+            raise Exception("Item codes in itemadd are not unique, remove the duplicates first!")
+        raise
+    report["updated"] = len(existing)
+    report["inserted"] = len(codes) - len(existing)
+    _catalog.clear()
+    return report
+
+def update_item_soh(item_code, new_soh):
+    """Update stock on hand"""
+    return update_item(item_code, {"soh": new_soh})
+
+def adjust_item_soh(item_code, delta):
+    """Add delta to stock on hand in place, safe alongside concurrent sales"""
+    conn = get_db()
+    cursor = conn.execute(
+        f"UPDATE itemadd SET soh = soh + ?, updated_at = {NOW} WHERE item_code = ?", (delta, item_code)
+    )
+    if cursor.rowcount:
+        _catalog.put(_one(conn.execute("SELECT * FROM itemadd WHERE item_code = ?", (item_code,))))
+    return cursor.rowcount
+
+def update_item(item_code, update_data):
+    """Update item details"""
+    conn = get_db()
+    cols = [col for col in update_data if col in _table_columns(conn, "itemadd") and col != 'updated_at']
+    assignments = ''.join(f"{col} = ?, " for col in cols)
+    count = conn.execute(
+        f"UPDATE itemadd SET {assignments}updated_at = {NOW} WHERE item_code = ?",
+        [update_data[col] for col in cols] + [item_code]
+    ).rowcount
+    if count:
+        _catalog.put(_one(conn.execute("SELECT * FROM itemadd WHERE item_code = ?", (item_code,))))
+    return count
+
+# Bill operations
+def save_bill(bill_data, sale_details):
+    """Save bill and sale details"""
+    conn = get_db()
+    with _transaction(conn):
+        bill_id = _insert(conn, "billdata", bill_data)
+        if sale_details:
+            _insert_many(conn, "saledetails", sale_details)
+    return bill_id
+
+def _qty_by_code(sale_details):
+    qty_by_code = {}
+    for line in sale_details:
+        qty_by_code[line['item_code']] = qty_by_code.get(line['item_code'], 0) + line['qty']
+    return qty_by_code
+
+def checkout(bill_data, sale_details, invoice_data=None):
+    """Save invoice, bill, sale details and stock decrements in one transaction"""
+    conn = get_db()
+    with _transaction(conn):
+        if invoice_data:
+            _insert(conn, "invoicedata", _normalize_invoice(invoice_data))
+        bill_id = _insert(conn, "billdata", bill_data)
+        if sale_details:
+            _insert_many(conn, "saledetails", sale_details)
+            conn.executemany(
+                f"UPDATE itemadd SET soh = soh - ?, updated_at = {NOW} WHERE item_code = ?",
+                [(qty, item_code) for item_code, qty in _qty_by_code(sale_details).items()]
+            )
+            _write_category_rollups(conn, bill_data, sale_details)
+        _write_hourly_rollup(conn, bill_data)
+        _write_customer(conn, bill_data)
+    for line in sale_details or []:
+        _catalog.adjust_soh(line['item_code'], -line['qty'])
+    _customers.discard(_customer_key(bill_data.get('cust_mobile')))
+    return bill_id
+
+def search_bill(bill_no):
+    """Search for bill by bill number"""
+    conn = get_db()
+    return _one(conn.execute("SELECT * FROM billdata WHERE bill_no = ?", (str(bill_no),)))
+
+def search_bills(bill_nos):
+    """Get several bills in one query, keyed by bill number (missing ones left out)"""
+    conn = get_db()
+    bill_nos = list(dict.fromkeys(str(bill_no) for bill_no in bill_nos))
+    if not bill_nos:
+        return {}
+    return {bill["bill_no"]: bill for bill in _rows(conn.execute(
+        f"SELECT * FROM billdata WHERE bill_no IN ({', '.join('?' for _ in bill_nos)})", bill_nos
+    ))}
+
+def get_bill_items(bill_no):
+    """Get items for a specific bill"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM saledetails WHERE bill_no = ?", (str(bill_no),)))
+
+def get_bill_items_many(bill_nos):
+    """Get the items of several bills in one query, keyed by bill number"""
+    conn = get_db()
+    items = {str(bill_no): [] for bill_no in bill_nos}
+    if items:
+        for item in _rows(conn.execute(
+            f"SELECT * FROM saledetails WHERE bill_no IN ({', '.join('?' for _ in items)}) ORDER BY bill_no, id",
+            list(items)
+        )):
+            items.setdefault(item["bill_no"], []).append(item)
+    return items
+
+def get_all_bills():
+    """Get all bills"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM billdata ORDER BY id DESC LIMIT 50"))
+
+def get_all_sale_details():
+    """Get all sale details"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM saledetails"))
+
+def get_day_sales(date):
+    """Get sales for a specific date"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM saledetails WHERE date = ?", (date,)))
+
+# Sale timestamps: range queries on the (store_code, sold_at) indexes
+def _sold_at_bounds(start, end):
+    """Turn dates or datetimes into a half-open [start, end) range of sold_at text.
+
+    A date means that whole day in India, so an end date is inclusive.
+    """
+    def bound(value, end_of_day):
+        if isinstance(value, dt.datetime):
+            return _db_value(value if value.tzinfo else value.replace(tzinfo=INDIA_TZ))
+        value = _as_date(value)
+        if end_of_day:
+            value += dt.timedelta(days=1)
+        return _db_value(dt.datetime.combine(value, dt.time(), tzinfo=INDIA_TZ))
+    clauses, params = ["store_code = ?"], []
+    if start is not None:
+        clauses.append("sold_at >= ?")
+        params.append(bound(start, False))
+    if end is not None:
+        clauses.append("sold_at < ?")
+        params.append(bound(end, True))
+    return clauses, params
+
+def _between(table, start, end, store_code, projection):
+    conn = get_db()
+    clauses, params = _sold_at_bounds(start, end)
+    fields = "*"
+    if projection is not None:
+        columns = _table_columns(conn, table)
+        fields = ", ".join(field for field in projection if field in columns)
+    rows = _rows(conn.execute(
+        f"SELECT {fields} FROM {table} WHERE {' AND '.join(clauses)} ORDER BY sold_at",
+        [store_code] + params
+    ))
+    for row in rows:
+        if row.get('sold_at'):
+            row['sold_at'] = dt.datetime.fromisoformat(row['sold_at']).astimezone(INDIA_TZ)
+    return rows
+
+def get_bills_between(start=None, end=None, store_code=STORE_CODE, projection=None):
+    """Get a store's bills sold in a date/datetime range, oldest first"""
+    return _between("billdata", start, end, store_code, projection)
+
+def get_sale_details_between(start=None, end=None, store_code=STORE_CODE, projection=None):
+    """Get a store's sale lines sold in a date/datetime range, oldest first"""
+    return _between("saledetails", start, end, store_code, projection)
+
+def backfill_sold_at(batch_size=1000):
+    """Set sold_at (and a missing store_code) on bills and lines saved before they were recorded.
+
+    Works through each table a batch of ids at a time. Rows whose date
+    cannot be parsed keep sold_at NULL. Returns the rows updated per table.
+    """
+    conn = get_db()
+    updated = {}
+    for table in ("billdata", "saledetails"):
+        count = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, date, time FROM {table} WHERE sold_at IS NULL AND id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                try:
+                    sold_at = dt.datetime.strptime(
+                        f"{row['date']} {row['time'] or '00:00:00'}", '%d/%m/%Y %H:%M:%S'
+                    ).replace(tzinfo=INDIA_TZ)
+                except (TypeError, ValueError):
+                    continue
+                updates.append((_db_value(sold_at), STORE_CODE, row['id']))
+            with _transaction(conn):
+                conn.executemany(
+                    f"UPDATE {table} SET sold_at = ?, store_code = COALESCE(store_code, ?) WHERE id = ?",
+                    updates
+                )
+            count += len(updates)
+            last_id = rows[-1]['id']
+        updated[table] = count
+    return updated
+
+def _page(conn, table, filters=None, after=None, page_size=50, projection=None):
+    """Get one page of a table, newest first, by keyset on id.
+
+    Pass the returned `next` cursor as `after` to get the following page;
+    it is None on the last page.
+    """
+    columns = _table_columns(conn, table)
+    clauses, params = [], []
+    for field, value in (filters or {}).items():
+        if field not in columns:
+            raise ValueError(f"Unknown {table} column '{field}'")
+        clauses.append(f"{field} = ?")
+        params.append(value)
+    if after is not None:
+        clauses.append("id < ?")
+        params.append(after)
+    fields = "*"
+    if projection is not None:
+        fields = ", ".join(["id"] + [field for field in projection if field in columns and field != "id"])
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    rows = _rows(conn.execute(
+        f"SELECT {fields} FROM {table}{where} ORDER BY id DESC LIMIT ?", params + [page_size + 1]
+    ))
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    return {"rows": rows, "next": rows[-1]["id"] if more else None}
+
+def get_bills_page(filters=None, after=None, page_size=50, projection=None):
+    """Get a page of bills, newest first"""
+    conn = get_db()
+    return _page(conn, "billdata", filters, after, page_size, projection)
+
+def get_sale_details_page(filters=None, after=None, page_size=50, projection=None):
+    """Get a page of sale detail lines, newest first"""
+    conn = get_db()
+    return _page(conn, "saledetails", filters, after, page_size, projection)
+
+# Sales rollups: small pre-aggregated rows maintained at checkout.
+# Rollup key columns are NOT NULL so missing values are stored as '' / -1.
+DAY_SQL = "substr({0}, 7, 4) || '-' || substr({0}, 4, 2) || '-' || substr({0}, 1, 2)"
+HOUR_SQL = "COALESCE(CAST(substr({0}, 1, 2) AS INTEGER), -1)"
+
+def _day_key(date):
+    """Convert a bill date ('%d/%m/%Y') to a sortable 'YYYY-MM-DD' key"""
+    try:
+        return dt.datetime.strptime(date, '%d/%m/%Y').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return date or ''
+
+def _hour_key(time_str):
+    try:
+        return int(str(time_str).split(':')[0])
+    except ValueError:
+        return -1
+
+def _write_hourly_rollup(conn, bill_data):
+    conn.execute(
+        """INSERT INTO sales_rollup_hourly (store_code, day, hour, payment_mode, cashier, bills, amount)
+        VALUES (?, ?, ?, ?, ?, 1, ?)
+        ON CONFLICT (store_code, day, hour, payment_mode, cashier)
+        DO UPDATE SET bills = bills + 1, amount = amount + excluded.amount""",
+        (
+            bill_data.get('store_code', STORE_CODE), _day_key(bill_data.get('date')),
+            _hour_key(bill_data.get('time')), bill_data.get('payment_mode') or '',
+            bill_data.get('cashier') or '', bill_data.get('amount') or 0
+        )
+    )
+
+def _write_category_rollups(conn, bill_data, sale_details):
+    store_code = bill_data.get('store_code', STORE_CODE)
+    day = _day_key(bill_data.get('date'))
+    conn.executemany(
+        """INSERT INTO sales_rollup_category (store_code, day, catagory, qty, lines, gross_amount, net_amount, cost)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+        ON CONFLICT (store_code, day, catagory)
+        DO UPDATE SET qty = qty + excluded.qty, lines = lines + 1,
+            gross_amount = gross_amount + excluded.gross_amount,
+            net_amount = net_amount + excluded.net_amount, cost = cost + excluded.cost""",
+        [
+            (store_code, day, line.get('catagory') or '', line.get('qty') or 0,
+             line.get('gross_amount') or 0, line.get('net_amount') or 0, line.get('cost') or 0)
+            for line in sale_details
+        ]
+    )
+
+def _rollup_where(store_code=None, start_day=None, end_day=None):
+    clauses, params = [], []
+    if store_code is not None:
+        clauses.append("store_code = ?")
+        params.append(store_code)
+    if start_day:
+        clauses.append("day >= ?")
+        params.append(start_day)
+    if end_day:
+        clauses.append("day <= ?")
+        params.append(end_day)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def get_sales_summary(store_code=None, start_day=None, end_day=None):
+    """Get bill count, revenue and splits by payment mode, cashier and hour from the rollups.
+
+    Days are 'YYYY-MM-DD' strings and both ends of the range are inclusive.
+    """
+    conn = get_db()
+    where, params = _rollup_where(store_code, start_day, end_day)
+
+    def split(column):
+        return {
+            (None if row[0] in ('', -1) else row[0]): row[1]
+            for row in conn.execute(
+                f"SELECT {column}, SUM(amount) FROM sales_rollup_hourly{where} GROUP BY {column} ORDER BY {column}",
+                params
+            )
+        }
+
+    bills, amount = conn.execute(
+        f"SELECT COALESCE(SUM(bills), 0), COALESCE(SUM(amount), 0) FROM sales_rollup_hourly{where}", params
+    ).fetchone()
+    return {
+        "bills": bills,
+        "amount": amount,
+        "avg_bill": amount / bills if bills else 0,
+        "by_payment_mode": split("payment_mode"),
+        "by_cashier": split("cashier"),
+        "by_hour": split("hour"),
+    }
+
+def get_category_sales(store_code=None, start_day=None, end_day=None):
+    """Get quantity and amounts sold per category from the rollups"""
+    conn = get_db()
+    where, params = _rollup_where(store_code, start_day, end_day)
+    return _rows(conn.execute(
+        f"""SELECT catagory, SUM(qty) AS qty, SUM(lines) AS lines, SUM(gross_amount) AS gross_amount,
+            SUM(net_amount) AS net_amount, SUM(cost) AS cost
+        FROM sales_rollup_category{where} GROUP BY catagory ORDER BY gross_amount DESC""",
+        params
+    ))
+
+def rebuild_rollups():
+    """Regenerate both rollup tables from billdata and saledetails.
+
+    Returns the number of rollup rows written per table.
+    """
+    conn = get_db()
+    with _transaction(conn):
+        conn.execute("DELETE FROM sales_rollup_hourly")
+        conn.execute(
+            f"""INSERT INTO sales_rollup_hourly (store_code, day, hour, payment_mode, cashier, bills, amount)
+            SELECT COALESCE(store_code, ?), {DAY_SQL.format('date')}, {HOUR_SQL.format('time')},
+                COALESCE(payment_mode, ''), COALESCE(cashier, ''), COUNT(*), COALESCE(SUM(amount), 0)
+            FROM billdata GROUP BY 1, 2, 3, 4, 5""",
+            (STORE_CODE,)
+        )
+        conn.execute("DELETE FROM sales_rollup_category")
+        conn.execute(
+            f"""INSERT INTO sales_rollup_category (store_code, day, catagory, qty, lines, gross_amount, net_amount, cost)
+            SELECT COALESCE(store_code, ?), {DAY_SQL.format('date')}, COALESCE(catagory, ''),
+                COALESCE(SUM(qty), 0), COUNT(*), COALESCE(SUM(gross_amount), 0),
+                COALESCE(SUM(net_amount), 0), COALESCE(SUM(cost), 0)
+            FROM saledetails GROUP BY 1, 2, 3""",
+            (STORE_CODE,)
+        )
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("sales_rollup_hourly", "sales_rollup_category")
+    }
+
+# Reports: metrics aggregated in SQL over the full bill history
+def _as_date(value):
+    if value is None or isinstance(value, dt.date):
+        return value
+    return dt.date.fromisoformat(str(value))
+
+def _bill_where(start_date=None, end_date=None, store_code=None, cashier=None, payment_mode=None):
+    """Build the WHERE clause for report filters; dates are date objects or 'YYYY-MM-DD'"""
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    clauses, params = [], []
+    if start_date and end_date:
+        # Bill dates are '%d/%m/%Y' strings, so a range becomes an indexed IN list
+        dates = [
+            (start_date + dt.timedelta(days=i)).strftime('%d/%m/%Y')
+            for i in range((end_date - start_date).days + 1)
+        ]
+        clauses.append(f"date IN ({', '.join('?' for _ in dates)})")
+        params.extend(dates)
+    else:
+        if start_date:
+            clauses.append(f"{DAY_SQL.format('date')} >= ?")
+            params.append(start_date.isoformat())
+        if end_date:
+            clauses.append(f"{DAY_SQL.format('date')} <= ?")
+            params.append(end_date.isoformat())
+    if store_code is not None:
+        if store_code == STORE_CODE:
+            # Bills saved before store_code was recorded belong to this till's store
+            clauses.append("(store_code = ? OR store_code IS NULL)")
+        else:
+            clauses.append("store_code = ?")
+        params.append(store_code)
+    if cashier:
+        clauses.append("cashier = ?")
+        params.append(cashier)
+    if payment_mode:
+        clauses.append("payment_mode = ?")
+        params.append(payment_mode)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def get_sales_report(start_date=None, end_date=None, store_code=None, cashier=None, payment_mode=None):
+    """Get bill count, revenue, average bill and splits by payment mode and cashier.
+
+    Every argument is an optional filter; only the aggregated numbers are read.
+    """
+    conn = get_db()
+    where, params = _bill_where(start_date, end_date, store_code, cashier, payment_mode)
+
+    def split(column):
+        return {
+            row[0]: row[1] for row in conn.execute(
+                f"SELECT {column}, COALESCE(SUM(amount), 0) FROM billdata{where} GROUP BY {column}", params
+            )
+        }
+
+    bills, amount = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM billdata{where}", params
+    ).fetchone()
+    return {
+        "bills": bills,
+        "amount": amount,
+        "avg_bill": amount / bills if bills else 0,
+        "by_payment_mode": split("payment_mode"),
+        "by_cashier": split("cashier"),
+    }
+
+def get_daily_sales_report(start_date=None, end_date=None, store_code=None, cashier=None, payment_mode=None):
+    """Get bill count and revenue per day, oldest day first"""
+    conn = get_db()
+    where, params = _bill_where(start_date, end_date, store_code, cashier, payment_mode)
+    return _rows(conn.execute(
+        f"""SELECT date, COUNT(*) AS bills, COALESCE(SUM(amount), 0) AS amount
+        FROM billdata{where} GROUP BY date ORDER BY {DAY_SQL.format('date')}""",
+        params
+    ))
+
+def get_cashiers():
+    """Get the names of every cashier that has billed"""
+    conn = get_db()
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT cashier FROM billdata WHERE cashier IS NOT NULL AND cashier != '' ORDER BY cashier"
+    )]
+
+# Invoice operations
+def get_max_invoice_no(store_code=None):
+    """Get the invoice number after the highest one, in one store's series when given"""
+    conn = get_db()
+    if store_code is None:
+        bill_no = conn.execute("SELECT MAX(CAST(bill_no AS INTEGER)) FROM invoicedata").fetchone()[0]
+    else:
+        # bill_no is stored as an integer, so MAX is one seek on ux_invoicedata_store_bill
+        bill_no = conn.execute("SELECT MAX(bill_no) FROM invoicedata WHERE store_code = ?", (store_code,)).fetchone()[0]
+    return (bill_no or 0) + 1
+
+def _normalize_invoice(invoice_data):
+    """Ensure bill_no is stored as integer and the invoice carries its store"""
+    if 'bill_no' in invoice_data and isinstance(invoice_data['bill_no'], str):
+        try:
+            invoice_data['bill_no'] = int(invoice_data['bill_no'])
+        except (ValueError, TypeError):
+            pass
+    invoice_data.setdefault('store_code', STORE_CODE)
+    return invoice_data
+
+def insert_invoice(invoice_data):
+    """Insert invoice record"""
+    conn = get_db()
+    return _insert(conn, "invoicedata", _normalize_invoice(invoice_data))
+
+def reserve_invoice_numbers(count=1, store_code=STORE_CODE):
+    """Atomically reserve `count` consecutive invoice numbers, returns (first, last)"""
+    conn = get_db()
+    counter_id = f"invoice:{store_code}"
+    with _transaction(conn):
+        row = conn.execute("UPDATE counters SET seq = seq + ? WHERE id = ? RETURNING seq", (count, counter_id)).fetchone()
+        if row:
+            last = row[0]
+        else:
+            # First reservation: continue after the store's existing invoices
+            start = get_max_invoice_no(store_code) - 1
+            last = start + count
+            conn.execute(
+                "INSERT INTO counters (id, seq, store_code, seeded_from) VALUES (?, ?, ?, ?)",
+                (counter_id, last, store_code, start)
+            )
+    return last - count + 1, last
+
+def next_invoice_no(store_code=STORE_CODE):
+    """Get the next invoice number for the store (a local write, so no blocks are leased)"""
+    return reserve_invoice_numbers(1, store_code)[0]
+
+def release_invoice_blocks():
+    """Nothing to release: the SQLite backend hands out numbers one at a time"""
+
+def get_invoice_gaps(store_code=STORE_CODE):
+    """Get invoice numbers that were issued but never billed"""
+    conn = get_db()
+    counter = _one(conn.execute("SELECT * FROM counters WHERE id = ?", (f"invoice:{store_code}",)))
+    if not counter:
+        return []
+    billed = {row[0] for row in conn.execute(
+        "SELECT bill_no FROM invoicedata WHERE store_code = ? AND bill_no > ?",
+        (store_code, counter['seeded_from'])
+    )}
+    return [
+        {"store_code": store_code, "bill_no": bill_no}
+        for bill_no in range(counter['seeded_from'] + 1, counter['seq'] + 1)
+        if bill_no not in billed
+    ]
+
+# Category, sub-category and brand operations
+def _search_names(table, search_term):
+    if not search_term:
+        return []
+    conn = get_db()
+    return [row[0] for row in conn.execute(
+        f"SELECT {table} FROM {table} WHERE {table} LIKE ? LIMIT 20", (f"%{search_term}%",)
+    )]
+
+def _insert_name(table, name, label):
+    conn = get_db()
+    try:
+        return _insert(conn, table, {table: name})
+    except sqlite3.IntegrityError:
+        raise Exception(f"{label} already exists!")
+
+def search_catagory(search_term):
+    """Search categories"""
+    return _search_names("catagory", search_term)
+
+def insert_catagory(catagory_name):
+    """Insert new category"""
+    return _insert_name("catagory", catagory_name, "Category")
+
+def search_subcatagory(search_term):
+    """Search sub-categories"""
+    return _search_names("sub_catagory", search_term)
+
+def insert_subcatagory(subcatagory_name):
+    """Insert new sub-category"""
+    return _insert_name("sub_catagory", subcatagory_name, "Sub-category")
+
+def search_brand(search_term):
+    """Search brands"""
+    return _search_names("brand", search_term)
+
+def insert_brand(brand_name):
+    """Insert new brand"""
+    return _insert_name("brand", brand_name, "Brand")
+
+# Vendor operations
+def search_vendor(search_term):
+    """Search vendors"""
+    if not search_term:
+        return []
+    conn = get_db()
+    return [row[0] for row in conn.execute(
+        "SELECT vendor_name FROM vendor_details WHERE vendor_name LIKE ? LIMIT 20", (f"%{search_term}%",)
+    )]
+
+def get_vendor_gst(vendor_name):
+    """Get vendor GST"""
+    conn = get_db()
+    row = conn.execute(
+        "SELECT vendor_gst FROM vendor_details WHERE vendor_name LIKE ? LIMIT 1", (f"%{vendor_name}%",)
+    ).fetchone()
+    return (row[0] or '') if row else ''
+
+def get_item_references():
+    """Get the category, sub-category and brand names and each vendor's GST number"""
+    conn = get_db()
+    return {
+        "catagory": [row[0] for row in conn.execute("SELECT catagory FROM catagory")],
+        "sub_catagory": [row[0] for row in conn.execute("SELECT sub_catagory FROM sub_catagory")],
+        "brand": [row[0] for row in conn.execute("SELECT brand FROM brand")],
+        "vendors": {
+            row[0]: row[1] or ""
+            for row in conn.execute("SELECT vendor_name, vendor_gst FROM vendor_details WHERE vendor_name IS NOT NULL")
+        },
+    }
+
+def insert_vendor(vendor_data):
+    """Insert new vendor"""
+    conn = get_db()
+    vendor_id = str(vendor_data.get('vendor_id') or '').strip()
+    vendor_data['vendor_id'] = int(vendor_id) if vendor_id.isdigit() else None
+    try:
+        return _insert(conn, "vendor_details", vendor_data)
+    except sqlite3.IntegrityError:
+        raise Exception("Vendor ID already exists!")
+
+# Goods received operations
+def _receipt_lines(lines):
+    """Merge repeated item codes: quantities add up and the last cost given wins"""
+    merged = {}
+    for line in lines:
+        item_code = int(line['item_code'])
+        entry = merged.setdefault(item_code, {"item_code": item_code, "qty": 0, "cost": None})
+        entry["qty"] += int(line['qty'])
+        if line.get('cost') is not None:
+            entry["cost"] = line['cost']
+    return list(merged.values())
+
+def receive_goods(vendor_name, vendor_invoice_no, lines, received_by, received_at=None):
+    """Post a vendor delivery (goods received note) as one batch.
+
+    `lines` are {item_code, qty, cost} dicts; a line without a cost keeps
+    the item's current cost. The header, lines, stock increments and cost
+    updates are written in one transaction. Returns the receipt id.
+    """
+    lines = _receipt_lines(lines)
+    if not lines:
+        raise Exception("Goods receipt has no lines!")
+    if any(line['qty'] <= 0 for line in lines):
+        raise Exception("Received quantities must be positive!")
+    vendor_invoice_no = str(vendor_invoice_no or '').strip()
+    if not vendor_invoice_no:
+        raise Exception("Vendor invoice number is required!")
+    conn = get_db()
+    vendor = _one(conn.execute("SELECT * FROM vendor_details WHERE vendor_name = ?", (vendor_name,)))
+    if vendor is None:
+        raise Exception("Vendor not found!")
+    codes = [line['item_code'] for line in lines]
+    items = {
+        item['item_code']: item
+        for item in _rows(conn.execute(
+            f"SELECT item_code, item_name, cost FROM itemadd WHERE item_code IN ({', '.join('?' for _ in codes)})", codes
+        ))
+    }
+    unknown = [str(item_code) for item_code in codes if item_code not in items]
+    if unknown:
+        raise Exception(f"Unknown item codes: {', '.join(unknown)}")
+    received_at = received_at or dt.datetime.now(INDIA_TZ)
+    for line in lines:
+        item = items[line['item_code']]
+        line['item_name'] = item.get('item_name')
+        if line['cost'] is None:
+            line['cost'] = item.get('cost') or 0
+        line['amount'] = line['qty'] * line['cost']
+        line['received_at'] = received_at
+    receipt = {
+        "vendor_id": vendor.get('vendor_id'),
+        "vendor_name": vendor['vendor_name'],
+        "vendor_gst": vendor.get('vendor_gst') or '',
+        "vendor_invoice_no": vendor_invoice_no,
+        "store_code": STORE_CODE,
+        "terminal_id": TERMINAL_ID,
+        "received_at": received_at,
+        "received_by": received_by,
+        "lines": len(lines),
+        "total_qty": sum(line['qty'] for line in lines),
+        "total_cost": sum(line['amount'] for line in lines)
+    }
+    with _transaction(conn):
+        try:
+            grn_id = _insert(conn, "goods_received", receipt)
+        except sqlite3.IntegrityError:
+            raise Exception("Goods receipt for this vendor invoice already exists!")
+        _insert_many(conn, "goods_received_lines", [dict(line, grn_id=grn_id) for line in lines])
+        conn.executemany(
+            f"UPDATE itemadd SET soh = soh + ?, cost = ?, updated_at = {NOW} WHERE item_code = ?",
+            [(line['qty'], line['cost'], line['item_code']) for line in lines]
+        )
+    for item in _rows(conn.execute(
+        f"SELECT * FROM itemadd WHERE item_code IN ({', '.join('?' for _ in codes)})", codes
+    )):
+        _catalog.put(item)
+    return grn_id
+
+def get_goods_receipts(vendor_name=None, limit=50):
+    """Get the latest goods receipts, optionally for one vendor"""
+    conn = get_db()
+    if vendor_name:
+        return _rows(conn.execute(
+            "SELECT * FROM goods_received WHERE vendor_name = ? ORDER BY received_at DESC LIMIT ?", (vendor_name, limit)
+        ))
+    return _rows(conn.execute("SELECT * FROM goods_received ORDER BY received_at DESC LIMIT ?", (limit,)))
+
+def get_goods_receipt_lines(grn_id):
+    """Get the lines of a goods receipt"""
+    conn = get_db()
+    return _rows(conn.execute("SELECT * FROM goods_received_lines WHERE grn_id = ? ORDER BY id", (grn_id,)))
+
+# Customer operations
+_customers = CustomerCache()
+
+def _customer_key(mobile):
+    return str(mobile or '').strip()
+
+def _write_customer(conn, bill_data):
+    """Count a bill towards its customer's visits and lifetime spend"""
+    mobile = _customer_key(bill_data.get('cust_mobile'))
+    if not mobile:
+        return
+    visit = _db_value(bill_data.get('sold_at') or dt.datetime.now(dt.timezone.utc))
+    conn.execute(
+        """INSERT INTO customers (cust_mobile, cust_name, visits, lifetime_spend, first_visit, last_visit)
+        VALUES (?, ?, 1, ?, ?, ?)
+        ON CONFLICT (cust_mobile) DO UPDATE SET
+            cust_name = COALESCE(NULLIF(excluded.cust_name, ''), cust_name),
+            visits = visits + 1,
+            lifetime_spend = lifetime_spend + excluded.lifetime_spend,
+            first_visit = MIN(COALESCE(first_visit, excluded.first_visit), excluded.first_visit),
+            last_visit = MAX(COALESCE(last_visit, excluded.last_visit), excluded.last_visit)""",
+        (mobile, bill_data.get('cust_name'), bill_data.get('amount') or 0, visit, visit)
+    )
+
+def search_customer_by_mobile(mobile):
+    """Search customer by mobile"""
+    mobile = _customer_key(mobile)
+    if not mobile:
+        return None
+    customer = _customers.get(mobile)
+    if customer is None:
+        conn = get_db()
+        customer = _one(conn.execute("SELECT * FROM customers WHERE cust_mobile = ?", (mobile,)))
+        if customer is not None:
+            for field in ('first_visit', 'last_visit'):
+                if customer.get(field):
+                    customer[field] = dt.datetime.fromisoformat(customer[field]).astimezone(INDIA_TZ)
+            _customers.put(mobile, customer)
+    return customer
+
+def get_customer_cache_stats():
+    """Get customer lookup cache statistics"""
+    return _customers.stats()
+
+def rebuild_customers():
+    """Regenerate the customers table from bill history.
+
+    The name kept is the one on the customer's latest bill.
+    Returns the number of customers written.
+    """
+    conn = get_db()
+    with _transaction(conn):
+        conn.execute("DELETE FROM customers")
+        conn.execute(
+            """INSERT INTO customers (cust_mobile, cust_name, visits, lifetime_spend, first_visit, last_visit)
+            SELECT TRIM(cust_mobile),
+                (SELECT b.cust_name FROM billdata b WHERE b.cust_mobile = billdata.cust_mobile
+                 ORDER BY b.sold_at DESC, b.id DESC LIMIT 1),
+                COUNT(*), COALESCE(SUM(amount), 0), MIN(sold_at), MAX(sold_at)
+            FROM billdata WHERE TRIM(COALESCE(cust_mobile, '')) != ''
+            GROUP BY TRIM(cust_mobile)"""
+        )
+    _customers.clear()
+    return conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
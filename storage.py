@@ -0,0 +1,95 @@
+"""
+Storage backend selection for Billing App
+The app talks to whichever module STORAGE_BACKEND names; every backend
+module exposes the functions listed in BACKEND_FUNCTIONS
+"""
+
+import importlib
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+BACKENDS = {
+    "mongo": "mongo_db",
+    "sqlite": "sqlite_db",
+}
+
+# The repository interface shared by all backends
+BACKEND_FUNCTIONS = (
+    "init_database",
+    "get_schema_version",
+    "get_pool_stats",
+    "verify_login",
+    "get_all_users",
+    "insert_user",
+    "update_user",
+    "delete_user",
+    "get_catalog_stats",
+    "invalidate_catalog",
+    "search_item",
+    "search_items",
+    "get_items_by_codes",
+    "get_all_items",
+    "insert_item",
+    "update_item_soh",
+    "update_item",
+    "upsert_items",
+    "adjust_item_soh",
+    "save_bill",
+    "checkout",
+    "search_bill",
+    "search_bills",
+    "get_bill_items",
+    "get_bill_items_many",
+    "get_all_bills",
+    "get_all_sale_details",
+    "get_day_sales",
+    "get_bills_page",
+    "get_sale_details_page",
+    "get_bills_between",
+    "get_sale_details_between",
+    "backfill_sold_at",
+    "get_sales_summary",
+    "get_category_sales",
+    "rebuild_rollups",
+    "get_sales_report",
+    "get_daily_sales_report",
+    "get_cashiers",
+    "get_max_invoice_no",
+    "insert_invoice",
+    "reserve_invoice_numbers",
+    "next_invoice_no",
+    "release_invoice_blocks",
+    "get_invoice_gaps",
+    "search_catagory",
+    "insert_catagory",
+    "search_subcatagory",
+    "insert_subcatagory",
+    "search_brand",
+    "insert_brand",
+    "search_vendor",
+    "get_vendor_gst",
+    "get_item_references",
+    "insert_vendor",
+    "receive_goods",
+    "get_goods_receipts",
+    "get_goods_receipt_lines",
+    "search_customer_by_mobile",
+    "get_customer_cache_stats",
+    "rebuild_customers",
+)
+
+def get_backend(name=None):
+    """Import and return the configured storage backend module"""
+    name = name or STORAGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    backend = importlib.import_module(BACKENDS[name])
+    missing = [func for func in BACKEND_FUNCTIONS if not callable(getattr(backend, func, None))]
+    if missing:
+        raise ImportError(f"Storage backend '{name}' is missing: {', '.join(missing)}")
+    return backend
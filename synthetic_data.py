@@ -0,0 +1,303 @@
+"""
+Synthetic data generator for Billing App
+Fills a scratch MongoDB database or SQLite file with a reproducible catalog,
+bill history, sale lines, invoices and customers for load and scale testing.
+Items and days are generated and bulk inserted by parallel worker processes;
+each is seeded from --seed and its own index, so the data is the same
+whatever the number of workers.
+
+Usage:
+    python synthetic_data.py --items 100000 --bills 200000 --stores 7001 7002 7003
+    python synthetic_data.py --backend sqlite --items 1000000 --bills 1000000 --days 180 --drop
+"""
+
+import argparse
+import datetime as dt
+import functools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import storage
+
+# catagory -> sub catagories
+CATALOG = {
+    "Bakery": ["Bread", "Cake", "Rusk", "Bun"],
+    "Dairy": ["Milk", "Paneer", "Curd", "Butter", "Cheese"],
+    "Grocery": ["Rice", "Atta", "Dal", "Oil", "Sugar", "Salt", "Masala"],
+    "Personal Care": ["Soap", "Shampoo", "Toothpaste", "Cream"],
+    "Beverages": ["Tea", "Coffee", "Juice", "Soft Drink"],
+    "Snacks": ["Biscuit", "Chips", "Noodles", "Namkeen"],
+    "Household": ["Detergent", "Cleaner", "Dishwash"],
+}
+BRANDS = ["Raja", "Amul", "Tata", "Nestle", "Dabur", "Britannia", "Patanjali", "Haldiram", "ITC", "HUL"]
+SIZES = ["100g", "200g", "500g", "1kg", "5kg", "250ml", "500ml", "1L", "Pack of 4", "Family Pack"]
+VENDORS = [("Jupiter Enterprise", "CDFX65567FCC575Z"), ("Himalayan Traders", "19ABCDE1234F1Z5"),
+           ("Siliguri Distributors", "19PQRSX9876K1Z2")]
+FIRST_NAMES = ["Amit", "Priya", "Rahul", "Sneha", "Arjun", "Pooja", "Vikram", "Anjali", "Rohan", "Neha",
+               "Karan", "Divya", "Sanjay", "Ritu", "Abdul", "Fatima", "Tenzing", "Pema"]
+LAST_NAMES = ["Sharma", "Das", "Gurung", "Tamang", "Alam", "Roy", "Singh", "Rai", "Pradhan", "Sherpa"]
+
+# (value, weight)
+GST_SLABS = [(0, 15), (5, 35), (12, 20), (18, 25), (28, 5)]
+PAYMENT_MODES = [("CASH", 45), ("UPI", 40), ("CARD", 15)]
+LINE_QTY = [(1, 70), (2, 18), (3, 6), (4, 3), (5, 3)]
+# Store hours 8:00-22:00 with late-morning and evening peaks
+HOUR_WEIGHTS = [(8, 3), (9, 5), (10, 8), (11, 11), (12, 12), (13, 9), (14, 6), (15, 5),
+                (16, 6), (17, 9), (18, 12), (19, 13), (20, 10), (21, 5)]
+# Monday first; weekends are busier
+WEEKDAY_WEIGHTS = [1.0, 0.9, 0.9, 0.95, 1.1, 1.3, 1.4]
+CUSTOMER_SHARE = 0.55
+FIRST_ITEM_CODE = 100000
+
+_config = {}
+
+
+def weighted_choice(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def popular_index(rng, count):
+    """An index in range(count), 80% of the time from the first 20% (the regulars)"""
+    if rng.random() < 0.8:
+        return rng.randrange(max(1, count // 5))
+    return rng.randrange(count)
+
+
+# Generators
+def make_item(seed, i):
+    """The i-th catalog item; the same seed and index always give the same item"""
+    rng = random.Random(f"{seed}:item:{i}")
+    catagory = rng.choice(list(CATALOG))
+    sub_catagory = rng.choice(CATALOG[catagory])
+    brand = rng.choice(BRANDS)
+    vendor_name, vendor_gst = rng.choice(VENDORS)
+    rate = round(min(5000.0, max(5.0, rng.lognormvariate(4.4, 0.9))), 2)
+    return {
+        "item_code": FIRST_ITEM_CODE + i,
+        "item_name": f"{brand} {sub_catagory} {rng.choice(SIZES)} {i}",
+        "qty": 1,
+        "rate": rate,
+        "gstin": weighted_choice(rng, GST_SLABS),
+        "discount": rng.choice([5, 10]) if rng.random() < 0.15 else 0,
+        "soh": rng.randint(0, 500),
+        "cost": round(rate * rng.uniform(0.7, 0.9), 2),
+        "catagory": catagory,
+        "sub_catagory": sub_catagory,
+        "brand": brand,
+        "expiry_date": f"{rng.randint(1, 28)}-{rng.randint(1, 12)}-{rng.randint(2026, 2028)}",
+        "store_code": 7001,
+        "store_name": "Alam Megastore Relling",
+        "vendor_name": vendor_name,
+        "vendor_gst": vendor_gst,
+    }
+
+
+def make_customer(seed, i):
+    """(mobile, name) of the i-th customer"""
+    rng = random.Random(f"{seed}:customer:{i}")
+    return f"98{i:08d}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def make_bill(bill_no, store_code, sold_at, cart, cashier, payment_mode, customer=None, terminal_id=None):
+    """Build (bill, sale lines, invoice) from [(item, qty)] the way billing_page does"""
+    date, time_str = sold_at.strftime('%d/%m/%Y'), sold_at.strftime('%H:%M:%S')
+    lines = []
+    for item, qty in cart:
+        total_rate = item["rate"] * qty
+        dis_amount = total_rate * item["discount"] / 100
+        amount = total_rate - dis_amount
+        gst_amount = amount * item["gstin"] / 100
+        lines.append({
+            "date": date, "time": time_str, "bill_no": str(bill_no), "item_code": item["item_code"],
+            "item_name": item["item_name"], "qty": qty, "rate": item["rate"], "gstin": item["gstin"],
+            "gst_amount": round(gst_amount, 2), "discount": item["discount"], "dis_amount": round(dis_amount, 2),
+            "gross_amount": round(amount, 2), "net_amount": round(amount - gst_amount, 2), "soh": 0,
+            "cost": round(item["cost"] * qty, 2), "catagory": item["catagory"],
+            "sub_catagory": item["sub_catagory"], "brand": item["brand"], "expiry_date": item["expiry_date"],
+            "store_code": store_code, "store_name": item["store_name"], "vendor_name": item["vendor_name"],
+            "vendor_gst": item["vendor_gst"], "sold_at": sold_at,
+        })
+    cust_mobile, cust_name = customer or ("", "")
+    bill = {
+        "date": date, "time": time_str, "bill_no": str(bill_no),
+        "amount": round(sum(line["gross_amount"] for line in lines), 2),
+        "cust_name": cust_name, "cust_mobile": cust_mobile, "payment_mode": payment_mode,
+        "cashier": cashier, "store_code": store_code, "sold_at": sold_at,
+    }
+    invoice = {"bill_no": bill_no, "store_code": store_code, "terminal_id": terminal_id or f"till-{store_code}"}
+    return bill, lines, invoice
+
+
+def plan_days(seed, bills, start, days):
+    """Split the bill count over the days by weekday; returns [(day, first_bill_index, count)]"""
+    rng = random.Random(f"{seed}:days")
+    weights = [
+        WEEKDAY_WEIGHTS[(start + dt.timedelta(days=d)).weekday()] * rng.uniform(0.85, 1.15)
+        for d in range(days)
+    ]
+    total = sum(weights)
+    counts = [int(bills * w / total) for w in weights]
+    # Hand the rounding remainder to the busiest days so the total is exact
+    for d in sorted(range(days), key=lambda d: -weights[d])[:bills - sum(counts)]:
+        counts[d] += 1
+    plan, first = [], 0
+    for d, count in enumerate(counts):
+        plan.append((start + dt.timedelta(days=d), first, count))
+        first += count
+    return plan
+
+
+# Workers
+def _init_worker(config):
+    _config.update(config)
+    db_ops = storage.get_backend(config["backend"])
+    if config["backend"] == "sqlite":
+        db_ops.SQLITE_DB_PATH = config["database"]
+    else:
+        db_ops.DB_NAME = config["database"]
+    _config["db_ops"] = db_ops
+    _config["item"] = functools.lru_cache(maxsize=100000)(functools.partial(make_item, config["seed"]))
+
+
+def _write(table, docs):
+    db_ops = _config["db_ops"]
+    for i in range(0, len(docs), _config["batch_size"]):
+        batch = docs[i:i + _config["batch_size"]]
+        if _config["backend"] == "sqlite":
+            conn = db_ops.get_db()
+            with db_ops._transaction(conn):
+                db_ops._insert_many(conn, table, batch)
+        else:
+            db_ops.get_db()[table].insert_many(batch, ordered=False)
+
+
+def _insert_items(bounds):
+    start, stop = bounds
+    _write("itemadd", [make_item(_config["seed"], i) for i in range(start, stop)])
+    return stop - start
+
+
+def _insert_day(task):
+    """Generate and insert one day's bills, lines and invoices across all stores"""
+    day, first, count = task
+    seed, stores, item = _config["seed"], _config["stores"], _config["item"]
+    rng = random.Random(f"{seed}:day:{day.isoformat()}")
+    hours = rng.choices([h for h, _ in HOUR_WEIGHTS], [w for _, w in HOUR_WEIGHTS], k=count)
+    times = sorted(dt.timedelta(hours=h, seconds=rng.randrange(3600)) for h in hours)
+    midnight = dt.datetime.combine(day, dt.time(), tzinfo=_config["db_ops"].INDIA_TZ)
+    bills, lines, invoices = [], [], []
+    for j, offset in enumerate(times):
+        # Bills go round-robin to the stores, so each store's series is dense
+        index = first + j
+        store_code = stores[index % len(stores)]
+        bill_no = store_code * 10_000_000 + index // len(stores) + 1
+        basket = min(60, 1 + int(rng.expovariate(1 / 3.5)))
+        cart = [(item(popular_index(rng, _config["items"])), weighted_choice(rng, LINE_QTY)) for _ in range(basket)]
+        customer = None
+        if _config["customers"] and rng.random() < CUSTOMER_SHARE:
+            customer = make_customer(seed, popular_index(rng, _config["customers"]))
+        bill, bill_lines, invoice = make_bill(
+            bill_no, store_code, midnight + offset, cart,
+            cashier=f"cashier{store_code}_{1 + (offset.seconds >= 15 * 3600) * 2 + rng.randrange(2)}",
+            payment_mode=weighted_choice(rng, PAYMENT_MODES), customer=customer
+        )
+        bills.append(bill)
+        lines.extend(bill_lines)
+        invoices.append(invoice)
+    _write("invoicedata", invoices)
+    _write("billdata", bills)
+    _write("saledetails", lines)
+    return count, len(lines)
+
+
+# Driver
+def generate(backend, database, seed=1, items=10000, bills=50000, days=90, start=None, stores=(7001,),
+             customers=None, workers=None, batch_size=5000, drop=False, progress=print):
+    """Fill `database` (a MongoDB database name or SQLite path) with synthetic data.
+
+    Returns counts of the items, bills and sale lines written.
+    """
+    db_ops = storage.get_backend(backend)
+    if backend == "sqlite":
+        db_ops.SQLITE_DB_PATH = database
+        if drop:
+            db_ops.close_connection()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(database + suffix):
+                    os.remove(database + suffix)
+    else:
+        db_ops.DB_NAME = database
+        if drop:
+            db_ops.get_client().drop_database(database)
+    db_ops.init_database(force=True)
+    if backend == "sqlite":
+        db_ops.close_connection()
+
+    start = start or dt.date(2026, 1, 1)
+    customers = bills // 4 if customers is None else customers
+    config = {
+        "backend": backend, "database": database, "seed": seed, "items": items,
+        "stores": list(stores), "customers": customers, "batch_size": batch_size,
+    }
+    started = time.perf_counter()
+    # spawn, not fork: workers must not share the parent's MongoClient
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers or os.cpu_count() or 1, initializer=_init_worker, initargs=(config,)) as pool:
+        done = 0
+        chunks = [(i, min(i + batch_size, items)) for i in range(0, items, batch_size)]
+        for count in pool.imap_unordered(_insert_items, chunks):
+            done += count
+            progress(f"items {done}/{items}")
+        bill_count = line_count = 0
+        for count, lines in pool.imap_unordered(_insert_day, plan_days(seed, bills, start, days)):
+            bill_count += count
+            line_count += lines
+            progress(f"bills {bill_count}/{bills}, {line_count} sale lines")
+
+    progress("rebuilding customers and rollups")
+    customer_count = db_ops.rebuild_customers()
+    db_ops.rebuild_rollups()
+    elapsed = time.perf_counter() - started
+    progress(f"done in {elapsed:.1f}s ({(items + bill_count + line_count) / elapsed:,.0f} rows/s)")
+    return {"items": items, "bills": bill_count, "sale_lines": line_count, "customers": customer_count}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic Billing App data")
+    parser.add_argument("--backend", choices=sorted(storage.BACKENDS), default=storage.STORAGE_BACKEND)
+    parser.add_argument("--database", help="MongoDB database name or SQLite file "
+                        "(default: <MONGO_DB_NAME>_synthetic or billing_app_synthetic.db)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--bills", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--start", type=dt.date.fromisoformat, default=dt.date(2026, 1, 1), help="first day (YYYY-MM-DD)")
+    parser.add_argument("--stores", type=int, nargs="+", default=[7001])
+    parser.add_argument("--customers", type=int, help="size of the customer pool (default: bills / 4)")
+    parser.add_argument("--workers", type=int, help="insert processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="empty the target database first")
+    args = parser.parse_args(argv)
+
+    database = args.database
+    if database is None:
+        if args.backend == "sqlite":
+            database = "billing_app_synthetic.db"
+        else:
+            database = f"{storage.get_backend(args.backend).DB_NAME}_synthetic"
+    print(f"Generating into {args.backend}:{database} (seed {args.seed})")
+    counts = generate(
+        args.backend, database, seed=args.seed, items=args.items, bills=args.bills, days=args.days,
+        start=args.start, stores=args.stores, customers=args.customers, workers=args.workers,
+        batch_size=args.batch_size, drop=args.drop
+    )
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
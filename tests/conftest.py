@@ -0,0 +1,131 @@
+"""
+Shared fixtures: each test gets a fresh SQLite database, a fresh mongomock
+client or a fresh offline queue journal, with the modules' caches reset
+"""
+
+import os
+import sys
+
+import pytest
+from pymongo.errors import OperationFailure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongo_db
+import offline_queue
+import sqlite_db
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    """sqlite_db on an empty database file with the sample users and items"""
+    sqlite_db.close_connection()
+    monkeypatch.setattr(sqlite_db, "SQLITE_DB_PATH", str(tmp_path / "billing_app.db"))
+    monkeypatch.setattr(sqlite_db, "_schema_checked", False)
+    sqlite_db._columns.clear()
+    sqlite_db._catalog.clear()
+    sqlite_db._customers.clear()
+    sqlite_db.init_database()
+    yield sqlite_db
+    sqlite_db.close_connection()
+    sqlite_db._catalog.clear()
+    sqlite_db._customers.clear()
+
+
+class Session:
+    """A client session whose with_transaction runs the callback, or fails with `error`.
+
+    It is falsy, so mongomock accepts it as a `session=` argument.
+    """
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def with_transaction(self, callback):
+        if self.error:
+            raise self.error
+        return callback(self)
+
+
+# What a standalone mongod answers to the first write of a transaction
+NO_TRANSACTIONS = OperationFailure("Transaction numbers are only allowed on a replica set member or mongos", 20)
+
+
+def mongomock_client(session_error=NO_TRANSACTIONS):
+    """A mongomock client that behaves like a standalone mongod (or a replica set with session_error=None)"""
+    mongomock = pytest.importorskip("mongomock")
+
+    class Client(mongomock.MongoClient):
+        def start_session(self, *args, **kwargs):
+            return Session(session_error)
+
+    return Client(tz_aware=True, tzinfo=mongo_db.INDIA_TZ)
+
+
+@pytest.fixture
+def mongo_backend(monkeypatch):
+    """mongo_db on a fresh mongomock client that, like a standalone mongod, has no transactions"""
+    monkeypatch.setattr(mongo_db, "_client", mongomock_client())
+    monkeypatch.setattr(mongo_db, "_schema_checked", False)
+    mongo_db._catalog.clear()
+    mongo_db._customers.clear()
+    mongo_db._invoice_allocators.clear()
+    mongo_db._seeded_counters.clear()
+    mongo_db.mark_reachable()
+    mongo_db.init_database()
+    yield mongo_db
+    mongo_db._catalog.clear()
+    mongo_db._customers.clear()
+    mongo_db._invoice_allocators.clear()
+    mongo_db._seeded_counters.clear()
+    mongo_db.mark_reachable()
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def backend(request):
+    """Each storage backend in turn"""
+    return request.getfixturevalue(f"{request.param}_backend")
+
+
+@pytest.fixture
+def queue(mongo_backend, tmp_path, monkeypatch):
+    """offline_queue on an empty journal, writing to the mongomock backend"""
+    monkeypatch.setattr(offline_queue, "OFFLINE_QUEUE_PATH", str(tmp_path / "till_queue.db"))
+    monkeypatch.setattr(offline_queue, "_schema_ready", False)
+    monkeypatch.setattr(offline_queue._local, "conn", None, raising=False)
+    yield offline_queue
+    conn = getattr(offline_queue._local, "conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def make_checkout(bill_no, lines, store_code=7001, date="15/10/2026", time="10:30:00",
+                  payment_mode="Cash", cashier="cashier", cust_mobile=None):
+    """Build (bill_data, sale_details, invoice_data) the way the billing page does.
+
+    `lines` are (item_code, qty, rate, catagory) tuples.
+    """
+    sale_details = [
+        {
+            "bill_no": str(bill_no), "store_code": store_code, "date": date, "time": time,
+            "item_code": item_code, "qty": qty, "rate": rate, "catagory": catagory,
+            "gross_amount": qty * rate, "net_amount": qty * rate, "cost": qty * rate * 0.9,
+        }
+        for item_code, qty, rate, catagory in lines
+    ]
+    bill_data = {
+        "bill_no": str(bill_no), "store_code": store_code, "date": date, "time": time,
+        "amount": sum(line["gross_amount"] for line in sale_details),
+        "payment_mode": payment_mode, "cashier": cashier, "cust_mobile": cust_mobile,
+    }
+    invoice_data = {"bill_no": int(bill_no), "store_code": store_code, "date": date}
+    return bill_data, sale_details, invoice_data
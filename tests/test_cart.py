@@ -0,0 +1,79 @@
+import pytest
+
+from cart import Cart, parse_scans
+
+BREAD = {"item_code": 1001, "item_name": "White Bread", "rate": 150, "gstin": 5, "discount": 0, "cost": 140}
+MILK = {"item_code": 2001, "item_name": "Milk", "rate": 40, "gstin": 0, "discount": 10, "cost": 35}
+
+
+def test_parse_scans_reads_quantities_and_bad_tokens():
+    assert parse_scans("1001 3*2001\n1001 x 0*1001 2*") == ([(1001, 1), (2001, 3), (1001, 1)], ["x", "0*1001", "2*"])
+
+
+def test_repeated_scan_adds_to_the_existing_line():
+    cart = Cart()
+    cart.add(BREAD)
+    cart.add(MILK, 2)
+    cart.add(BREAD, 2)
+
+    assert len(cart) == 2
+    assert [line.item_code for line in cart] == [1001, 2001]
+    assert cart[1001].qty == 3
+    assert cart.total_qty == 5
+    assert cart.total_amount == pytest.approx(3 * 150 + 2 * 40 * 0.9)
+    assert cart.total_discount == pytest.approx(8)
+
+
+def test_totals_follow_qty_changes_and_removals():
+    cart = Cart()
+    cart.add(BREAD, 2)
+    cart.add(MILK, 5)
+
+    cart.set_qty(2001, 1)
+    assert cart.total_qty == 3
+    assert cart.total_amount == pytest.approx(300 + 36)
+
+    cart.set_qty(1001, 0)
+    assert 1001 not in cart
+    assert cart.total_amount == pytest.approx(36)
+
+    cart.remove(2001)
+    assert not cart
+    assert (cart.total_qty, cart.total_amount, cart.total_discount) == (0, 0, 0)
+
+
+def test_line_prices_take_gst_out_of_the_discounted_amount():
+    line = Cart().add(dict(BREAD, discount=10), 2)
+
+    assert line.dis_amount == pytest.approx(30)
+    assert line.gross_amount == pytest.approx(270)
+    assert line.gst_amount == pytest.approx(13.5)
+    assert line.amount == pytest.approx(256.5)
+    assert line.cost == 280
+
+
+def test_add_scans_resolves_all_codes_in_one_lookup():
+    calls = []
+
+    def lookup(codes):
+        calls.append(codes)
+        return {item["item_code"]: item for item in (BREAD, MILK) if item["item_code"] in codes}
+
+    cart = Cart()
+    unknown = cart.add_scans("1001 2*2001 9999 1001 9999 abc", lookup)
+
+    assert len(calls) == 1
+    assert unknown == ["abc", "9999"]
+    assert cart[1001].qty == 2
+    assert cart[2001].qty == 2
+
+
+def test_table_is_rebuilt_only_after_a_change():
+    cart = Cart()
+    cart.add(BREAD)
+    table = cart.table()
+    assert cart.table() is table
+
+    cart.add(BREAD)
+    assert cart.table() is not table
+    assert cart.table()["qty"] == [2]
@@ -0,0 +1,124 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from conftest import make_checkout, mongomock_client
+
+
+def soh(db, item_code):
+    return db.search_item(str(item_code))["soh"]
+
+
+def record_sessions(db, monkeypatch):
+    """Record the session each checkout write runs in (None without a transaction)"""
+    sessions = []
+    write_checkout = db._write_checkout
+
+    def recording(database, bill_data, sale_details, invoice_data, session=None):
+        sessions.append(session)
+        return write_checkout(database, bill_data, sale_details, invoice_data, session)
+
+    monkeypatch.setattr(db, "_write_checkout", recording)
+    return sessions
+
+
+def test_checkout_saves_bill_lines_and_decrements_stock(backend):
+    before = {code: soh(backend, code) for code in (1001, 1002)}
+    bill, lines, invoice = make_checkout(5, [(1001, 2, 150, "Bakery"), (1002, 1, 100, "Bakery"), (1001, 1, 150, "Bakery")])
+
+    backend.checkout(bill, lines, invoice)
+
+    assert backend.search_bill(5)["amount"] == 550
+    assert len(backend.get_bill_items(5)) == 3
+    assert soh(backend, 1001) == before[1001] - 3
+    assert soh(backend, 1002) == before[1002] - 1
+    assert backend.get_max_invoice_no(7001) == 6
+
+
+def test_checkout_stock_is_read_from_the_database(backend):
+    # The catalog cache is adjusted in place; a fresh read must agree with it
+    before = soh(backend, 1001)
+    backend.checkout(*make_checkout(5, [(1001, 4, 150, "Bakery")]))
+    backend.invalidate_catalog()
+    assert soh(backend, 1001) == before - 4
+
+
+def test_checkout_rejects_a_used_bill_number(backend):
+    backend.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")]))
+    before = soh(backend, 1001)
+
+    with pytest.raises(Exception):
+        backend.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")], time="11:00:00"))
+
+    assert soh(backend, 1001) == before
+
+
+def test_checkout_upserts_the_customer(backend):
+    backend.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")], cust_mobile="9800000001"))
+    backend.checkout(*make_checkout(6, [(1002, 2, 100, "Bakery")], cust_mobile="9800000001"))
+
+    customer = backend.search_customer_by_mobile("9800000001")
+    assert customer["visits"] == 2
+    assert customer["lifetime_spend"] == 350
+
+
+def test_mongo_checkout_retry_completes_a_partial_write(mongo_backend, monkeypatch):
+    # A standalone mongod has no transactions: a checkout cut off after the
+    # bill and lines were written must be finished by the retry, not skipped
+    bill, lines, invoice = make_checkout(5, [(1001, 2, 150, "Bakery")])
+    before = soh(mongo_backend, 1001)
+    stock_decrements = mongo_backend._stock_decrements
+
+    def dropped(*args):
+        raise ConnectionError("connection dropped")
+
+    monkeypatch.setattr(mongo_backend, "_stock_decrements", dropped)
+    with pytest.raises(ConnectionError):
+        mongo_backend.checkout(bill, lines, invoice)
+    billdata = mongo_backend.get_db().billdata
+    assert billdata.find_one({"bill_no": "5"})["complete"] is False
+
+    monkeypatch.setattr(mongo_backend, "_stock_decrements", stock_decrements)
+    mongo_backend.checkout(bill, lines, invoice)
+
+    assert billdata.find_one({"bill_no": "5"})["complete"] is True
+    assert mongo_backend.get_db().saledetails.count_documents({"bill_no": "5"}) == 1
+    mongo_backend.invalidate_catalog()
+    assert soh(mongo_backend, 1001) == before - 2
+    assert mongo_backend.get_sales_summary(7001)["bills"] == 1
+
+
+def test_mongo_checkout_runs_in_a_transaction_on_a_replica_set(mongo_backend, monkeypatch):
+    monkeypatch.setattr(mongo_backend, "_client", mongomock_client(session_error=None))
+    mongo_backend.init_database(force=True)
+    sessions = record_sessions(mongo_backend, monkeypatch)
+
+    mongo_backend.checkout(*make_checkout(5, [(1001, 2, 150, "Bakery")], cust_mobile="9800000001"))
+
+    assert len(sessions) == 1 and sessions[0] is not None
+    assert soh(mongo_backend, 1001) == 48
+    # In a transaction the $inc updates need no replay markers
+    db = mongo_backend.get_db()
+    assert db.itemadd.find_one({"item_code": 1001}).get("pending_checkouts") is None
+    assert db.customers.find_one({"cust_mobile": "9800000001"}).get("pending_checkouts") is None
+    assert mongo_backend.search_bill(5)["complete"] is True
+
+
+def test_mongo_checkout_falls_back_without_transactions_on_a_standalone_server(mongo_backend, monkeypatch):
+    sessions = record_sessions(mongo_backend, monkeypatch)
+
+    mongo_backend.checkout(*make_checkout(5, [(1001, 2, 150, "Bakery")]))
+
+    assert sessions == [None]
+    assert soh(mongo_backend, 1001) == 48
+    assert mongo_backend.search_bill(5)["complete"] is True
+
+
+def test_mongo_checkout_raises_other_transaction_errors(mongo_backend, monkeypatch):
+    error = OperationFailure("Transaction was aborted", 251)
+    monkeypatch.setattr(mongo_backend, "_client", mongomock_client(session_error=error))
+    mongo_backend.init_database(force=True)
+
+    with pytest.raises(OperationFailure, match="aborted"):
+        mongo_backend.checkout(*make_checkout(5, [(1001, 2, 150, "Bakery")]))
+
+    assert mongo_backend.search_bill(5) is None
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+import item_import
+
+
+@pytest.fixture
+def vendor(backend):
+    backend.insert_vendor({"vendor_id": "77", "vendor_name": "Acme Traders", "vendor_gst": "GST77"})
+    return "Acme Traders"
+
+
+def test_receipt_raises_stock_and_sets_costs(backend, vendor):
+    bread, brown = backend.search_item("1001"), backend.search_item("1002")
+    lines = [
+        {"item_code": 1001, "qty": 10, "cost": 120},
+        {"item_code": 1002, "qty": 5, "cost": None},
+        {"item_code": 1001, "qty": 2, "cost": 125},
+    ]
+
+    grn_id = backend.receive_goods(vendor, "INV-1", lines, "admin")
+
+    assert backend.search_item("1001")["soh"] == bread["soh"] + 12
+    assert backend.search_item("1001")["cost"] == 125
+    assert backend.search_item("1002")["soh"] == brown["soh"] + 5
+    assert backend.search_item("1002")["cost"] == brown["cost"]
+    receipt = backend.get_goods_receipts(vendor)[0]
+    # The form's vendor id is text; SQLite keeps it in an INTEGER column
+    assert (str(receipt["vendor_id"]), receipt["vendor_gst"], receipt["vendor_invoice_no"]) == ("77", "GST77", "INV-1")
+    assert (receipt["lines"], receipt["total_qty"], receipt["total_cost"]) == (2, 17, 12 * 125 + 5 * brown["cost"])
+    assert sorted((line["item_code"], line["qty"]) for line in backend.get_goods_receipt_lines(grn_id)) == [(1001, 12), (1002, 5)]
+
+
+@pytest.mark.parametrize("vendor_name, invoice_no, lines, message", [
+    ("Nobody", "INV-2", [{"item_code": 1001, "qty": 1}], "Vendor not found!"),
+    ("Acme Traders", "INV-2", [{"item_code": 999999, "qty": 1}], "Unknown item codes: 999999"),
+    ("Acme Traders", "", [{"item_code": 1001, "qty": 1}], "Vendor invoice number is required!"),
+    ("Acme Traders", "INV-2", [], "Goods receipt has no lines!"),
+    ("Acme Traders", "INV-2", [{"item_code": 1001, "qty": 0}], "Received quantities must be positive!"),
+])
+def test_bad_receipts_are_rejected(backend, vendor, vendor_name, invoice_no, lines, message):
+    soh = backend.search_item("1001")["soh"]
+
+    with pytest.raises(Exception, match=message):
+        backend.receive_goods(vendor_name, invoice_no, lines, "admin")
+
+    assert backend.search_item("1001")["soh"] == soh
+    assert backend.get_goods_receipts() == []
+
+
+def test_vendor_invoice_is_received_once(backend, vendor):
+    backend.receive_goods(vendor, "INV-1", [{"item_code": 1001, "qty": 1}], "admin")
+    soh = backend.search_item("1001")["soh"]
+
+    with pytest.raises(Exception, match="already exists"):
+        backend.receive_goods(vendor, "INV-1", [{"item_code": 1001, "qty": 1}], "admin")
+
+    assert backend.search_item("1001")["soh"] == soh
+
+
+def test_receipt_lines_are_read_from_a_sheet():
+    sheet = "Item Code,Quantity,Cost\n1001,10,120\n1002,5,\nx,1,\n1001,0,1\n"
+
+    lines, errors = item_import.read_receipt_lines(io.StringIO(sheet), filename="delivery.csv")
+
+    assert lines == [{"item_code": 1001, "qty": 10, "cost": 120}, {"item_code": 1002, "qty": 5, "cost": None}]
+    assert [(error["row"], error["error"]) for error in errors] == [
+        (4, "item_code is not a positive whole number"),
+        (5, "qty is not a positive whole number"),
+    ]
@@ -0,0 +1,115 @@
+import os
+import threading
+import types
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import index_advisor
+import mongo_db
+
+
+def snapshot(db):
+    return {name: sorted(map(repr, db[name].find())) for name in db.list_collection_names()}
+
+
+def command(name, **fields):
+    return types.SimpleNamespace(command_name=name, command=dict({name: "itemadd"}, **fields))
+
+
+def test_capture_records_writes_separately_from_reads():
+    capture = index_advisor.CommandCapture()
+    capture.started(command("update", updates=[{"q": {}}]))
+    assert capture.writes == []
+
+    capture.function = "search_item"
+    capture.started(command("find", filter={"item_code": 1001}))
+    capture.started(command("aggregate", pipeline=[{"$match": {}}]))
+    assert capture.writes == []
+    capture.started(command("update", updates=[{"q": {"item_code": 1001}}]))
+    capture.started(command("aggregate", pipeline=[{"$match": {}}, {"$out": "copy"}]))
+
+    assert capture.writes == ["update itemadd", "aggregate itemadd"]
+    assert [name for _, name, _ in capture.commands] == ["find", "aggregate", "update", "aggregate"]
+
+
+def test_live_run_changes_nothing(mongo_backend):
+    mongo_backend.checkout(
+        {"bill_no": "5", "store_code": 7001, "date": "15/10/2026", "time": "10:30:00", "amount": 150,
+         "payment_mode": "Cash", "cashier": "cashier", "cust_mobile": "9800000001"},
+        [{"bill_no": "5", "item_code": 1001, "qty": 1, "rate": 150, "catagory": "Bakery"}],
+        {"bill_no": 5, "store_code": 7001}
+    )
+    db_name, before = mongo_backend.DB_NAME, snapshot(mongo_backend.get_db())
+
+    index_advisor.run(live=True)
+
+    assert snapshot(mongo_backend.get_db()) == before
+    assert mongo_backend.DB_NAME == db_name
+
+
+def test_scratch_database_is_only_used_by_the_calling_thread(mongo_backend):
+    seen = []
+    with mongo_backend.use_database("scratch") as db:
+        other = threading.Thread(target=lambda: seen.append(mongo_backend.get_db().name))
+        other.start()
+        other.join()
+        assert (db.name, mongo_backend.get_db().name) == ("scratch", "scratch")
+    assert seen == [mongo_backend.DB_NAME]
+    assert mongo_backend.get_db().name == mongo_backend.DB_NAME
+
+
+def test_create_indexes_builds_the_recommended_ones(mongo_backend):
+    findings = [
+        {"collection": "billdata", "command": "find", "filter": {"payment_mode": 1}, "sort": None,
+         "functions": {"get_sales_report"}, "collscan": True, "index": [("payment_mode", 1)]},
+        {"collection": "itemadd", "command": "find", "filter": {}, "sort": None,
+         "functions": {"get_all_items"}, "collscan": True, "index": None},
+    ]
+
+    assert index_advisor.create_indexes(mongo_backend.get_db(), findings) == ["billdata.payment_mode_1"]
+    assert "payment_mode_1" in mongo_backend.get_db().billdata.index_information()
+
+
+@pytest.fixture
+def mongod(monkeypatch):
+    """A real mongod at TEST_MONGO_URI (explain needs one), never the app's MONGO_URI"""
+    uri = os.getenv("TEST_MONGO_URI")
+    if not uri:
+        pytest.skip("TEST_MONGO_URI is not set")
+    try:
+        MongoClient(uri, serverSelectionTimeoutMS=1000).admin.command("ping")
+    except PyMongoError:
+        pytest.skip("no mongod at TEST_MONGO_URI")
+    mongo_db.close_connection()
+    monkeypatch.setattr(mongo_db, "MONGO_URI", uri)
+    monkeypatch.setattr(mongo_db, "DB_NAME", f"{mongo_db.DB_NAME}_test")
+    monkeypatch.setattr(mongo_db, "_schema_checked", False)
+    scratch = f"{mongo_db.DB_NAME}_index_advisor"
+    yield mongo_db
+    mongo_db.get_client().drop_database(scratch)
+    mongo_db.close_connection()
+
+
+def test_scratch_run_has_no_collection_scan_regressions(mongod):
+    findings = index_advisor.run()
+
+    assert findings
+    assert [finding for finding in findings if finding["error"]] == []
+    assert [finding for finding in findings if finding["collscan"] and not index_advisor.expected_scan(finding)] == []
+    assert {"receive_goods", "rebuild_rollups"} <= set().union(*(finding["functions"] for finding in findings))
+    assert f"{mongod.DB_NAME}_index_advisor" not in mongod.get_client().list_database_names()
+
+
+def test_live_run_only_reads(mongod, monkeypatch):
+    index_advisor.run(keep=True)
+    monkeypatch.setattr(mongod, "DB_NAME", f"{mongod.DB_NAME}_index_advisor")
+    before = snapshot(mongod.get_db())
+
+    findings = index_advisor.run(live=True)
+
+    assert snapshot(mongod.get_db()) == before
+    functions = set().union(*(finding["functions"] for finding in findings))
+    assert "search_bill" in functions
+    assert not functions & {name for name, _ in index_advisor.write_exercises(index_advisor.sample(mongod.get_db()))}
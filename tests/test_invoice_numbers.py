@@ -0,0 +1,51 @@
+from conftest import make_checkout
+
+
+def test_numbers_are_consecutive_and_unique(backend):
+    numbers = [backend.next_invoice_no(7001) for _ in range(25)]
+    assert numbers == list(range(numbers[0], numbers[0] + 25))
+
+
+def test_each_store_continues_its_own_series(backend):
+    backend.insert_invoice({"bill_no": 41, "store_code": 7001})
+    backend.insert_invoice({"bill_no": 900, "store_code": 7002})
+
+    assert backend.next_invoice_no(7001) == 42
+    assert backend.next_invoice_no(7002) == 901
+    assert backend.next_invoice_no(7003) == 1
+    assert backend.next_invoice_no(7001) == 43
+
+
+def test_stores_may_share_a_bill_number(backend):
+    backend.checkout(*make_checkout(1, [(1001, 1, 150, "Bakery")], store_code=7001))
+    backend.checkout(*make_checkout(1, [(1001, 1, 150, "Bakery")], store_code=7002))
+
+    assert backend.get_max_invoice_no(7001) == 2
+    assert backend.get_max_invoice_no(7002) == 2
+
+
+def test_unbilled_numbers_are_reported_as_gaps(backend):
+    first = backend.next_invoice_no(7001)
+    backend.next_invoice_no(7001)
+    backend.checkout(*make_checkout(first, [(1001, 1, 150, "Bakery")]))
+    backend.release_invoice_blocks()
+
+    gaps = [gap["bill_no"] for gap in backend.get_invoice_gaps(7001)]
+    assert first + 1 in gaps
+    assert first not in gaps
+
+
+def test_mongo_gaps_survive_a_crash(mongo_backend):
+    allocator = mongo_backend.InvoiceBlockAllocator(7001, "till-1", 5)
+    first, skipped, third = allocator.next(), allocator.next(), allocator.next()
+    for bill_no in (first, third):
+        mongo_backend.checkout(*make_checkout(bill_no, [(1001, 1, 150, "Bakery")]))
+
+    # The process dies without releasing: the skipped number is already a gap
+    assert [gap["bill_no"] for gap in mongo_backend.get_invoice_gaps(7001)] == [skipped]
+
+    # Its next run leases a new block, which releases the one left open
+    restarted = mongo_backend.InvoiceBlockAllocator(7001, "till-1", 5)
+    assert restarted.next() == first + 5
+    gaps = [gap["bill_no"] for gap in mongo_backend.get_invoice_gaps(7001)]
+    assert gaps == [skipped, first + 3, first + 4]
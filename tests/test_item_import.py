@@ -0,0 +1,94 @@
+import io
+
+import pandas as pd
+
+import item_import
+
+REFERENCES = {
+    "catagory": ["Bakery", "Dairy"],
+    "sub_catagory": ["Bread"],
+    "brand": ["Raja"],
+    "vendors": {"Jupiter Enterprise": "CDFX65567FCC575Z"},
+}
+
+
+def chunk(rows, columns=("item_code", "item_name", "rate")):
+    return pd.DataFrame([dict(zip(columns, row)) for row in rows], dtype=str)
+
+
+def errors_by_row(errors):
+    return {error["row"]: error["error"] for error in errors}
+
+
+def test_valid_rows_are_normalised():
+    items, errors = item_import.validate_chunk(chunk(
+        [("3001", "Rusk", "₹1,200", "12%", "bakery", "raja", "jupiter enterprise", "20-6-2026")],
+        ("item_code", "item_name", "rate", "gstin", "catagory", "brand", "vendor_name", "expiry_date"),
+    ), REFERENCES)
+
+    assert errors == []
+    assert items == [{
+        "item_code": 3001, "rate": 1200, "gstin": 12, "item_name": "Rusk", "catagory": "Bakery",
+        "brand": "Raja", "vendor_name": "Jupiter Enterprise", "vendor_gst": "CDFX65567FCC575Z",
+        "expiry_date": "2026-06-20",
+    }]
+
+
+def test_each_bad_cell_is_reported_with_its_row():
+    items, errors = item_import.validate_chunk(chunk([
+        ("3001", "Rusk", "20", "5"),
+        ("abc", "Bun", "10", "5"),
+        ("3003", "", "10", "5"),
+        ("3004", "Cake", "ten", "5"),
+        ("3005", "Tea", "10", "7"),
+        ("3006", "Jam", "-3", "5"),
+    ], ("item_code", "item_name", "rate", "gstin")), REFERENCES, first_row=10)
+
+    assert [item["item_code"] for item in items] == [3001]
+    assert errors_by_row(errors) == {
+        11: "item_code is not a positive whole number",
+        12: "item_name is blank",
+        13: "rate is not a number",
+        14: "gstin is not a GST slab (0, 5, 12, 18, 28)",
+        15: "rate is negative",
+    }
+
+
+def test_unknown_names_and_repeated_codes_are_rejected():
+    items, errors = item_import.validate_chunk(chunk([
+        ("3001", "Rusk", "20", "Snacks"),
+        ("3002", "Bun", "10", "Bakery"),
+        ("3002", "Bun", "12", "Bakery"),
+    ], ("item_code", "item_name", "rate", "catagory")), REFERENCES)
+
+    assert items == [{"item_code": 3002, "rate": 12, "item_name": "Bun", "catagory": "Bakery"}]
+    assert errors_by_row(errors) == {2: "unknown catagory", 3: "item_code repeated in a later row, skipped"}
+
+
+def test_import_upserts_valid_rows(backend):
+    sheet = "Item Code,Item Name,MRP,Stock\n1001,White Bread,160,\n3001,Rusk,45,12\n3002,,10,1\n"
+
+    report = item_import.import_items(backend, io.StringIO(sheet), filename="catalog.csv")
+
+    assert (report["rows"], report["valid"], report["inserted"], report["updated"]) == (3, 2, 1, 1)
+    assert report["errors"] == [{"row": 4, "item_code": "3002", "error": "item_name is blank"}]
+    bread = backend.search_item("1001")
+    # A blank cell keeps the stored value
+    assert (bread["rate"], bread["soh"]) == (160, 50)
+    rusk = backend.search_item("3001")
+    assert (rusk["rate"], rusk["soh"], rusk["gstin"], rusk["store_code"]) == (45, 12, 0, backend.STORE_CODE)
+
+
+def test_dry_run_writes_nothing(backend):
+    report = item_import.import_items(backend, io.StringIO("item_code,item_name,rate\n3001,Rusk,45\n"),
+                                      filename="catalog.csv", dry_run=True)
+
+    assert report["valid"] == 1
+    assert backend.search_item("3001") is None
+
+
+def test_missing_required_column_stops_the_import(backend):
+    report = item_import.import_items(backend, io.StringIO("item_code,rate\n3001,45\n"), filename="catalog.csv")
+
+    assert report["error_count"] == 1
+    assert report["errors"][0]["error"] == "Missing column(s): item_name"
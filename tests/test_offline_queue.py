@@ -0,0 +1,243 @@
+import hashlib
+import itertools
+import types
+
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure, ServerSelectionTimeoutError
+
+from conftest import make_checkout
+
+
+def server_down(*args, **kwargs):
+    raise ServerSelectionTimeoutError("no servers available")
+
+
+def soh(db, item_code):
+    return db.get_db().itemadd.find_one({"item_code": item_code})["soh"]
+
+
+def test_queued_checkouts_are_synced(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "always")
+    before = soh(mongo_backend, 1001)
+    queue.checkout(*make_checkout(5, [(1001, 2, 150, "Bakery")]))
+    queue.checkout(*make_checkout(6, [(1001, 1, 150, "Bakery")]))
+    assert mongo_backend.search_bill(5) is None
+
+    assert queue.sync_pending() == 2
+
+    assert queue.get_queue_status()["synced"] == 2
+    assert mongo_backend.search_bill(5)["complete"] is True
+    assert soh(mongo_backend, 1001) == before - 3
+    assert queue.sync_pending() == 0
+
+
+@pytest.fixture
+def cut_off(monkeypatch):
+    """Make the connection drop right after the Nth write: cut_off.after = N"""
+    mongomock = pytest.importorskip("mongomock")
+    state = types.SimpleNamespace(after=None, writes=0)
+
+    def dropping(write):
+        def wrapper(self, *args, **kwargs):
+            result = write(self, *args, **kwargs)
+            state.writes += 1
+            if state.writes == state.after:
+                raise AutoReconnect("connection dropped")
+            return result
+        return wrapper
+
+    for name in ("insert_one", "update_one", "bulk_write"):
+        monkeypatch.setattr(mongomock.collection.Collection, name, dropping(getattr(mongomock.collection.Collection, name)))
+    return state
+
+
+def test_replay_after_a_drop_at_any_write_counts_everything_once(mongo_backend, cut_off):
+    db = mongo_backend.get_db()
+    for after in itertools.count(1):
+        bill_no = 100 + after
+        bill, lines, invoice = make_checkout(
+            bill_no, [(1001, 2, 150, "Bakery"), (1002, 1, 100, "Bread")], cust_mobile="9800000001"
+        )
+        bill["checkout_id"] = f"till-1:{bill_no}"
+        before = (soh(mongo_backend, 1001), soh(mongo_backend, 1002), mongo_backend.get_sales_summary(7001))
+        customer = db.customers.find_one({"cust_mobile": "9800000001"}) or {"visits": 0, "lifetime_spend": 0}
+        cut_off.writes, cut_off.after = 0, after
+        try:
+            mongo_backend.checkout(dict(bill), [dict(line) for line in lines], dict(invoice))
+        except AutoReconnect:
+            pass
+        else:
+            # The checkout needed fewer writes than `after`: every write has been cut off once
+            assert after > 3
+            break
+        cut_off.after = None
+        completed = db.billdata.find_one({"bill_no": str(bill_no)}, {"complete": 1}) or {}
+
+        # Cut off after the bill was completed, only the markers are left to clear
+        status = "duplicate" if completed.get("complete") else "inserted"
+        assert mongo_backend.sync_checkouts([(dict(bill), lines, invoice)]) == [status]
+        assert mongo_backend.sync_checkouts([(dict(bill), lines, invoice)]) == ["duplicate"]
+
+        assert (soh(mongo_backend, 1001), soh(mongo_backend, 1002)) == (before[0] - 2, before[1] - 1)
+        summary = mongo_backend.get_sales_summary(7001)
+        assert (summary["bills"], summary["amount"]) == (before[2]["bills"] + 1, before[2]["amount"] + 400)
+        after_customer = db.customers.find_one({"cust_mobile": "9800000001"})
+        assert after_customer["visits"] == customer["visits"] + 1
+        assert after_customer["lifetime_spend"] == customer["lifetime_spend"] + 400
+        assert db.saledetails.count_documents({"checkout_id": bill["checkout_id"]}) == 2
+        assert db.billdata.find_one({"bill_no": str(bill_no)})["complete"] is True
+        for name in ("itemadd", "sales_rollup_hourly", "sales_rollup_category", "customers"):
+            assert db[name].count_documents({"pending_checkouts": {"$exists": True, "$ne": []}}) == 0
+
+
+def test_replay_of_another_checkouts_bill_number_is_a_conflict(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "always")
+    mongo_backend.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")]))
+    before = soh(mongo_backend, 1001)
+    queue.checkout(*make_checkout(5, [(1002, 1, 100, "Bakery")], time="11:00:00"))
+
+    queue.sync_pending()
+
+    status = queue.get_queue_status()
+    assert [conflict["bill_no"] for conflict in status["conflicts"]] == ["5"]
+    assert mongo_backend.get_db().sync_conflicts.count_documents({"bill_no": "5"}) == 1
+    assert soh(mongo_backend, 1001) == before
+
+
+def test_an_entry_that_keeps_failing_is_set_aside(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "always")
+    monkeypatch.setattr(queue, "OFFLINE_MAX_ATTEMPTS", 3)
+    sync_checkouts = mongo_backend.sync_checkouts
+
+    def rejecting(checkouts):
+        if any(bill["bill_no"] == "5" for bill, _, _ in checkouts):
+            raise OperationFailure("document failed validation", 121)
+        return sync_checkouts(checkouts)
+
+    monkeypatch.setattr(mongo_backend, "sync_checkouts", rejecting)
+    for bill_no in (5, 6, 7):
+        queue.checkout(*make_checkout(bill_no, [(1001, 1, 150, "Bakery")]))
+
+    assert queue.sync_pending() == 2
+    assert mongo_backend.search_bill(6) and mongo_backend.search_bill(7)
+    assert queue.get_queue_status()["pending"] == 1
+    assert queue.sync_pending() == 0
+    assert queue.sync_pending() == 0
+
+    status = queue.get_queue_status()
+    assert (status["pending"], status["synced"], status["errors"]) == (0, 2, 1)
+    assert [(entry["bill_no"], entry["status"]) for entry in status["conflicts"]] == [("5", "error")]
+    assert "document failed validation" in status["conflicts"][0]["last_error"]
+
+
+def test_unreachable_mongo_leaves_entries_pending(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "always")
+    monkeypatch.setattr(queue, "OFFLINE_MAX_ATTEMPTS", 1)
+    queue.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")]))
+    monkeypatch.setattr(mongo_backend, "sync_checkouts", server_down)
+
+    assert queue.sync_pending() == 0
+    assert queue.sync_pending() == 0
+
+    status = queue.get_queue_status()
+    assert (status["pending"], status["errors"]) == (1, 0)
+    assert mongo_backend.is_unreachable()
+
+
+def test_legacy_bill_without_checkout_id_is_a_duplicate(mongo_backend):
+    bill, _, _ = make_checkout(5, [])
+    mongo_backend.get_db().billdata.insert_one(dict(bill))
+
+    assert mongo_backend.sync_checkouts([(dict(bill), [], None)]) == ["duplicate"]
+    assert mongo_backend.sync_checkouts([(dict(bill, time="11:00:00"), [], None)]) == ["conflict"]
+
+
+def test_auto_mode_queues_while_mongo_is_unreachable(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "auto")
+    monkeypatch.setattr(mongo_backend, "checkout", server_down)
+
+    queue.checkout(*make_checkout(5, [(1001, 1, 150, "Bakery")]))
+    assert mongo_backend.is_unreachable()
+    queue.checkout(*make_checkout(6, [(1001, 1, 150, "Bakery")]))
+
+    assert queue.get_queue_status()["pending"] == 2
+
+
+def test_invoice_numbers_come_from_blocks_leased_online(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "OFFLINE_INVOICE_BLOCKS", 2)
+    online = [queue.next_invoice_no(7001) for _ in range(3)]
+    monkeypatch.setattr(mongo_backend, "lease_invoice_block", server_down)
+    leased = queue.get_queue_db().execute(
+        "SELECT SUM(last - next + 1) FROM invoice_blocks WHERE store_code = 7001 AND next <= last"
+    ).fetchone()[0]
+
+    offline = [queue.next_invoice_no(7001) for _ in range(leased)]
+
+    assert mongo_backend.is_unreachable()
+    assert len(set(online + offline)) == len(online) + leased
+    with pytest.raises(Exception, match="No invoice numbers left offline"):
+        queue.next_invoice_no(7001)
+
+
+def test_journal_blocks_are_released_at_shutdown(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(queue, "start_sync_worker", lambda: None)
+    monkeypatch.setattr(queue, "OFFLINE_MODE", "always")
+    monkeypatch.setattr(queue, "OFFLINE_INVOICE_BLOCKS", 2)
+    first, skipped = queue.next_invoice_no(7001), queue.next_invoice_no(7001)
+    queue.checkout(*make_checkout(first, [(1001, 1, 150, "Bakery")]))
+    queue.sync_pending()
+    # This process's own numbering does not release the journal's leases
+    mongo_backend.next_invoice_no(7001)
+    leased = mongo_backend.get_db().invoice_leases.find({"holder": "journal"})
+    numbers = sorted(set().union(*(range(lease["first"], lease["last"] + 1) for lease in leased)))
+    assert mongo_backend.get_db().invoice_leases.count_documents({"holder": "journal", "released_at": None}) == 2
+
+    queue.release_invoice_blocks()
+
+    assert queue.get_queue_db().execute("SELECT COUNT(*) FROM invoice_blocks").fetchone()[0] == 0
+    gaps = [gap["bill_no"] for gap in mongo_backend.get_invoice_gaps(7001)]
+    assert gaps == [bill_no for bill_no in numbers if bill_no != first]
+    assert skipped in gaps
+
+
+def test_till_starts_and_logs_in_offline_after_an_online_start(queue, mongo_backend, monkeypatch):
+    password = hashlib.sha256(b"admin123").hexdigest()
+    queue.init_database()
+    assert queue.verify_login("admin", password)["role"] == "admin"
+
+    monkeypatch.setattr(queue, "_schema_ready", False)
+    monkeypatch.setattr(mongo_backend, "init_database", server_down)
+    monkeypatch.setattr(mongo_backend, "verify_login", server_down)
+    queue.init_database()
+
+    assert mongo_backend.is_unreachable()
+    assert queue.verify_login("admin", password)["role"] == "admin"
+    assert queue.verify_login("admin", "wrong") is None
+
+
+def test_first_start_needs_mongo(queue, mongo_backend, monkeypatch):
+    monkeypatch.setattr(mongo_backend, "init_database", server_down)
+    with pytest.raises(ServerSelectionTimeoutError):
+        queue.init_database()
+
+
+def test_catalog_is_served_from_cache_when_refresh_fails(mongo_backend, monkeypatch):
+    assert mongo_backend.search_item("1001")["item_name"] == "White Bread"
+    monkeypatch.setattr(mongo_backend._catalog, "refresh_seconds", 0)
+    itemadd = type(mongo_backend.get_db().itemadd)
+    find = itemadd.find
+
+    def find_down(collection, *args, **kwargs):
+        if collection.name == "itemadd":
+            server_down()
+        return find(collection, *args, **kwargs)
+
+    monkeypatch.setattr(itemadd, "find", find_down)
+
+    assert mongo_backend.search_item("1001")["item_name"] == "White Bread"
+    assert mongo_backend.is_unreachable()
@@ -0,0 +1,50 @@
+from conftest import make_checkout
+
+CHECKOUTS = [
+    make_checkout(1, [(1001, 2, 150, "Bakery"), (1002, 1, 100, "Bakery")], time="09:15:00"),
+    make_checkout(2, [(1001, 1, 150, "Bakery"), (2001, 3, 40, "Dairy")], time="09:40:00", payment_mode="UPI"),
+    make_checkout(3, [(2001, 1, 40, "Dairy")], time="18:05:00", cashier="manager"),
+    make_checkout(4, [(1002, 2, 100, "Bakery")], date="16/10/2026", time="10:00:00"),
+]
+
+
+def summaries(db):
+    return db.get_sales_summary(7001), sorted(db.get_category_sales(7001), key=lambda row: row["catagory"])
+
+
+def test_checkout_rollups_match_the_bills(backend):
+    for bill, lines, invoice in CHECKOUTS:
+        backend.checkout(dict(bill), [dict(line) for line in lines], dict(invoice))
+
+    summary, categories = summaries(backend)
+    assert summary["bills"] == 4
+    assert summary["amount"] == 400 + 270 + 40 + 200
+    assert summary["by_payment_mode"] == {"Cash": 640, "UPI": 270}
+    assert summary["by_cashier"] == {"cashier": 870, "manager": 40}
+    assert summary["by_hour"] == {9: 670, 10: 200, 18: 40}
+    assert [(row["catagory"], row["qty"], row["lines"]) for row in categories] == [("Bakery", 6, 4), ("Dairy", 4, 2)]
+    assert backend.get_sales_summary(7001, start_day="2026-10-16")["bills"] == 1
+
+
+def test_rebuild_matches_the_checkout_rollups(sqlite_backend):
+    for bill, lines, invoice in CHECKOUTS:
+        sqlite_backend.checkout(dict(bill), [dict(line) for line in lines], dict(invoice))
+    incremental = summaries(sqlite_backend)
+
+    sqlite_backend.rebuild_rollups()
+
+    assert summaries(sqlite_backend) == incremental
+
+
+def test_upgrade_builds_rollups_from_existing_bills(sqlite_backend, monkeypatch):
+    # save_bill writes no rollups, like the bills saved before they existed
+    for bill, lines, _ in CHECKOUTS:
+        sqlite_backend.save_bill(dict(bill), [dict(line) for line in lines])
+    assert sqlite_backend.get_sales_summary(7001)["bills"] == 0
+
+    sqlite_backend.get_db().execute("PRAGMA user_version = 1")
+    monkeypatch.setattr(sqlite_backend, "_schema_checked", False)
+    sqlite_backend.init_database()
+
+    assert sqlite_backend.get_sales_summary(7001)["bills"] == 4
+    assert sqlite_backend.get_schema_version() == sqlite_backend.SCHEMA_VERSION